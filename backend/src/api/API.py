@@ -1,11 +1,30 @@
-from fastapi import FastAPI
+import os
+from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from .AuthAPI import router as auth_router
 from .Search import router as search_router
 from .Profile import router as profile_router
 from .Add import router as add_router
+from .Import import router as import_router
+from ..utils.db_pool import pool_stats
+from ..utils.query_registry import QUERY_REGISTRY
+from ..utils.catalog_cache import CATALOG_CACHE
+from ..utils.entity_resolver import ENTITY_RESOLVER
+from ..utils.autocomplete import AUTOCOMPLETE_INDEX
+from ..utils.upload_jobs import UPLOAD_JOBS
+from ..utils.email_outbox import EMAIL_OUTBOX
+from ..utils.storage import get_storage
+from ..utils.password_hasher import PASSWORD_HASHER
+from ..auth.context import AUTH_CONTEXT_CACHE
+from dotenv import load_dotenv
 # from .Chat import router as chat_router // TEMP disabled chat for Render deployment. 
 
+load_dotenv()
+
+# Gli endpoint /*-stats espongono dimensionamento, contatori e tempi interni: attivi solo se
+# ENABLE_DEBUG_STATS=true (es. in sviluppo o dietro la rete interna del deploy)
+ENABLE_DEBUG_STATS = os.getenv("ENABLE_DEBUG_STATS", "false").lower() in ("1", "true", "yes")
+
 app = FastAPI(title="api")
 
 app.add_middleware(
@@ -20,14 +39,87 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 app.include_router(auth_router)
 app.include_router(search_router)
 app.include_router(profile_router)
 app.include_router(add_router)
+app.include_router(import_router)
 # app.include_router(chat_router) // TEMP disabled chat for Render deployment. 
 
+# l'indice dei suggerimenti si costruisce in background all'avvio, non alla prima richiesta
+@app.on_event("startup")
+def build_autocomplete_index():
+    AUTOCOMPLETE_INDEX.refresh()
+
+# worker che salvano nello storage (Drive o locale) i file messi in coda da /addTesi, /addMaterialeDidattico e /files/upload
+@app.on_event("startup")
+def start_upload_workers():
+    UPLOAD_JOBS.start(get_storage())
+
+# sender delle email in coda nell'outbox (verifica dell'indirizzo alla registrazione)
+@app.on_event("startup")
+def start_email_outbox():
+    EMAIL_OUTBOX.start()
+
+
+def require_debug_stats():
+    # 404 e non 403: con il flag spento gli endpoint non devono risultare esistenti
+    if not ENABLE_DEBUG_STATS:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+# metriche del pool di connessioni (dimensione, attese, timeout di acquisizione)
+@app.get("/db/pool-stats", dependencies=[Depends(require_debug_stats)], include_in_schema=ENABLE_DEBUG_STATS)
+def db_pool_stats():
+    return pool_stats()
+
+# metriche delle query preparate (esecuzioni, PREPARE, tempi medi e massimi)
+@app.get("/db/query-stats", dependencies=[Depends(require_debug_stats)], include_in_schema=ENABLE_DEBUG_STATS)
+def db_query_stats():
+    return QUERY_REGISTRY.stats()
+
+# metriche della cache di catalogo (hit, miss, invalidazioni)
+@app.get("/catalog/cache-stats", dependencies=[Depends(require_debug_stats)], include_in_schema=ENABLE_DEBUG_STATS)
+def catalog_cache_stats():
+    return CATALOG_CACHE.stats()
+
+# dimensione dei dizionari del resolver e hit/miss delle risoluzioni nome -> id
+@app.get("/catalog/resolver-stats", dependencies=[Depends(require_debug_stats)], include_in_schema=ENABLE_DEBUG_STATS)
+def entity_resolver_stats():
+    return ENTITY_RESOLVER.stats()
+
+
+# dimensione e stato dell'indice dei suggerimenti di /autocomplete
+@app.get("/catalog/autocomplete-stats", dependencies=[Depends(require_debug_stats)], include_in_schema=ENABLE_DEBUG_STATS)
+def autocomplete_stats():
+    return AUTOCOMPLETE_INDEX.stats()
+
+
+# worker e contatori della coda di upload di questo processo
+@app.get("/files/upload-stats", dependencies=[Depends(require_debug_stats)], include_in_schema=ENABLE_DEBUG_STATS)
+def upload_stats():
+    return UPLOAD_JOBS.stats()
+
+
+# batch inviati, retry e fallimenti dell'outbox delle email di questo processo
+@app.get("/email/outbox-stats", dependencies=[Depends(require_debug_stats)], include_in_schema=ENABLE_DEBUG_STATS)
+def email_outbox_stats():
+    return EMAIL_OUTBOX.stats()
+
+
+# coda e tempi del pool bcrypt di login, signup e cambio password
+@app.get("/auth/hash-stats", dependencies=[Depends(require_debug_stats)], include_in_schema=ENABLE_DEBUG_STATS)
+def password_hash_stats():
+    return PASSWORD_HASHER.stats()
+
+
+# token decodificati in cache e token senza claim estesi riletti dal database
+@app.get("/auth/context-stats", dependencies=[Depends(require_debug_stats)], include_in_schema=ENABLE_DEBUG_STATS)
+def auth_context_stats():
+    return AUTH_CONTEXT_CACHE.stats()
 
 
 # just for testing purposes
@@ -1,15 +1,23 @@
-from ..utils.db_utils import get_connection, MODE
+from uuid import UUID
+from typing import Optional
+from ..utils.db_utils import MODE
+from ..utils.db_pool import get_pooled_handler
 from ..utils.db_handler import DBHandler
+from ..utils.query_registry import register_query
 from fastapi import APIRouter, HTTPException, UploadFile, Form, File, Depends
+from fastapi.concurrency import run_in_threadpool
 from ..api.BaseModel import *
 from psycopg2 import errors
 from ..api.drive_utils import *
 from ..utils.handle_db_errors import handle_db_errors
+from ..utils.catalog_cache import invalidate_catalog
+from ..utils.autocomplete import AUTOCOMPLETE_INDEX
+from ..utils.entity_resolver import ENTITY_RESOLVER
+from ..utils.upload_jobs import UPLOAD_JOBS, UploadRejected
 
-# Database connection dependency for Render
+# Database connection dependency for Render: connessioni prese dal pool condiviso
 def get_db_handler():
-    conn = get_connection(mode="local")
-    db_handler = DBHandler(conn)
+    db_handler = get_pooled_handler(mode="local")
     try:
         yield db_handler
     finally:
@@ -29,30 +37,18 @@ def addEdizioneCorso(edizioneCorso: AddEdizioneCorso, db_handler: DBHandler = De
     Ritorna:
     - messaggio di successo se l'edizione del corso è stata aggiunta correttamente.
     """
-    corsiDL = db_handler.execute_query("SELECT DISTINCT nome FROM Corso_di_Laurea")
-    if not any(edizioneCorso.nomeCDL in row for row in corsiDL):
+    if ENTITY_RESOLVER.corso_di_laurea_id(db_handler, edizioneCorso.nomeCDL) is None:
         raise HTTPException(status_code=400, detail="Il Corso di Laurea non è stato trovato.")
     
-    insegnanti = db_handler.execute_query("SELECT u.id, u.nome, u.cognome FROM Insegnanti_Anagrafici u")
-    insegnante_id = None
-    for id_, nome, cognome in insegnanti:
-        if edizioneCorso.nomeInsegnante == nome and edizioneCorso.cognomeInsegnante == cognome:
-            insegnante_id = id_
-            break
-
+    insegnante_id = ENTITY_RESOLVER.insegnante_id(db_handler, edizioneCorso.nomeInsegnante, edizioneCorso.cognomeInsegnante)
     if insegnante_id is None:
         raise HTTPException(status_code=400, detail="L'insegnante non è stato trovato.")
     
-    corsi = db_handler.execute_query("SELECT id, nome FROM Corso")
-    corso_id = None
-    for id_, nome in corsi:
-        if edizioneCorso.nomeCorso == nome:
-            corso_id = id_
-            break
-    
-    if corso_id is None:
+    corso = ENTITY_RESOLVER.corso(db_handler, edizioneCorso.nomeCorso)
+    if corso is None:
         #TODO crea corso
         raise HTTPException(status_code=400, detail="Corso inesistente.")
+    corso_id = corso[0]
     
     edizione_exists = db_handler.run_query("SELECT * FROM EdizioneCorso e WHERE e.id = %s AND e.data = %s",params=(corso_id, edizioneCorso.semestre.value), fetch=True)
     if not edizione_exists:
@@ -62,6 +58,7 @@ def addEdizioneCorso(edizioneCorso: AddEdizioneCorso, db_handler: DBHandler = De
                     """, params=(corso_id, insegnante_id, edizioneCorso.semestre.value, 
                                 edizioneCorso.orario, edizioneCorso.esonero, 
                                 edizioneCorso.mod_Esame))
+        invalidate_catalog("search:edizioni")
         return {"message": "Edizione Corso aggiunta con successo"}
 
     else:
@@ -81,23 +78,20 @@ def addCorso(corso: AddCorso, db_handler: DBHandler = Depends(get_db_handler)):
     Ritorna:
     - messaggio di successo se il corso è stato aggiunto correttamente.
     """
-    cdl = db_handler.execute_query("SELECT id, nome FROM Corso_di_Laurea")
-    cdl_id = None
-    for id_, nome in cdl:
-        if corso.nomeCorsoLaurea == nome:
-            cdl_id = id_
-            break
-    
+    cdl_id = ENTITY_RESOLVER.corso_di_laurea_id(db_handler, corso.nomeCorsoLaurea)
     if cdl_id is None:
         raise HTTPException(status_code=400, detail="Corso di Laurea non trovato.")
     
-    corso_exists = db_handler.run_query("SELECT * FROM Corso c WHERE c.nome = %s",params=(corso.nomeCorso,),fetch=True)
-    if not corso_exists:
-        db_handler.execute_sql_insertion("""
+    if ENTITY_RESOLVER.corso(db_handler, corso.nomeCorso) is None:
+        new_corso = db_handler.run_query("""
             INSERT INTO Corso (id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria)
             VALUES (%s, %s, %s, %s, %s, %s)
+            RETURNING id
             """, params=(cdl_id, corso.nomeCorso, corso.cfu, corso.idoneita, 
-                        corso.prerequisiti, corso.frequenza_obbligatoria))
+                        corso.prerequisiti, corso.frequenza_obbligatoria), fetch=True)
+        ENTITY_RESOLVER.remember_corso(corso.nomeCorso, new_corso[0][0], cdl_id)
+        invalidate_catalog()
+        AUTOCOMPLETE_INDEX.refresh()
         
         return {"message": "Corso aggiunto con successo"}
     else:
@@ -115,23 +109,17 @@ def addCorsoSeguito(seguito: AddCorsoSeguito, db_handler: DBHandler = Depends(ge
     Ritorna:
     - messaggio di successo se il corso seguito è stato aggiunto correttamente.
     """
-    student_info = db_handler.run_query("""SELECT id, corso_laurea_id FROM Studenti
-                                        WHERE matricola = %s""", 
-                                        params=(seguito.matricolaStudente,), fetch=True)
-    if not student_info:
+    student_info = ENTITY_RESOLVER.studente(db_handler, seguito.matricolaStudente)
+    if student_info is None:
         raise HTTPException(status_code=400, detail="Matricola dello studente non trovata.")
-    student_id = student_info[0][0]
-    student_cdl_id = student_info[0][1]
+    student_id = student_info[0]
+    student_cdl_id = student_info[1]
 
-    corso_info = db_handler.run_query("""SELECT id, id_corso
-                                         FROM Corso
-                                         WHERE nome = %s
-                                      """, params=(seguito.nomeCorso,), fetch=True)
-    
-    if not corso_info:
+    corso_info = ENTITY_RESOLVER.corso(db_handler, seguito.nomeCorso)
+    if corso_info is None:
         raise HTTPException(status_code=400, detail="Corso non trovato.")
-    corso_id = corso_info[0][0]
-    corso_cdl_id = corso_info[0][1]
+    corso_id = corso_info[0]
+    corso_cdl_id = corso_info[1]
 
     if corso_cdl_id != student_cdl_id:
         raise HTTPException(status_code=400, detail="Non è consentito aggiungere un Corso Seguito che non sia parte del Corso di Laurea dello studente.")
@@ -174,6 +162,8 @@ def addPiattaforma(piattaforma: AddPiattaforma, db_handler: DBHandler = Depends(
                             INSERT INTO Piattaforme (nome)
                             VALUES (%s)
                             """, params=(piattaforma.nome,))
+        invalidate_catalog()
+        AUTOCOMPLETE_INDEX.refresh()
         
         return {"message": "Piattaforma aggiunta con successo"}
     else:
@@ -192,12 +182,12 @@ def addEdizioneCorso_Piattaforma(data: AddEdizioneCorsoPiattaforma, db_handler:
     - messaggio di successo se l'associazione è stata aggiunta correttamente.
     - errore 409 se la piattaforma è già associata a questa edizione.
     """
-    edizione_corso_info = db_handler.run_query("""
-                    SELECT e.id, e.data
-                    FROM Corso c JOIN EdizioneCorso e on c.id = e.id
-                    WHERE c.nome = %s AND e.data = %s
-                                               """,
-                    params=(data.nomeCorso, data.semestre.value),fetch=True)
+    corso = ENTITY_RESOLVER.corso(db_handler, data.nomeCorso)
+    edizione_corso_info = None
+    if corso is not None:
+        edizione_corso_info = db_handler.run_query(
+                    "SELECT e.id, e.data FROM EdizioneCorso e WHERE e.id = %s AND e.data = %s",
+                    params=(corso[0], data.semestre.value),fetch=True)
     
     if not edizione_corso_info:
         raise HTTPException(status_code=400, detail="Edizione del Corso non trovata.")
@@ -215,7 +205,7 @@ def addEdizioneCorso_Piattaforma(data: AddEdizioneCorsoPiattaforma, db_handler:
     else:
         raise HTTPException(status_code=409, detail="Questa piattaforma è già associata a questa edizione di corso.")
 
-@router.post("/addTesi")
+@router.post("/addTesi", status_code=202)
 @handle_db_errors
 async def addTesi(
     matricola: int = Form(...),
@@ -226,7 +216,8 @@ async def addTesi(
     db_handler: DBHandler = Depends(get_db_handler)
     ):
     """
-    Carica e aggiunge la tesi di uno studente.
+    Carica e aggiunge la tesi di uno studente. Il file viene messo in coda e caricato
+    su Drive in background; la tesi viene aggiunta quando il caricamento termina.
 
     Parametri:
     - matricola: matricola dello studente.
@@ -235,34 +226,23 @@ async def addTesi(
     - file: file della tesi da caricare.
 
     Ritorna:
-    - messaggio di successo se la tesi è stata aggiunta correttamente.
+    - id del job di caricamento, il cui stato si legge da /uploads/{job_id}.
     """
-    tesi_info = db_handler.run_query("""
-        SELECT s.id, s.corso_laurea_id, u.nome, u.cognome
-        FROM Studenti s JOIN Utente u ON s.id = u.id
-        WHERE matricola = %s""", params=(matricola,), fetch=True)
-    if not tesi_info:
+    tesi_info = ENTITY_RESOLVER.studente(db_handler, matricola)
+    if tesi_info is None:
         raise HTTPException(status_code=400, detail="Studente non trovato.")
     
-    student_id = tesi_info[0][0]
-    cdl_id = tesi_info[0][1]
-    nome = tesi_info[0][2]
-    cognome = tesi_info[0][3]
-
-    data = await upload_file(file, parent_folder, child_folder, nome, cognome)
-    tesi_id = data["file_id"]
-    if tesi_id:
-        db_handler.execute_sql_insertion("""
-                    INSERT INTO Tesi (student_id, corso_laurea_id, titolo, file)
-                    VALUES (%s, %s, %s, %s)
-                    """, params=(student_id, cdl_id, title, tesi_id))
-    
-        return {"message": "Tesi aggiunta con successo"}
-    else:
-        raise HTTPException(status_code=400, detail="Errore nel caricamento al drive.")
+    student_id, cdl_id, nome, cognome = tesi_info
+
+    job_id = await enqueue_upload(db_handler, "tesi", file, parent_folder, child_folder, nome, cognome, {
+        "student_id": str(student_id),
+        "corso_laurea_id": str(cdl_id),
+        "titolo": title,
+    })
+    return upload_accepted(job_id, "Tesi in caricamento")
     
 
-@router.post("/addMaterialeDidattico")
+@router.post("/addMaterialeDidattico", status_code=202)
 @handle_db_errors
 async def addMaterialeDidattico(
         email : str = Form(...),
@@ -276,7 +256,8 @@ async def addMaterialeDidattico(
         db_handler: DBHandler = Depends(get_db_handler)
     ):
     """
-    Carica e aggiunge materiale didattico associato a un utente e corso.
+    Carica e aggiunge materiale didattico associato a un utente e corso. Il file viene messo
+    in coda e caricato su Drive in background; il materiale viene aggiunto quando il caricamento termina.
 
     Parametri:
     - email: email dell'utente che carica il materiale.
@@ -289,47 +270,94 @@ async def addMaterialeDidattico(
     - file: file del materiale didattico da caricare.
 
     Ritorna:
-    - messaggio di successo se il materiale didattico è stato aggiunto correttamente.
+    - id del job di caricamento, il cui stato si legge da /uploads/{job_id}.
     """
-    user_info = db_handler.run_query("SELECT id, nome, cognome FROM Utente u WHERE LOWER(u.email) = LOWER(%s)", params=(email,), fetch=True)
-    if not user_info:
+    user_info = ENTITY_RESOLVER.utente(db_handler, email)
+    if user_info is None:
         raise HTTPException(status_code=400, detail="Utente non trovato.")
-    user_id = user_info[0][0]
-    nome = user_info[0][1]
-    cognome = user_info[0][2]
+    user_id, nome, cognome = user_info
 
-    course_info = db_handler.run_query("SELECT id FROM Corso WHERE nome = %s", params=(nomeCorso,), fetch=True)
-    if not course_info:
+    course_info = ENTITY_RESOLVER.corso(db_handler, nomeCorso)
+    if course_info is None:
         raise HTTPException(status_code=400, detail="Corso non trovato.")
-    course_id = course_info[0][0]
+    course_id = course_info[0]
     edition_info = db_handler.run_query("SELECT id, data FROM EdizioneCorso WHERE id = %s AND data = %s", params=(course_id, semestre), fetch=True)
     if not edition_info:
         raise HTTPException(status_code=400, detail="Edizione del Corso non trovata.")
 
-    verified = db_handler.run_query("SELECT * FROM Utente u JOIN Insegnanti_Registrati i ON u.id = i.id WHERE u.email = %s", params=(email,), fetch=True)
+    verified = db_handler.run_query("SELECT 1 FROM Insegnanti_Registrati i WHERE i.id = %s", params=(user_id,), fetch=True)
     if verified:
         verificato = True
     else:
         verificato = False
         
-    data = await upload_file(file, parent_folder, child_folder, nome, cognome)
-    file_id = data["file_id"]
-    if file_id:
-        db_handler.execute_sql_insertion("""
-                    INSERT INTO Materiale_Didattico (
-                                Utente_id,
-                                edition_id,
-                                edition_data,
-                                path_file,
-                                tipo,
-                                verificato
-                                )
-                    VALUES (%s, %s, %s, %s, %s, %s)""",
-                    params=(user_id, course_id, semestre, file_id, tipo, verificato))
-        
-        return {"message": "Materiale Didattico Aggiunto con successo."}
-    else:
-        raise HTTPException(status_code=400, detail="Errore nel caricamento al drive.")
+    job_id = await enqueue_upload(db_handler, "materiale", file, parent_folder, child_folder, nome, cognome, {
+        "user_id": str(user_id),
+        "course_id": str(course_id),
+        "semestre": semestre,
+        "tipo": tipo,
+        "verificato": verificato,
+    })
+    return upload_accepted(job_id, "Materiale Didattico in caricamento.")
+
+
+def _salva_tesi(db_handler: DBHandler, dati: dict, file_id: str) -> None:
+    # Eseguita dal worker di upload quando la tesi è su Drive
+    db_handler.execute_sql_insertion("""
+                INSERT INTO Tesi (student_id, corso_laurea_id, titolo, file)
+                VALUES (%s, %s, %s, %s)
+                """, params=(dati["student_id"], dati["corso_laurea_id"], dati["titolo"], file_id))
+
+
+def _salva_materiale(db_handler: DBHandler, dati: dict, file_id: str) -> None:
+    # Eseguita dal worker di upload quando il materiale è su Drive
+    # file_id identifica il contenuto: lo stesso file già caricato sulla stessa edizione è un duplicato
+    duplicato = db_handler.run_query(
+        "SELECT 1 FROM Materiale_Didattico WHERE edition_id = %s AND edition_data = %s AND path_file = %s",
+        params=(dati["course_id"], dati["semestre"], file_id), fetch=True
+    )
+    if duplicato:
+        raise UploadRejected("Questo materiale è già presente per l'edizione del corso.")
+    db_handler.execute_sql_insertion("""
+                INSERT INTO Materiale_Didattico (
+                            Utente_id,
+                            edition_id,
+                            edition_data,
+                            path_file,
+                            tipo,
+                            verificato
+                            )
+                VALUES (%s, %s, %s, %s, %s, %s)""",
+                params=(dati["user_id"], dati["course_id"], dati["semestre"], file_id, dati["tipo"], dati["verificato"]))
+
+
+UPLOAD_JOBS.register("tesi", _salva_tesi)
+UPLOAD_JOBS.register("materiale", _salva_materiale)
+
+
+@router.get("/uploads/{job_id}")
+def getUploadStatus(job_id: UUID, db_handler: DBHandler = Depends(get_db_handler)):
+    """
+    Stato di un caricamento in background.
+
+    Parametri:
+    - job_id: id restituito da /addTesi, /addMaterialeDidattico o /files/upload.
+
+    Ritorna:
+    - stato (in_coda, in_corso, completato, fallito), byte caricati e totali, tentativi,
+      id del file su Drive a caricamento completato ed eventuale errore.
+    """
+    status = UPLOAD_JOBS.status(db_handler, str(job_id))
+    if status is None:
+        raise HTTPException(status_code=404, detail="Caricamento non trovato.")
+    return status
+
+# Materiale da valutare: per id, oppure per file ed edizione (lo stesso path_file può stare in più edizioni)
+register_query("add_materiale_per_id", "SELECT id FROM Materiale_Didattico m WHERE m.id = %s")
+register_query("add_materiale_per_file", """
+    SELECT id FROM Materiale_Didattico m
+    WHERE m.path_file = %s AND m.edition_id = %s AND m.edition_data = %s
+""")
 
 @router.post("/addValutazione")
 @handle_db_errors
@@ -338,17 +366,27 @@ def addValutazione(valutazione: AddValutazione, db_handler: DBHandler = Depends(
     Aggiunge una valutazione a un materiale didattico da parte di uno studente.
 
     Parametri:
-    - valutazione: dati della valutazione, inclusi matricola studente, path file del materiale, voto e commento.
+    - valutazione: dati della valutazione, inclusi matricola studente, materiale (id, oppure path file con corso e semestre dell'edizione), voto e commento.
 
     Ritorna:
     - messaggio di successo se la valutazione è stata aggiunta correttamente.
     """
-    student_info = db_handler.run_query("SELECT id FROM Studenti WHERE matricola = %s", params=(valutazione.matricola,), fetch=True)
-    if not student_info:
+    student_info = ENTITY_RESOLVER.studente(db_handler, valutazione.matricola)
+    if student_info is None:
         raise HTTPException(status_code=400, detail="Studente non trovato.")
-    student_id = student_info[0][0]
+    student_id = student_info[0]
 
-    material_info = db_handler.run_query("SELECT id FROM Materiale_Didattico m WHERE m.path_file = %s", params=(valutazione.path_file,),fetch=True)
+    if valutazione.id_materiale is not None:
+        material_info = db_handler.run_named("add_materiale_per_id", params=(str(valutazione.id_materiale),))
+    else:
+        # dopo la deduplicazione lo stesso path_file può appartenere a più edizioni: serve anche l'edizione
+        if not (valutazione.path_file and valutazione.nomeCorso and valutazione.semestre):
+            raise HTTPException(status_code=400, detail="Indicare id_materiale oppure path_file, nomeCorso e semestre.")
+        corso_info = ENTITY_RESOLVER.corso(db_handler, valutazione.nomeCorso)
+        if corso_info is None:
+            raise HTTPException(status_code=400, detail="Corso non trovato.")
+        material_info = db_handler.run_named("add_materiale_per_file",
+                                             params=(valutazione.path_file, corso_info[0], valutazione.semestre.value))
     if not material_info:
         raise HTTPException(status_code=400, detail="Materiale Didattico non trovato.")
     id_materiale = material_info[0][0]
@@ -364,28 +402,26 @@ def addValutazione(valutazione: AddValutazione, db_handler: DBHandler = Depends(
     
     return {"message" : "Valutazione aggiunta con successo."}
 
-async def upload_file(
-    file: UploadFile = File(...),
-    parent_folder: str = Form(...), # FAQBuddy
-    child_folder: str = Form(...), # CV, Materiale_Didattico, Tesi
-    nome: str = Form(...),
-    cognome: str = Form(...),
-):
+async def enqueue_upload(
+    db_handler: DBHandler,
+    tipo: str,
+    file: UploadFile,
+    parent_folder: str, # FAQBuddy
+    child_folder: str, # CV, Materiale_Didattico, Tesi
+    nome: str,
+    cognome: str,
+    dati: Optional[dict] = None,
+) -> str:
     """
-    Carica un file su Google Drive in una cartella specifica.
+    Salva il file nello spool e mette in coda il suo caricamento su Google Drive.
+    La copia su disco avviene fuori dall'event loop.
     """
-    try:
-        service = get_drive_service()
-        folder_id = get_folder_id(service, parent_folder, child_folder)
-        filename = f"{nome}_{cognome}_{file.filename}"
-        file_metadata = {'name': filename, 'parents': [folder_id]}
-        contents = await file.read()
-        with open(filename, "wb") as f:
-            f.write(contents)
-        from googleapiclient.http import MediaFileUpload
-        media = MediaFileUpload(filename, resumable=True)
-        uploaded = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-        os.remove(filename)
-        return {"file_id": uploaded.get('id'), "filename": filename}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+    filename = f"{nome}_{cognome}_{file.filename}"
+    return await run_in_threadpool(
+        UPLOAD_JOBS.enqueue, db_handler, tipo, file.file, filename,
+        parent_folder, child_folder, file.content_type, dati
+    )
+
+
+def upload_accepted(job_id: str, message: str) -> dict:
+    return {"message": message, "job_id": job_id, "stato": "in_coda", "status_url": f"/uploads/{job_id}"}
@@ -1,19 +1,29 @@
 from uuid import uuid4
-from ..utils.db_utils import get_connection, MODE
+from ..utils.db_utils import MODE
+from ..utils.db_pool import get_pooled_handler, pooled_handler
+from ..utils.catalog_cache import cached_catalog, invalidate_catalog
+from ..utils.autocomplete import AUTOCOMPLETE_INDEX
+from ..utils.upload_jobs import UPLOAD_JOBS
+from ..utils.email_outbox import EMAIL_OUTBOX
 from ..utils.db_handler import DBHandler
-from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, Depends
+from ..auth.context import create_user_token
+from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, Depends, Request, Response
 from .BaseModel import LoginRequest, SignupRequest
 from .utils import *
 from .drive_utils import *
 from dotenv import load_dotenv
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 
 
 load_dotenv()
-# Database connection dependency for Render
+
+# i file di /files/upload non hanno una riga da scrivere: il chiamante legge file_id dallo stato del job
+UPLOAD_JOBS.register("file")
+
+# Database connection dependency for Render: connessioni prese dal pool condiviso
 def get_db_handler():
-    conn = get_connection(mode=MODE)
-    db_handler = DBHandler(conn)
+    db_handler = get_pooled_handler(mode=MODE)
     try:
         yield db_handler
     finally:
@@ -27,7 +37,20 @@ def get_db_handler():
 router = APIRouter()
 
 @router.post("/signup")
-def signup(data: SignupRequest, db_handler: DBHandler = Depends(get_db_handler)):
+async def signup(data: SignupRequest, db_handler: DBHandler = Depends(get_db_handler)):
+    # Le query girano nel threadpool, bcrypt sul pool di PASSWORD_HASHER: mentre si calcola l'hash
+    # la richiesta non occupa nessun thread
+    corso_laurea_id = await run_in_threadpool(_check_signup, data, db_handler)
+    hashed_pwd = await hash_password(data.password)
+    user_id = await run_in_threadpool(_create_user, data, db_handler, corso_laurea_id, hashed_pwd)
+    return {
+        "message": "Utente registrato con successo. Controlla la tua email per la verifica.",
+        "success": True,
+        "user_id": user_id
+    }
+
+def _check_signup(data: SignupRequest, db_handler: DBHandler):
+    # Controlli prima di creare l'utente; ritorna il corso di laurea dello studente (None per gli insegnanti)
     existing = db_handler.run_query(
         "SELECT id FROM Utente WHERE email = %s",
         params=(data.email,),
@@ -53,7 +76,7 @@ def signup(data: SignupRequest, db_handler: DBHandler = Depends(get_db_handler))
     #         )
     if hasattr(data, "ruolo") and data.ruolo == "insegnante":
         # non è obbligatorio avere infoMail, sitoWeb, cv, ricevimento
-        pass
+        return None
     else:
         if not getattr(data, "corsoDiLaurea", None) or not getattr(data, "numeroDiMatricola", None):
             raise HTTPException(
@@ -71,115 +94,122 @@ def signup(data: SignupRequest, db_handler: DBHandler = Depends(get_db_handler))
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Corso di laurea non trovato"
             )
-        corso_laurea_id = corso[0][0]
+        return corso[0][0]
 
+def _create_user(data: SignupRequest, db_handler: DBHandler, corso_laurea_id, hashed_pwd: str) -> str:
     # --- SOLO ORA crea l'utente ---
     user_id = str(uuid4())
-    hashed_pwd = hash_password(data.password)
-    db_handler.execute_sql_insertion(
-        "INSERT INTO Utente (id, email, pwd_hash, nome, cognome, email_verificata) VALUES (%s, %s, %s, %s, %s, %s)",
-        (user_id, data.email, hashed_pwd, data.nome, data.cognome, False) # di default email non verificata per Production
-    )
-
-    if hasattr(data, "ruolo") and data.ruolo == "insegnante":
-        # Inserisci o aggiorna in Insegnanti_Anagrafici
+    verification_token = str(uuid4())
+    # Utente, ruolo, token di verifica e mail di verifica vengono scritti in un'unica transazione
+    with db_handler.unit_of_work():
         db_handler.execute_sql_insertion(
-            """
-            INSERT INTO Insegnanti_Anagrafici (id, nome, cognome, email, utente_id)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (id) DO UPDATE SET
-                nome = EXCLUDED.nome,
-                cognome = EXCLUDED.cognome,
-                email = EXCLUDED.email,
-                utente_id = EXCLUDED.utente_id
-            """,
-            (
-                user_id,
-                data.nome,
-                data.cognome,
-                data.email,
-                user_id
-            )
+            "INSERT INTO Utente (id, email, pwd_hash, nome, cognome, email_verificata) VALUES (%s, %s, %s, %s, %s, %s)",
+            (user_id, data.email, hashed_pwd, data.nome, data.cognome, False) # di default email non verificata per Production
         )
-        db_handler.execute_sql_insertion(
-            "INSERT INTO Insegnanti_Registrati (id, anagrafico_id, infoMail, sitoWeb, cv, ricevimento) VALUES (%s, %s, %s, %s, %s, %s)",
-            (
-                user_id,
-                user_id,
-                getattr(data, "infoMail", None),
-                getattr(data, "sitoWeb", None),
-                getattr(data, "cv", None),
-                getattr(data, "ricevimento", None)
+
+        if hasattr(data, "ruolo") and data.ruolo == "insegnante":
+            # Inserisci o aggiorna in Insegnanti_Anagrafici
+            db_handler.execute_sql_insertion(
+                """
+                INSERT INTO Insegnanti_Anagrafici (id, nome, cognome, email, utente_id)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (id) DO UPDATE SET
+                    nome = EXCLUDED.nome,
+                    cognome = EXCLUDED.cognome,
+                    email = EXCLUDED.email,
+                    utente_id = EXCLUDED.utente_id
+                """,
+                (
+                    user_id,
+                    data.nome,
+                    data.cognome,
+                    data.email,
+                    user_id
+                )
             )
-        )
-    else:
-        db_handler.execute_sql_insertion(
-            "INSERT INTO Studenti (id, corso_laurea_id, matricola) VALUES (%s, %s, %s)",
-            (
-                user_id,
-                corso_laurea_id,
-                int(data.numeroDiMatricola)
+            db_handler.execute_sql_insertion(
+                "INSERT INTO Insegnanti_Registrati (id, anagrafico_id, infoMail, sitoWeb, cv, ricevimento) VALUES (%s, %s, %s, %s, %s, %s)",
+                (
+                    user_id,
+                    user_id,
+                    getattr(data, "infoMail", None),
+                    getattr(data, "sitoWeb", None),
+                    getattr(data, "cv", None),
+                    getattr(data, "ricevimento", None)
+                )
+            )
+        else:
+            db_handler.execute_sql_insertion(
+                "INSERT INTO Studenti (id, corso_laurea_id, matricola) VALUES (%s, %s, %s)",
+                (
+                    user_id,
+                    corso_laurea_id,
+                    int(data.numeroDiMatricola)
+                )
             )
-        )
 
-    # Genera token di verifica (puoi usare anche JWT)
-    verification_token = str(uuid4())
-    db_handler.execute_sql_insertion(
-        "INSERT INTO EmailVerification (user_id, token) VALUES (%s, %s)",
-        (user_id, verification_token)
-    )
-    send_verification_email(data.email, verification_token)
-    return {
-        "message": "Utente registrato con successo. Controlla la tua email per la verifica.",
-        "success": True,
-        "user_id": user_id
-    }
+        # Token di verifica (puoi usare anche JWT)
+        db_handler.execute_sql_insertion(
+            "INSERT INTO EmailVerification (user_id, token) VALUES (%s, %s)",
+            (user_id, verification_token)
+        )
+        send_verification_email(db_handler, data.email, verification_token)
+    # la mail parte dopo il commit, senza che la risposta attenda il server SMTP
+    EMAIL_OUTBOX.wake()
+    if hasattr(data, "ruolo") and data.ruolo == "insegnante":
+        # il nuovo insegnante deve comparire subito in /teachers e nei suggerimenti
+        invalidate_catalog("profile:insegnanti")
+        AUTOCOMPLETE_INDEX.refresh()
+    return user_id
 
 # -- endpoint per ottenere tutti i corsi di laurea --
 @router.get("/corsi-di-laurea")
-def get_corsi_di_laurea(db_handler: DBHandler = Depends(get_db_handler)):
+def get_corsi_di_laurea(request: Request, response: Response):
     """
-    Restituisce la lista dei corsi di laurea disponibili.
+    Restituisce la lista dei corsi di laurea disponibili (servita dalla cache di catalogo).
     """
-    try:
-        result = db_handler.run_query(
-            "SELECT id, nome FROM Corso_di_Laurea",
-            fetch=True
-        )
+    def load():
+        with pooled_handler(mode=MODE, read_only=True) as db_handler:
+            result = db_handler.run_query(
+                "SELECT id, nome FROM Corso_di_Laurea",
+                fetch=True
+            )
         if not result:
             raise HTTPException(status_code=404, detail="Nessun corso di laurea trovato.")
         return [
             {"id": row[0], "nome": row[1]}
             for row in result
         ]
+    try:
+        return cached_catalog(request, response, "auth:corsi_di_laurea", load)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Endpoint riutilizzabile per caricare file su Google Drive
-@router.post("/files/upload")
+@router.post("/files/upload", status_code=202)
 async def upload_file(
     file: UploadFile = File(...),
     parent_folder: str = Form(...), # FAQBuddy
     child_folder: str = Form(...), # CV, Materiale_Didattico, Tesi
     nome: str = Form(...),
-    cognome: str = Form(...)
+    cognome: str = Form(...),
+    db_handler: DBHandler = Depends(get_db_handler)
 ):
     """
-    Carica un file su Google Drive in una cartella specifica.
+    Carica un file su Google Drive in una cartella specifica, in background:
+    l'id del file su Drive si legge da /uploads/{job_id} a caricamento completato.
     """
     try:
-        service = get_drive_service()
-        folder_id = get_folder_id(service, parent_folder, child_folder)
         filename = f"{nome}_{cognome}_{file.filename}"
-        file_metadata = {'name': filename, 'parents': [folder_id]}
-        contents = await file.read()
-        with open(filename, "wb") as f:
-            f.write(contents)
-        from googleapiclient.http import MediaFileUpload
-        media = MediaFileUpload(filename, resumable=True)
-        uploaded = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-        os.remove(filename)
-        return JSONResponse({"file_id": uploaded.get('id'), "filename": filename})
+        # Il file viene copiato nello spool fuori dall'event loop
+        job_id = await run_in_threadpool(
+            UPLOAD_JOBS.enqueue, db_handler, "file", file.file, filename,
+            parent_folder, child_folder, file.content_type
+        )
+        return JSONResponse(
+            {"job_id": job_id, "stato": "in_coda", "status_url": f"/uploads/{job_id}", "filename": filename},
+            status_code=202
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -195,19 +225,22 @@ def verify_email(token: str, db_handler: DBHandler = Depends(get_db_handler)):
     if not result:
         raise HTTPException(status_code=400, detail="Token non valido o già usato.")
     user_id = result[0][0]
-    db_handler.execute_sql_insertion(
-        "UPDATE Utente SET email_verificata = TRUE WHERE id = %s",
-        (user_id,)
-    )
-    db_handler.execute_sql_insertion(
-        "DELETE FROM EmailVerification WHERE token = %s",
-        (token,)
-    )
+    with db_handler.unit_of_work():
+        db_handler.execute_sql_insertion(
+            "UPDATE Utente SET email_verificata = TRUE WHERE id = %s",
+            (user_id,)
+        )
+        db_handler.execute_sql_insertion(
+            "DELETE FROM EmailVerification WHERE token = %s",
+            (token,)
+        )
     return {"message": "Email verificata con successo!"}
 
 @router.post("/login")
-def login(data: LoginRequest, db_handler: DBHandler = Depends(get_db_handler)):
-    user = db_handler.run_query(
+async def login(data: LoginRequest, db_handler: DBHandler = Depends(get_db_handler)):
+    # query nel threadpool, bcrypt atteso sul pool di PASSWORD_HASHER senza occupare un thread
+    user = await run_in_threadpool(
+        db_handler.run_query,
         "SELECT id, pwd_hash, email_verificata FROM Utente WHERE email = %s",
         params=(data.email,),
         fetch=True
@@ -218,7 +251,8 @@ def login(data: LoginRequest, db_handler: DBHandler = Depends(get_db_handler)):
             detail="Utente non valido"
         )
     user_id, pwd_hash, email_verificata = user[0]
-    if not verify_password(data.password, pwd_hash):
+    password_ok, new_hash = await verify_password(data.password, pwd_hash)
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Password non valida"
@@ -228,6 +262,11 @@ def login(data: LoginRequest, db_handler: DBHandler = Depends(get_db_handler)):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Devi prima verificare la tua email"
         )
-    from ..auth.jwt_handler import create_access_token
-    access_token = create_access_token({"user_id": user_id})
-    return {"access_token": access_token}
\ No newline at end of file
+    access_token = await run_in_threadpool(_finish_login, db_handler, user_id, pwd_hash, new_hash)
+    return {"access_token": access_token}
+
+def _finish_login(db_handler: DBHandler, user_id, pwd_hash: str, new_hash) -> str:
+    # hash creato con un costo più basso di quello attuale: si aggiorna ora che si conosce la password
+    upgrade_password_hash(db_handler, user_id, pwd_hash, new_hash)
+    # ruolo, corso di laurea e id anagrafico vanno nei claim: gli endpoint non devono rileggerli
+    return create_user_token(db_handler, user_id)
\ No newline at end of file
@@ -111,6 +111,16 @@ class CourseResponse(BaseModel):
     edition_data: str
     stato: str
     voto: Optional[int] = None
+    recensito: Optional[bool] = None  # solo per i corsi completati: lo studente ha già lasciato una recensione
+
+# --- DASHBOARD PROFILO (solo le sezioni richieste sono valorizzate) ---
+class DashboardResponse(BaseModel):
+    me: Optional[UserProfileResponse] = None
+    courses_current: Optional[List[CourseResponse]] = None
+    courses_completed: Optional[List[CourseResponse]] = None
+    stats: Optional[StatsResponse] = None
+    reviews: Optional[List[ReviewResponse]] = None
+    reviews_next_cursor: Optional[str] = None
 
 # --- Edizione Corso (per visualizzare le edizioni disponibili di un corso) ---
 class CourseEditionResponse(BaseModel):
@@ -159,10 +169,13 @@ class SearchMaterials(BaseModel):
     • edizioneCorso: 'all'  oppure UUID dell'edizione (string)
     • nomeCorso:     richiesto solo se edizioneCorso == 'all'
     • dataEdizione:  richiesto solo se edizioneCorso != 'all'
+    • cursor, limit: paginazione di getMaterials/getReview (cursor = next_cursor della pagina precedente)
     """
     edizioneCorso: str
     nomeCorso: Optional[str] = None
     dataEdizione: Optional[str] = None
+    cursor: Optional[str] = None
+    limit: Optional[int] = None
 
 #Add.py
 class Semestre(BaseModel):
@@ -209,6 +222,11 @@ class AddEdizioneCorsoPiattaforma(BaseModel):
 
 class AddValutazione(BaseModel):
     matricola: int
-    path_file: str
+    # il materiale si indica con il suo id oppure con path_file, corso e semestre dell'edizione:
+    # lo stesso file può essere condiviso da più edizioni
+    id_materiale: Optional[uuid.UUID] = None
+    path_file: Optional[str] = None
+    nomeCorso: Optional[str] = None
+    semestre: Optional[Semestre] = None
     voto: int = Field(ge=1, le=5)
     commento: Optional[str]
@@ -2,9 +2,10 @@ from .BaseModel import *
 from .utils import *
 from ..utils.db_handler import DBHandler
 from ..switcher.MLmodel import MLModel
-from ..text_2_SQL import TextToSQLConverter
+from ..text_2_SQL import TextToSQLConverter, SQLExecutionGuard, SQLGuardRejection
 from ..rag.rag_adapter import RAGSystem
-from ..utils.db_utils import get_connection, MODE
+from ..utils.db_utils import MODE
+from ..utils.db_pool import get_pooled_handler
 from fastapi import APIRouter, Query
 from fastapi.responses import StreamingResponse
 import json
@@ -61,9 +62,10 @@ def handle_rag_fallback(question: str, ml_pred: str, proba: float, fallback: boo
     This ensures there's only ONE call to the RAG system for any fallback.
     """
     print("Falling back to RAG system.")
+    # la connessione non serve a RAG: torna subito al pool invece di restare occupata durante la generazione
+    db.close_connection()
     try:
         rag_result = call_rag_system(question, streaming=False, include_metadata=False)
-        db.close_connection()
         return {
             "result": rag_result["response"],
             "chosen": "RAG",
@@ -77,7 +79,6 @@ def handle_rag_fallback(question: str, ml_pred: str, proba: float, fallback: boo
             "context_used": rag_result["context_used"]
         }
     except Exception as e:
-        db.close_connection()
         return {
             "error": str(e),
             "chosen": "RAG",
@@ -95,73 +96,84 @@ def handle_t2sql_logic(question: str) -> Dict[str, Any]:
     """
     print(f"🎯 Starting T2SQL logic for question: {question}")
     
-    # Initialize DBHandler
-    db = DBHandler(get_connection(mode=MODE))
-    schema = db.get_schema()
-    print("📊 Database schema loaded")
+    # Initialize DBHandler (pooled connection, always released in the finally below)
+    db = get_pooled_handler(mode=MODE)
+    try:
+        schema = db.get_schema()
+        print("📊 Database schema loaded")
 
-    # 1. Switcher ML
-    ml_model = get_ml_model()
-    ml_pred, proba = ml_model.inference(question)
-    print(f"🤖 ML prediction: {ml_pred}, confidence: {proba}")
+        # 1. Switcher ML
+        ml_model = get_ml_model()
+        ml_pred, proba = ml_model.inference(question)
+        print(f"🤖 ML prediction: {ml_pred}, confidence: {proba}")
 
-    # 2. Fallback LLM se confidenza bassa
-    threshold = 0.7
-    fallback = False
-    if proba < threshold:
-        final_pred = "complex"
-        fallback = True
-        print(f"⚠️ Low confidence ({proba} < {threshold}), marking as complex")
-    else:
-        final_pred = ml_pred.strip().lower()
-        print(f"✅ High confidence ({proba} >= {threshold}), final prediction: {final_pred}")
+        # 2. Fallback LLM se confidenza bassa
+        threshold = 0.7
+        fallback = False
+        if proba < threshold:
+            final_pred = "complex"
+            fallback = True
+            print(f"⚠️ Low confidence ({proba} < {threshold}), marking as complex")
+        else:
+            final_pred = ml_pred.strip().lower()
+            print(f"✅ High confidence ({proba} >= {threshold}), final prediction: {final_pred}")
 
-    # 3. Routing finale
-    if final_pred == "simple":
-        print("📝 Question classified as simple, attempting SQL generation...")
-        # se entro 2 tentativi non riesco a generare una query SQL valida, faccio il fallback a RAG
-        max_attempts = 2
-        attempt = 0
-        converter = get_converter()
-        while attempt < max_attempts:
-            print(f"🔄 SQL generation attempt {attempt + 1}")
-            prompt = converter.create_prompt(question, schema)
-            raw_response = converter.query_llm(prompt)
-            sql_query = converter.clean_sql_response(raw_response)
-            print(f"💾 Generated SQL Query: {sql_query}")
-            if not converter.is_sql_safe(sql_query) or sql_query == "INVALID_QUERY":
-                print(f"❌ Attempt {attempt+1}: Invalid SQL query, retrying...")
-                attempt += 1
-                continue
-            try:
-                rows, columns = db.run_query(sql_query, fetch=True, columns=True)
-                result = [dict(zip(columns, row)) for row in rows]
-                if result:
-                    natural_response = converter.from_sql_to_text(question, result)
-                    db.close_connection()
-                    print("✅ SQL execution successful, returning T2SQL result")
-                    return {
-                        "result": result,
-                        "query": sql_query,
-                        "natural_response": natural_response,
-                        "chosen": "T2SQL",
-                        "ml_model": ml_pred,
-                        "ml_confidence": proba
-                    }
-                else:
-                    print(f"⚠️ Attempt {attempt+1}: Query returned no results, retrying...")
+        # 3. Routing finale
+        if final_pred == "simple":
+            print("📝 Question classified as simple, attempting SQL generation...")
+            # se entro 2 tentativi non riesco a generare una query SQL valida, faccio il fallback a RAG
+            max_attempts = 2
+            attempt = 0
+            converter = get_converter()
+            guard = SQLExecutionGuard(db)
+            feedback = None
+            while attempt < max_attempts:
+                print(f"🔄 SQL generation attempt {attempt + 1}")
+                prompt = converter.create_prompt(question, schema, feedback=feedback)
+                raw_response = converter.query_llm(prompt)
+                sql_query = converter.clean_sql_response(raw_response)
+                print(f"💾 Generated SQL Query: {sql_query}")
+                if not converter.is_sql_safe(sql_query) or sql_query == "INVALID_QUERY":
+                    print(f"❌ Attempt {attempt+1}: Invalid SQL query, retrying...")
+                    attempt += 1
+                    continue
+                try:
+                    # EXPLAIN + statement_timeout + transazione read-only + LIMIT
+                    rows, columns = guard.run(sql_query)
+                    result = [dict(zip(columns, row)) for row in rows]
+                    if result:
+                        natural_response = converter.from_sql_to_text(question, result)
+                        print("✅ SQL execution successful, returning T2SQL result")
+                        return {
+                            "result": result,
+                            "query": sql_query,
+                            "natural_response": natural_response,
+                            "chosen": "T2SQL",
+                            "ml_model": ml_pred,
+                            "ml_confidence": proba
+                        }
+                    else:
+                        print(f"⚠️ Attempt {attempt+1}: Query returned no results, retrying...")
+                        attempt += 1
+                except SQLGuardRejection as e:
+                    feedback = f"Query: {sql_query}\nMotivo: {e}"
+                    print(f"🛡️ Attempt {attempt+1}: Query rejected by guard, retrying... {e}")
+                    attempt += 1
+                except Exception as e:
+                    db.connection_rollback()
+                    feedback = f"Query: {sql_query}\nErrore: {e}"
+                    print(f"❌ Attempt {attempt+1}: Error executing SQL query, retrying... {e}")
                     attempt += 1
-            except Exception as e:
-                db.connection_rollback()
-                print(f"❌ Attempt {attempt+1}: Error executing SQL query, retrying... {e}")
-                attempt += 1
 
-        # Dopo 2 tentativi falliti, fallback RAG
-        print("🔄 All SQL attempts failed, falling back to RAG")
-        return handle_rag_fallback(question, ml_pred, proba, fallback, final_pred, db)
-    else:
-        print(f"🔄 Question classified as complex ({final_pred}), falling back to RAG")
-        return handle_rag_fallback(question, ml_pred, proba, fallback, final_pred, db)
+            # Dopo 2 tentativi falliti, fallback RAG
+            print("🔄 All SQL attempts failed, falling back to RAG")
+            return handle_rag_fallback(question, ml_pred, proba, fallback, final_pred, db)
+        else:
+            print(f"🔄 Question classified as complex ({final_pred}), falling back to RAG")
+            return handle_rag_fallback(question, ml_pred, proba, fallback, final_pred, db)
+    finally:
+        # anche se modello ML, LLM o guard sollevano un'eccezione la connessione torna al pool
+        db.close_connection()
 
 @router.post("/chat")
 def unified_chat_endpoint(
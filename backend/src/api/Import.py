@@ -0,0 +1,231 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, UploadFile, Form, File, Depends
+from ..utils.db_utils import MODE
+from ..utils.db_pool import get_pooled_handler
+from ..utils.db_handler import DBHandler
+from ..utils.handle_db_errors import handle_db_errors
+from ..utils.catalog_cache import invalidate_catalog
+from ..utils.autocomplete import AUTOCOMPLETE_INDEX
+from ..utils.bulk_import import ImportSpec, ImportFormatError, STAGING_TABLE, detect_format, run_import
+
+# Database connection dependency for Render: connessioni prese dal pool condiviso
+def get_db_handler():
+    db_handler = get_pooled_handler(mode=MODE)
+    try:
+        yield db_handler
+    finally:
+        db_handler.close_connection()
+
+router = APIRouter()
+
+S = STAGING_TABLE
+TRUE_VALUES = "('true', 't', '1', 'si', 'sì', 'yes')"
+BOOL_VALUES = "('true', 't', '1', 'si', 'sì', 'yes', 'false', 'f', '0', 'no')"
+SEMESTRE = "'^S[12]/[0-9]{4}$'"
+MATRICOLA = "'^[0-9]{1,9}$'"
+UUID = "'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'"
+
+
+def _reject(message: str, condition: str) -> str:
+    # Scarta le righe ancora valide che soddisfano la condizione, con il messaggio riportato all'utente
+    message = message.replace("'", "''")
+    return f"UPDATE {S} SET errore = '{message}' WHERE errore IS NULL AND ({condition})"
+
+
+def _reject_duplicates(message: str, key: str) -> str:
+    # A parità di chiave resta valida solo la prima riga del file
+    return _reject(message, f"""riga IN (
+        SELECT riga FROM (
+            SELECT riga, ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY riga) AS n
+            FROM {S} WHERE errore IS NULL
+        ) d WHERE d.n > 1
+    )""")
+
+
+def _resolve_student() -> list[str]:
+    return [
+        _reject("Matricola non valida", f"matricola !~ {MATRICOLA}"),
+        f"""UPDATE {S} s SET student_id = st.id, student_cdl = st.corso_laurea_id
+            FROM Studenti st
+            WHERE s.errore IS NULL AND st.matricola = s.matricola::INT""",
+        _reject("Matricola dello studente non trovata", "student_id IS NULL"),
+    ]
+
+
+# --- Corsi: come /addCorso ---
+IMPORT_CORSI = ImportSpec(
+    columns=["nome_corso_laurea", "nome", "cfu", "idoneita", "prerequisiti", "frequenza_obbligatoria"],
+    required=["nome_corso_laurea", "nome", "cfu", "idoneita"],
+    resolved=["cdl_id UUID"],
+    steps=[
+        _reject("Campi obbligatori mancanti", "nome_corso_laurea IS NULL OR nome IS NULL OR cfu IS NULL OR idoneita IS NULL"),
+        _reject("cfu deve essere un numero intero", "cfu !~ '^[0-9]{1,3}$'"),
+        _reject("idoneita deve essere true o false", f"lower(idoneita) NOT IN {BOOL_VALUES}"),
+        f"""UPDATE {S} s SET cdl_id = cdl.id
+            FROM Corso_di_Laurea cdl
+            WHERE s.errore IS NULL AND LOWER(cdl.nome) = LOWER(s.nome_corso_laurea)""",
+        _reject("Corso di Laurea non trovato", "cdl_id IS NULL"),
+        _reject_duplicates("Corso duplicato nel file", "LOWER(nome)"),
+        _reject("Il Corso esiste già", f"EXISTS (SELECT 1 FROM Corso c WHERE LOWER(c.nome) = LOWER({S}.nome))"),
+    ],
+    insert=f"""
+        INSERT INTO Corso (id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria)
+        SELECT cdl_id, nome, cfu::INT, lower(idoneita) IN {TRUE_VALUES}, prerequisiti, frequenza_obbligatoria
+        FROM {S} WHERE errore IS NULL
+    """,
+)
+
+# --- Edizioni dei corsi: come /addEdizioneCorso ---
+IMPORT_EDIZIONI = ImportSpec(
+    columns=["nome_corso_laurea", "nome_corso", "nome_insegnante", "cognome_insegnante",
+             "semestre", "orario", "esonero", "mod_esame"],
+    required=["nome_corso", "nome_insegnante", "cognome_insegnante", "semestre", "esonero", "mod_esame"],
+    resolved=["corso_id UUID", "insegnante_id UUID"],
+    steps=[
+        _reject("Campi obbligatori mancanti", "nome_corso IS NULL OR nome_insegnante IS NULL OR cognome_insegnante IS NULL "
+                                              "OR semestre IS NULL OR esonero IS NULL OR mod_esame IS NULL"),
+        _reject("semestre non valido (formato S1/2024)", f"semestre !~ {SEMESTRE}"),
+        _reject("esonero deve essere true o false", f"lower(esonero) NOT IN {BOOL_VALUES}"),
+        # il corso di laurea, se indicato, deve essere quello del corso
+        f"""UPDATE {S} s SET corso_id = c.id
+            FROM Corso c JOIN Corso_di_Laurea cdl ON cdl.id = c.id_corso
+            WHERE s.errore IS NULL AND LOWER(c.nome) = LOWER(s.nome_corso)
+              AND (s.nome_corso_laurea IS NULL OR LOWER(cdl.nome) = LOWER(s.nome_corso_laurea))""",
+        _reject("Corso non trovato", "corso_id IS NULL"),
+        f"""UPDATE {S} s SET insegnante_id = ia.id
+            FROM Insegnanti_Anagrafici ia
+            WHERE s.errore IS NULL
+              AND LOWER(ia.nome) = LOWER(s.nome_insegnante) AND LOWER(ia.cognome) = LOWER(s.cognome_insegnante)""",
+        _reject("L'insegnante non è stato trovato", "insegnante_id IS NULL"),
+        _reject_duplicates("Edizione duplicata nel file", "corso_id, semestre"),
+        _reject("L'edizione del corso esiste già",
+                f"EXISTS (SELECT 1 FROM EdizioneCorso e WHERE e.id = {S}.corso_id AND e.data = {S}.semestre)"),
+    ],
+    insert=f"""
+        INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_esame)
+        SELECT corso_id, insegnante_id, semestre, orario, lower(esonero) IN {TRUE_VALUES}, mod_esame
+        FROM {S} WHERE errore IS NULL
+    """,
+)
+
+# --- Corsi seguiti e voti: come /addCorsoSeguito ---
+IMPORT_CORSI_SEGUITI = ImportSpec(
+    columns=["matricola", "nome_corso", "semestre", "stato", "voto"],
+    required=["matricola", "nome_corso", "semestre"],
+    resolved=["student_id UUID", "student_cdl UUID", "corso_id UUID", "corso_cdl UUID"],
+    steps=[
+        _reject("Campi obbligatori mancanti", "matricola IS NULL OR nome_corso IS NULL OR semestre IS NULL"),
+        _reject("semestre non valido (formato S1/2024)", f"semestre !~ {SEMESTRE}"),
+        _reject("stato non valido (attivo, completato, abbandonato)",
+                "stato IS NOT NULL AND stato NOT IN ('attivo', 'completato', 'abbandonato')"),
+        _reject("voto deve essere un intero tra 18 e 31",
+                "voto IS NOT NULL AND CASE WHEN voto ~ '^[0-9]{1,2}$' THEN voto::INT NOT BETWEEN 18 AND 31 ELSE TRUE END"),
+        *_resolve_student(),
+        f"""UPDATE {S} s SET corso_id = c.id, corso_cdl = c.id_corso
+            FROM Corso c
+            WHERE s.errore IS NULL AND LOWER(c.nome) = LOWER(s.nome_corso)""",
+        _reject("Corso non trovato", "corso_id IS NULL"),
+        _reject("Il corso non fa parte del Corso di Laurea dello studente", "corso_cdl <> student_cdl"),
+        _reject("Edizione del Corso non trovata",
+                f"NOT EXISTS (SELECT 1 FROM EdizioneCorso e WHERE e.id = {S}.corso_id AND e.data = {S}.semestre)"),
+        _reject_duplicates("Iscrizione duplicata nel file", "student_id, corso_id, semestre"),
+        _reject("Lo studente risulta già iscritto all'edizione del corso", f"""EXISTS (
+            SELECT 1 FROM Corsi_seguiti cs
+            WHERE cs.student_id = {S}.student_id AND cs.edition_id = {S}.corso_id AND cs.edition_data = {S}.semestre
+        )"""),
+    ],
+    insert=f"""
+        INSERT INTO Corsi_seguiti (student_id, edition_id, edition_data, stato, voto)
+        SELECT student_id, corso_id, semestre, COALESCE(stato, 'attivo')::attend_status, voto::INT
+        FROM {S} WHERE errore IS NULL
+    """,
+)
+
+# --- Valutazioni dei materiali: come /addValutazione ---
+# Il materiale si indica con id_materiale oppure con path_file, nome_corso e semestre:
+# dopo la deduplicazione lo stesso file può essere condiviso da più edizioni
+IMPORT_VALUTAZIONI = ImportSpec(
+    columns=["matricola", "id_materiale", "path_file", "nome_corso", "semestre", "voto", "commento"],
+    required=["matricola", "voto"],
+    resolved=["student_id UUID", "student_cdl UUID", "corso_id UUID", "materiale_id UUID"],
+    steps=[
+        _reject("Campi obbligatori mancanti", "matricola IS NULL OR voto IS NULL"),
+        _reject("Indicare id_materiale oppure path_file, nome_corso e semestre",
+                "id_materiale IS NULL AND (path_file IS NULL OR nome_corso IS NULL OR semestre IS NULL)"),
+        _reject("id_materiale non valido", f"id_materiale !~* {UUID}"),
+        _reject("semestre non valido (formato S1/2024)", f"id_materiale IS NULL AND semestre !~ {SEMESTRE}"),
+        _reject("voto deve essere un intero tra 1 e 5", "voto !~ '^[1-5]$'"),
+        *_resolve_student(),
+        f"""UPDATE {S} s SET materiale_id = m.id
+            FROM Materiale_Didattico m
+            WHERE s.errore IS NULL
+              AND m.id = CASE WHEN s.id_materiale ~* {UUID} THEN s.id_materiale::UUID END""",
+        f"""UPDATE {S} s SET corso_id = c.id
+            FROM Corso c
+            WHERE s.errore IS NULL AND s.id_materiale IS NULL AND LOWER(c.nome) = LOWER(s.nome_corso)""",
+        f"""UPDATE {S} s SET materiale_id = m.id
+            FROM Materiale_Didattico m
+            WHERE s.errore IS NULL AND s.id_materiale IS NULL AND m.path_file = s.path_file
+              AND m.edition_id = s.corso_id AND m.edition_data = s.semestre""",
+        _reject("Materiale Didattico non trovato", "materiale_id IS NULL"),
+        _reject_duplicates("Valutazione duplicata nel file", "student_id, materiale_id"),
+        _reject("Valutazione già presente", f"""EXISTS (
+            SELECT 1 FROM Valutazione v
+            WHERE v.student_id = {S}.student_id AND v.id_materiale = {S}.materiale_id
+        )"""),
+    ],
+    insert=f"""
+        INSERT INTO Valutazione (student_id, id_materiale, voto, commento)
+        SELECT student_id, materiale_id, voto::INT, commento
+        FROM {S} WHERE errore IS NULL
+    """,
+)
+
+IMPORTS = {
+    "corsi": IMPORT_CORSI,
+    "edizioni": IMPORT_EDIZIONI,
+    "corsi-seguiti": IMPORT_CORSI_SEGUITI,
+    "valutazioni": IMPORT_VALUTAZIONI,
+}
+
+
+@router.post("/import/{entita}")
+@handle_db_errors
+def bulkImport(
+        entita: str,
+        file: UploadFile = File(...),
+        formato: Optional[str] = Form(None),
+        dry_run: bool = Form(False),
+        db_handler: DBHandler = Depends(get_db_handler)
+    ):
+    """
+    Importa in blocco corsi, edizioni, corsi seguiti o valutazioni da un file CSV (con intestazione)
+    o NDJSON (un oggetto JSON per riga). Le righe valide vengono inserite, quelle non valide
+    sono riportate con il numero di riga e il motivo.
+
+    Parametri:
+    - entita: corsi, edizioni, corsi-seguiti o valutazioni.
+    - file: file da importare; le colonne sono quelle di IMPORTS[entita].columns.
+    - formato: csv o ndjson (di default dedotto dall'estensione del file).
+    - dry_run: se true le righe vengono solo validate, senza inserirle.
+
+    Ritorna:
+    - righe lette, inserite, scartate ed elenco degli errori per riga.
+    """
+    spec = IMPORTS.get(entita)
+    if spec is None:
+        raise HTTPException(status_code=404, detail=f"Import non disponibile per '{entita}'. Ammessi: {', '.join(IMPORTS)}")
+    try:
+        result = run_import(db_handler, spec, file.file, detect_format(file.filename, formato), dry_run=dry_run)
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Il file deve essere codificato in UTF-8.")
+
+    if result["inserite"]:
+        if entita == "corsi":
+            invalidate_catalog()
+            AUTOCOMPLETE_INDEX.refresh()
+        elif entita == "edizioni":
+            invalidate_catalog("search:edizioni")
+    return {"message": f"Import {entita} completato", **result}
@@ -1,65 +1,106 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Body
+from fastapi.concurrency import run_in_threadpool
 from .BaseModel import *
-from typing import List
-from ..utils.db_utils import get_connection, MODE
+from typing import List, Optional
+from ..utils.db_utils import MODE
+from ..utils.db_pool import get_pooled_handler, pooled_handler
 from ..utils.db_handler import DBHandler
-from ..auth.jwt_handler import decode_access_token
+from ..utils.query_registry import register_query
+from ..utils.catalog_cache import cached_catalog, invalidate_catalog
+from ..utils.entity_resolver import ENTITY_RESOLVER
+from ..utils.storage import release_blob
+from ..utils.pagination import page_size, decode_cursor, paginate, set_next_cursor, like_pattern, MIN_TEXT, MIN_UUID
+from ..auth.context import get_auth_context, require_student, require_teacher
 from .utils import *
 from .drive_utils import *
 
 router = APIRouter()
 
-# Database connection dependency for Render
+# Database connection dependency for Render: connessioni prese dal pool condiviso
 def get_db_handler():
-    conn = get_connection(mode=MODE)
-    db_handler = DBHandler(conn)
+    db_handler = get_pooled_handler(mode=MODE)
     try:
         yield db_handler
     finally:
         db_handler.close_connection()
 
-# Funzione per ottenere l'utente corrente dal JWT
-def get_current_user(request: Request):
-    auth_header = request.headers.get("authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Token mancante")
-    token = auth_header.split(" ")[1]
+# Dependency per gli endpoint di sola lettura: autocommit, nessun COMMIT per ogni SELECT
+def get_read_db_handler():
+    db_handler = get_pooled_handler(mode=MODE, read_only=True)
     try:
-        payload = decode_access_token(token)
-        return {"user_id": payload["user_id"]}
-    except Exception:
-        raise HTTPException(status_code=401, detail="Token non valido")
+        yield db_handler
+    finally:
+        db_handler.close_connection()
+
+# Utente corrente dal JWT: user_id, ruolo, corso_laurea_id e anagrafico_id arrivano dai claim firmati
+get_current_user = get_auth_context
 
 # --- Endpoint: Ottieni tutti i corsi ---
+# Paginazione keyset su (nome, id): il cursore della pagina successiva è nell'header X-Next-Cursor
+register_query("profile_corsi_all", """
+    SELECT id, nome FROM Corso
+    WHERE (nome, id) > (%s, %s)
+    ORDER BY nome, id
+    LIMIT %s
+""")
+
+register_query("profile_corsi_cerca", """
+    SELECT id, nome FROM Corso
+    WHERE (nome, id) > (%s, %s) AND LOWER(nome) LIKE %s
+    ORDER BY nome, id
+    LIMIT %s
+""")
+
 @router.get("/courses/all")
-def get_all_courses(db_handler: DBHandler = Depends(get_db_handler)):
-    query = "SELECT id, nome FROM Corso ORDER BY nome"
-    results = db_handler.run_query(query, fetch=True)
-    return [{"id": row[0], "nome": row[1]} for row in results]
+def get_all_courses(request: Request, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None,
+                    q: Optional[str] = None):
+    # q: testo digitato nella select, filtra i corsi per nome (ricerca mentre si digita)
+    after = decode_cursor(cursor, first=(MIN_TEXT, MIN_UUID))
+    limit = page_size(limit)
+    def load():
+        with pooled_handler(mode=MODE, read_only=True) as db_handler:
+            if q:
+                results = db_handler.run_named("profile_corsi_cerca", params=(*after, like_pattern(q), limit + 1))
+            else:
+                results = db_handler.run_named("profile_corsi_all", params=(*after, limit + 1))
+        results, next_cursor = paginate(results, limit, key=lambda row: (row[1], row[0]))
+        return {"corsi": [{"id": row[0], "nome": row[1]} for row in results], "next_cursor": next_cursor}
+    if q or cursor:
+        # ricerche e pagine successive non vanno in cache: le chiavi dipenderebbero dall'input del client
+        page = load()
+        set_next_cursor(response, page["next_cursor"])
+        return page["corsi"]
+    # Prima pagina del catalogo servita dalla cache: la connessione viene presa solo in caso di miss
+    page = cached_catalog(request, response, f"profile:corsi_all:{limit}", load)
+    if isinstance(page, Response):
+        return page
+    set_next_cursor(response, page["next_cursor"])
+    return page["corsi"]
 
 
 # --- Endpoint: Ottieni info profilo utente ---
+register_query("profile_me", """
+    SELECT 
+        u.nome, u.cognome, u.email,
+        s.matricola, cdl.nome as corso_laurea,
+        i.infoMail, i.sitoWeb, i.cv, i.ricevimento,
+        CASE 
+            WHEN s.id IS NOT NULL THEN 'studente'
+            WHEN i.id IS NOT NULL THEN 'insegnante'
+            ELSE NULL
+        END as ruolo
+    FROM Utente u
+    LEFT JOIN Studenti s ON u.id = s.id
+    LEFT JOIN Corso_di_Laurea cdl ON s.corso_laurea_id = cdl.id
+    LEFT JOIN Insegnanti_Registrati i ON u.id = i.id
+    WHERE u.id = %s
+""")
+
 @router.get("/profile/me", response_model=UserProfileResponse)
-def get_profile(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_db_handler)):
+def get_profile(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_read_db_handler)):
     user_id = current_user["user_id"]
 
-    query = """
-        SELECT 
-            u.nome, u.cognome, u.email,
-            s.matricola, cdl.nome as corso_laurea,
-            i.infoMail, i.sitoWeb, i.cv, i.ricevimento,
-            CASE 
-                WHEN s.id IS NOT NULL THEN 'studente'
-                WHEN i.id IS NOT NULL THEN 'insegnante'
-                ELSE NULL
-            END as ruolo
-        FROM Utente u
-        LEFT JOIN Studenti s ON u.id = s.id
-        LEFT JOIN Corso_di_Laurea cdl ON s.corso_laurea_id = cdl.id
-        LEFT JOIN Insegnanti_Registrati i ON u.id = i.id
-        WHERE u.id = %s
-    """
-    result = db_handler.run_query(query, params=(user_id,), fetch=True)
+    result = db_handler.run_named("profile_me", params=(user_id,))
     if not result:
         raise HTTPException(status_code=404, detail="Utente non trovato")
     (
@@ -94,36 +135,39 @@ def get_profile(current_user=Depends(get_current_user), db_handler: DBHandler =
 def update_profile(data: UserProfileUpdate, current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_db_handler)):
     user_id = current_user["user_id"]
 
-    # Aggiorna Utente
-    db_handler.execute_sql_insertion(
-        "UPDATE Utente SET nome=%s, cognome=%s, email=%s WHERE id=%s",
-        (data.nome, data.cognome, data.email, user_id)
-    )
-
-    # Aggiorna Studente
-    if data.ruolo == "studente":
+    # Un'unica transazione per tutti gli aggiornamenti del profilo
+    with db_handler.unit_of_work():
+        # Aggiorna Utente
         db_handler.execute_sql_insertion(
-            "UPDATE Studenti SET matricola=%s WHERE id=%s",
-            (data.matricola, user_id)
-        )
-    # Aggiorna Insegnante
-    elif data.ruolo == "insegnante":
-        db_handler.execute_sql_insertion(
-            "UPDATE Insegnanti_Registrati SET infoMail=%s, sitoWeb=%s, ricevimento=%s, cv=%s WHERE id=%s",
-            (data.infoMail, data.sitoWeb, data.ricevimento, data.cv, user_id)
+            "UPDATE Utente SET nome=%s, cognome=%s, email=%s WHERE id=%s",
+            (data.nome, data.cognome, data.email, user_id)
         )
 
+        # Aggiorna Studente
+        if data.ruolo == "studente":
+            db_handler.execute_sql_insertion(
+                "UPDATE Studenti SET matricola=%s WHERE id=%s",
+                (data.matricola, user_id)
+            )
+        # Aggiorna Insegnante
+        elif data.ruolo == "insegnante":
+            db_handler.execute_sql_insertion(
+                "UPDATE Insegnanti_Registrati SET infoMail=%s, sitoWeb=%s, ricevimento=%s, cv=%s WHERE id=%s",
+                (data.infoMail, data.sitoWeb, data.ricevimento, data.cv, user_id)
+            )
+    # Email e matricola possono essere cambiate: il resolver le rilegge alla prossima richiesta
+    ENTITY_RESOLVER.forget_user(user_id)
+
     # Ritorna il nuovo profilo aggiornato
     return get_profile(current_user, db_handler)
 
 
 @router.post("/profile/change-password")
-def change_password(
+async def change_password(
     data: dict,
     current_user=Depends(get_current_user),
     db_handler: DBHandler = Depends(get_db_handler)
 ):
-    from passlib.hash import bcrypt
     user_id = current_user["user_id"]
     old_password = data.get("old_password")
     new_password = data.get("new_password")
@@ -132,18 +176,21 @@ def change_password(
 
     # Recupera la password attuale hashata
     query = "SELECT pwd_hash FROM Utente WHERE id = %s"
-    result = db_handler.run_query(query, params=(user_id,), fetch=True)
+    result = await run_in_threadpool(db_handler.run_query, query, params=(user_id,), fetch=True)
     if not result:
         raise HTTPException(status_code=404, detail="Utente non trovato")
     hashed = result[0][0]
 
     # Verifica la vecchia password
-    if not bcrypt.verify(old_password, hashed):
+    # bcrypt atteso sul pool di PASSWORD_HASHER, le query nel threadpool
+    password_ok, _ = await verify_password(old_password, hashed)
+    if not password_ok:
         raise HTTPException(status_code=401, detail="Vecchia password errata")
 
     # Aggiorna la password
-    new_hashed = bcrypt.hash(new_password)
-    db_handler.execute_sql_insertion(
+    new_hashed = await hash_password(new_password)
+    await run_in_threadpool(
+        db_handler.execute_sql_insertion,
         "UPDATE Utente SET pwd_hash = %s WHERE id = %s",
         (new_hashed, user_id)
     )
@@ -153,7 +200,8 @@ def change_password(
 @router.delete("/files/delete/{file_id}")
 def delete_file(file_id: str, db_handler: DBHandler = Depends(get_db_handler)):
     try:
-        delete_drive_file(file_id)
+        # il file può essere condiviso (stesso contenuto caricato più volte): si cancella solo l'ultimo riferimento
+        release_blob(db_handler, file_id)
         return {"detail": "CV eliminato"}
     except Exception as e:
         print("Errore eliminazione CV:", e)  # <--- AGGIUNGI QUESTO
@@ -166,44 +214,42 @@ def delete_file(file_id: str, db_handler: DBHandler = Depends(get_db_handler)):
 
 
 # --- Endpoint: Corsi Disponibili per un determinato studente ---
+register_query("profile_corsi_disponibili", """
+    SELECT id, nome, cfu
+    FROM Corso
+    WHERE id_corso = %s
+    AND id NOT IN (
+        SELECT c.id
+        FROM Corsi_seguiti cs
+        JOIN EdizioneCorso e ON cs.edition_id = e.id
+        JOIN Corso c ON e.id = c.id
+        WHERE cs.student_id = %s
+    )
+""")
+
 @router.get("/courses/available", response_model=List[CourseBase])
-def get_available_courses(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_db_handler)):
+def get_available_courses(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_read_db_handler)):
     user_id = current_user["user_id"]
-    # Recupera il corso di laurea dello studente
-    query_cdl = "SELECT corso_laurea_id FROM Studenti WHERE id = %s"
-    result = db_handler.run_query(query_cdl, params=(user_id,), fetch=True)
-    if not result:
-        raise HTTPException(status_code=404, detail="Studente non trovato")
-    corso_laurea_id = result[0][0]
+    # Il corso di laurea dello studente è nel token
+    corso_laurea_id = require_student(current_user)
     # Filtra i corsi per corso di laurea, escludendo quelli già seguiti o completati
-    query = """
-        SELECT id, nome, cfu
-        FROM Corso
-        WHERE id_corso = %s
-        AND id NOT IN (
-            SELECT c.id
-            FROM Corsi_seguiti cs
-            JOIN EdizioneCorso e ON cs.edition_id = e.id
-            JOIN Corso c ON e.id = c.id
-            WHERE cs.student_id = %s
-        )
-    """
-    results = db_handler.run_query(query, params=(corso_laurea_id, user_id), fetch=True)
+    results = db_handler.run_named("profile_corsi_disponibili", params=(corso_laurea_id, user_id))
     return [CourseBase(id=row[0], nome=row[1], cfu=row[2]) for row in results]
 
 
 # --- Endpoint: EdizioneCorsi Disponibili per un determinato corso ---
+register_query("profile_edizioni_corso", """
+    SELECT e.id, e.data, ia.nome, ia.cognome
+    FROM EdizioneCorso e
+    JOIN Insegnanti_Anagrafici ia ON e.insegnante_anagrafico = ia.id
+    WHERE e.id = %s
+      AND e.stato = 'attivo'
+    ORDER BY e.data DESC
+""")
+
 @router.get("/courses/{corso_id}/editions", response_model=List[CourseEditionResponse])
-def get_editions_for_course(corso_id: uuid.UUID, db_handler: DBHandler = Depends(get_db_handler)):
-    query = """
-        SELECT e.id, e.data, ia.nome, ia.cognome
-        FROM EdizioneCorso e
-        JOIN Insegnanti_Anagrafici ia ON e.insegnante_anagrafico = ia.id
-        WHERE e.id = %s
-          AND e.stato = 'attivo'
-        ORDER BY e.data DESC
-    """
-    results = db_handler.run_query(query, params=(str(corso_id),), fetch=True)
+def get_editions_for_course(corso_id: uuid.UUID, db_handler: DBHandler = Depends(get_read_db_handler)):
+    results = db_handler.run_named("profile_edizioni_corso", params=(str(corso_id),))
     return [
         CourseEditionResponse(
             id=row[0],
@@ -215,19 +261,20 @@ def get_editions_for_course(corso_id: uuid.UUID, db_handler: DBHandler = Depends
 
 
 # --- Endpoint: Dettagli di un EdizioneCorso specifico per uno studente ---
+register_query("profile_dettaglio_edizione", """
+    SELECT e.id, e.data, e.orario, e.esonero, e.mod_Esame, cs.stato, c.nome, c.cfu,
+           ia.nome as docente_nome, ia.cognome as docente_cognome, cs.voto
+    FROM EdizioneCorso e
+    JOIN Corso c ON e.id = c.id
+    LEFT JOIN Insegnanti_Anagrafici ia ON e.insegnante_anagrafico = ia.id
+    LEFT JOIN Corsi_seguiti cs ON cs.edition_id = e.id AND cs.edition_data = e.data AND cs.student_id = %s
+    WHERE e.id = %s AND e.data = %s
+""")
+
 @router.get("/courses/editions/{edition_id}/{edition_data:path}")
-def get_edition_detail(edition_id: str, edition_data: str, current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_db_handler)):
+def get_edition_detail(edition_id: str, edition_data: str, current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_read_db_handler)):
     user_id = current_user["user_id"]
-    query = """
-        SELECT e.id, e.data, e.orario, e.esonero, e.mod_Esame, cs.stato, c.nome, c.cfu,
-               ia.nome as docente_nome, ia.cognome as docente_cognome, cs.voto
-        FROM EdizioneCorso e
-        JOIN Corso c ON e.id = c.id
-        LEFT JOIN Insegnanti_Anagrafici ia ON e.insegnante_anagrafico = ia.id
-        LEFT JOIN Corsi_seguiti cs ON cs.edition_id = e.id AND cs.edition_data = e.data AND cs.student_id = %s
-        WHERE e.id = %s AND e.data = %s
-    """
-    result = db_handler.run_query(query, params=(user_id, edition_id, edition_data), fetch=True)
+    result = db_handler.run_named("profile_dettaglio_edizione", params=(user_id, edition_id, edition_data))
     if not result:
         raise HTTPException(status_code=404, detail="Edizione non trovata")
     row = result[0]
@@ -247,19 +294,20 @@ def get_edition_detail(edition_id: str, edition_data: str, current_user=Depends(
 
 
 # --- Endpoint: Corsi seguiti dallo studente che è loggato ---
+register_query("profile_corsi_correnti", """
+    SELECT c.id, c.nome, c.cfu, ia.nome as docente_nome, ia.cognome as docente_cognome, 
+           e.id as edition_id, e.data as edition_data, cs.stato
+    FROM Corsi_seguiti cs
+    JOIN EdizioneCorso e ON cs.edition_id = e.id AND cs.edition_data = e.data
+    JOIN Corso c ON e.id = c.id
+    LEFT JOIN Insegnanti_Anagrafici ia ON e.insegnante_anagrafico = ia.id
+    WHERE cs.student_id = %s
+""")
+
 @router.get("/profile/courses/current", response_model=list[CourseResponse])
-def get_current_courses(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_db_handler)):
+def get_current_courses(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_read_db_handler)):
     user_id = current_user["user_id"]
-    query = """
-        SELECT c.id, c.nome, c.cfu, ia.nome as docente_nome, ia.cognome as docente_cognome, 
-               e.id as edition_id, e.data as edition_data, cs.stato
-        FROM Corsi_seguiti cs
-        JOIN EdizioneCorso e ON cs.edition_id = e.id AND cs.edition_data = e.data
-        JOIN Corso c ON e.id = c.id
-        LEFT JOIN Insegnanti_Anagrafici ia ON e.insegnante_anagrafico = ia.id
-        WHERE cs.student_id = %s
-    """
-    results = db_handler.run_query(query, params=(user_id,), fetch=True)
+    results = db_handler.run_named("profile_corsi_correnti", params=(user_id,))
     return [
         CourseResponse(
             id=row[0],
@@ -275,19 +323,24 @@ def get_current_courses(current_user=Depends(get_current_user), db_handler: DBHa
     ]
 
 # --- Endpoint: Corsi completati dallo studente che è loggato---
+register_query("profile_corsi_completati", """
+    SELECT c.id, c.nome, c.cfu, ia.nome as docente_nome, ia.cognome as docente_cognome, 
+           e.id as edition_id, e.data as edition_data, cs.stato, cs.voto,
+           EXISTS (
+               SELECT 1 FROM Review r
+               WHERE r.student_id = cs.student_id AND r.edition_id = e.id AND r.edition_data = e.data
+           ) as recensito
+    FROM Corsi_seguiti cs
+    JOIN EdizioneCorso e ON cs.edition_id = e.id AND cs.edition_data = e.data
+    JOIN Corso c ON e.id = c.id
+    LEFT JOIN Insegnanti_Anagrafici ia ON e.insegnante_anagrafico = ia.id
+    WHERE cs.student_id = %s AND cs.stato = 'completato'
+""")
+
 @router.get("/profile/courses/completed", response_model=list[CourseResponse])
-def get_completed_courses(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_db_handler)):
+def get_completed_courses(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_read_db_handler)):
     user_id = current_user["user_id"]
-    query = """
-        SELECT c.id, c.nome, c.cfu, ia.nome as docente_nome, ia.cognome as docente_cognome, 
-               e.id as edition_id, e.data as edition_data, cs.stato, cs.voto
-        FROM Corsi_seguiti cs
-        JOIN EdizioneCorso e ON cs.edition_id = e.id AND cs.edition_data = e.data
-        JOIN Corso c ON e.id = c.id
-        LEFT JOIN Insegnanti_Anagrafici ia ON e.insegnante_anagrafico = ia.id
-        WHERE cs.student_id = %s AND cs.stato = 'completato'
-    """
-    results = db_handler.run_query(query, params=(user_id,), fetch=True)
+    results = db_handler.run_named("profile_corsi_completati", params=(user_id,))
     return [
         CourseResponse(
             id=row[0],
@@ -298,7 +351,8 @@ def get_completed_courses(current_user=Depends(get_current_user), db_handler: DB
             edition_id=row[5],
             edition_data=row[6],
             stato=row[7],
-            voto=row[8]
+            voto=row[8],
+            recensito=row[9]
         )
         for row in results
     ]
@@ -375,33 +429,67 @@ def restore_course(
     user_id = current_user["user_id"]
     edition_data = data["edition_data"]
 
-    # 1. Elimina la recensione associata (se esiste)
     delete_review_query = """
         DELETE FROM Review
         WHERE student_id = %s AND edition_id = %s AND edition_data = %s
     """
-    db_handler.run_query(delete_review_query, params=(user_id, edition_id, edition_data), fetch=False)
-
-    # 2. Aggiorna lo stato e azzera il voto in Corsi_seguiti
     update_course_query = """
         UPDATE Corsi_seguiti
         SET stato = 'attivo', voto = NULL
         WHERE student_id = %s AND edition_id = %s AND edition_data = %s
     """
-    db_handler.run_query(update_course_query, params=(user_id, edition_id, edition_data), fetch=False)
+    # Le due operazioni sono atomiche: o entrambe o nessuna
+    with db_handler.unit_of_work():
+        # 1. Elimina la recensione associata (se esiste)
+        db_handler.run_query(delete_review_query, params=(user_id, edition_id, edition_data), fetch=False)
+        # 2. Aggiorna lo stato e azzera il voto in Corsi_seguiti
+        db_handler.run_query(update_course_query, params=(user_id, edition_id, edition_data), fetch=False)
 
     return {"detail": "Corso ripristinato tra quelli attivi, recensione e voto eliminati"}
 
 
 # --- Endpoint: per ottenere tutti gli insegnanti ---
+register_query("profile_insegnanti", """
+    SELECT ia.id, ia.nome, ia.cognome
+    FROM Insegnanti_Anagrafici ia
+    WHERE (ia.cognome, ia.nome, ia.id) > (%s, %s, %s)
+    ORDER BY ia.cognome, ia.nome, ia.id
+    LIMIT %s
+""")
+
+register_query("profile_insegnanti_cerca", """
+    SELECT ia.id, ia.nome, ia.cognome
+    FROM Insegnanti_Anagrafici ia
+    WHERE (ia.cognome, ia.nome, ia.id) > (%s, %s, %s)
+      AND LOWER(ia.nome || ' ' || ia.cognome || ' ' || ia.nome) LIKE %s
+    ORDER BY ia.cognome, ia.nome, ia.id
+    LIMIT %s
+""")
+
 @router.get("/teachers")
-def get_teachers(db_handler: DBHandler = Depends(get_db_handler)):
-    query = """
-        SELECT ia.id, ia.nome, ia.cognome
-        FROM Insegnanti_Anagrafici ia
-    """
-    results = db_handler.run_query(query, fetch=True)
-    return [{"id": row[0], "nome": row[1], "cognome": row[2]} for row in results]
+def get_teachers(request: Request, response: Response, cursor: Optional[str] = None, limit: Optional[int] = None,
+                 q: Optional[str] = None):
+    # q: testo digitato nella select, filtra per nome e cognome in qualunque ordine ("mario ro", "rossi")
+    after = decode_cursor(cursor, first=(MIN_TEXT, MIN_TEXT, MIN_UUID))
+    limit = page_size(limit)
+    def load():
+        with pooled_handler(mode=MODE, read_only=True) as db_handler:
+            if q:
+                results = db_handler.run_named("profile_insegnanti_cerca", params=(*after, like_pattern(q), limit + 1))
+            else:
+                results = db_handler.run_named("profile_insegnanti", params=(*after, limit + 1))
+        results, next_cursor = paginate(results, limit, key=lambda row: (row[2], row[1], row[0]))
+        return {"insegnanti": [{"id": row[0], "nome": row[1], "cognome": row[2]} for row in results], "next_cursor": next_cursor}
+    if q or cursor:
+        # ricerche e pagine successive non vanno in cache: le chiavi dipenderebbero dall'input del client
+        page = load()
+        set_next_cursor(response, page["next_cursor"])
+        return page["insegnanti"]
+    page = cached_catalog(request, response, f"profile:insegnanti:{limit}", load)
+    if isinstance(page, Response):
+        return page
+    set_next_cursor(response, page["next_cursor"])
+    return page["insegnanti"]
 
 
 
@@ -413,27 +501,29 @@ def add_edizione_and_enroll(
     current_user=Depends(get_current_user),
     db_handler: DBHandler = Depends(get_db_handler)
 ):
-    # 1. Crea la nuova EdizioneCorso
+    user_id = current_user["user_id"]
     query = """
         INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame)
         VALUES (%s, %s, %s, %s, %s, %s)
     """
-    db_handler.run_query(query, params=(
-        corso_id,
-        edizione.insegnante,
-        edizione.data,
-        edizione.orario,
-        edizione.esonero,
-        edizione.mod_Esame
-    ))
-
-    # 2. Iscrivi lo studente a questa edizione con lo stato scelto
-    user_id = current_user["user_id"]
     query2 = """
         INSERT INTO Corsi_seguiti (student_id, edition_id, edition_data, stato)
         VALUES (%s, %s, %s, %s)
     """
-    db_handler.run_query(query2, params=(user_id, corso_id, edizione.data, edizione.stato))
+    # Creazione dell'edizione e iscrizione in un'unica transazione
+    with db_handler.unit_of_work():
+        # 1. Crea la nuova EdizioneCorso
+        db_handler.run_query(query, params=(
+            corso_id,
+            edizione.insegnante,
+            edizione.data,
+            edizione.orario,
+            edizione.esonero,
+            edizione.mod_Esame
+        ))
+        # 2. Iscrivi lo studente a questa edizione con lo stato scelto
+        db_handler.run_query(query2, params=(user_id, corso_id, edizione.data, edizione.stato))
+    invalidate_catalog("search:edizioni")
 
     return {"detail": "EdizioneCorso creata e studente iscritto"}
 
@@ -443,18 +533,19 @@ def add_edizione_and_enroll(
 
 
 # --- Endpoint: per ottenere i corsi dell'insegnante che è loggato ---
+register_query("profile_corsi_insegnante", """
+    SELECT c.id, c.nome, c.cfu, 
+           e.id as edition_id, e.data as edition_data, e.mod_Esame, e.orario, e.esonero, e.stato
+    FROM EdizioneCorso e
+    JOIN Corso c ON e.id = c.id
+    WHERE e.insegnante_anagrafico = %s
+    ORDER BY c.nome, e.data DESC
+""")
+
 @router.get("/teacher/courses/full")
-def get_teacher_courses_full(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_db_handler)):
-    user_id = current_user["user_id"]
-    query = """
-        SELECT c.id, c.nome, c.cfu, 
-               e.id as edition_id, e.data as edition_data, e.mod_Esame, e.orario, e.esonero, e.stato
-        FROM EdizioneCorso e
-        JOIN Corso c ON e.id = c.id
-        WHERE e.insegnante_anagrafico = %s
-        ORDER BY c.nome, e.data DESC
-    """
-    results = db_handler.run_query(query, params=(user_id,), fetch=True, rollback=True)
+def get_teacher_courses_full(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_read_db_handler)):
+    anagrafico_id = require_teacher(current_user)
+    results = db_handler.run_named("profile_corsi_insegnante", params=(anagrafico_id,))
     corsi = {}
     for row in results:
         corso_id = row[0]
@@ -485,10 +576,10 @@ def update_edition(
     current_user=Depends(get_current_user),
     db_handler: DBHandler = Depends(get_db_handler)
 ):
-    user_id = current_user["user_id"]
+    anagrafico_id = require_teacher(current_user)
     # Cambia "insegnante" in "insegnante_anagrafico"
     query_check = "SELECT data FROM EdizioneCorso WHERE id = %s AND insegnante_anagrafico = %s"
-    old_data_result = db_handler.run_query(query_check, params=(edition_id, user_id), fetch=True, rollback=True)
+    old_data_result = db_handler.run_query(query_check, params=(edition_id, anagrafico_id), fetch=True, rollback=True)
     if not old_data_result:
         raise HTTPException(status_code=403, detail="Non autorizzato")
     old_data = old_data_result[0][0]
@@ -507,6 +598,7 @@ def update_edition(
     query = f"UPDATE EdizioneCorso SET {', '.join(set_clauses)} WHERE id = %s AND data = %s"
     values.extend([edition_id, old_data])
     db_handler.run_query(query, params=tuple(values), rollback=True)
+    invalidate_catalog("search:edizioni")
     return {"detail": "Edizione aggiornata"}
 
 
@@ -518,7 +610,7 @@ def add_edition_teacher(
     current_user=Depends(get_current_user),
     db_handler: DBHandler = Depends(get_db_handler)
 ):
-    user_id = current_user["user_id"]
+    anagrafico_id = require_teacher(current_user)
     # Inserisci la nuova EdizioneCorso
     query = """
         INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame, stato)
@@ -526,13 +618,14 @@ def add_edition_teacher(
     """
     db_handler.run_query(query, params=(
         corso_id,
-        user_id,
+        anagrafico_id,
         edizione.data,
         edizione.orario,
         edizione.esonero,
         edizione.mod_Esame,
         getattr(edizione, "stato", "attivo")
     ))
+    invalidate_catalog("search:edizioni")
     return {"detail": "EdizioneCorso creata"}
 
 
@@ -546,77 +639,63 @@ def add_edition_teacher(
 
 
 # --- Endpoint: Statistiche dello studente, voti conseguiti, media, cose del genere ---
-@router.get("/profile/stats", response_model=StatsResponse)
-def get_stats(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_db_handler)):
-    user_id = current_user["user_id"]
-    # Prendi tutti i corsi completati, aggiungi c.id
-    query = """
-        SELECT c.nome, cs.voto, c.cfu, c.id
-        FROM Corsi_seguiti cs
-        JOIN EdizioneCorso e ON cs.edition_id = e.id AND cs.edition_data = e.data
-        JOIN Corso c ON e.id = c.id
-        WHERE cs.student_id = %s AND cs.stato = 'completato' AND cs.voto >= 18
-    """
-    results = db_handler.run_query(query, params=(user_id,), fetch=True)
-    esami = [row[0] for row in results]
-    voti = [row[1] for row in results]
-    cfu = [row[2] for row in results]
-    esami_id = [row[3] for row in results]  # <--- aggiungi questa riga
-    
-    # Prendi i CFU totali del corso di laurea dello studente
-    query_cfu_totali = """
-        SELECT cfu_totali
-        from corso_di_laurea
-        JOIN studenti s ON corso_di_laurea.id = s.corso_laurea_id
-        WHERE s.id = %s
-    """
-    results_cfu_totali = db_handler.run_query(query_cfu_totali, params=(user_id,), fetch=True)
-    cfu_totali = results_cfu_totali[0][0] if results_cfu_totali else 0
-    
-    cfu_completati = sum(cfu)  # tutti quelli trovati sono completati
-    media_aritmetica = round(sum(voti) / len(voti), 2) if voti else 0
-    media_ponderata = round(sum(v * c for v, c in zip(voti, cfu)) / sum(cfu), 2) if cfu else 0
+# Aggregati mantenuti dai trigger su Corsi_seguiti (db/migrations/004_statistiche_studente.sql):
+# una lettura per chiave primaria invece delle JOIN su tutti i corsi seguiti
+# il corso di laurea arriva dal token: niente JOIN su Studenti
+register_query("profile_stats", """
+    SELECT st.esami, st.esami_superati, st.somma_voti, st.somma_voti_cfu, st.cfu_completati, cdl.cfu_totali
+    FROM Corso_di_Laurea cdl
+    LEFT JOIN Statistiche_Studente st ON st.student_id = %s
+    WHERE cdl.id = %s
+""")
+
+def build_stats(esami, esami_superati, somma_voti, somma_voti_cfu, cfu_completati, cfu_totali) -> StatsResponse:
+    # Studente senza corsi completati: la riga delle statistiche non esiste ancora
+    esami = esami or []
+    cfu_completati = cfu_completati or 0
+    media_aritmetica = round(somma_voti / esami_superati, 2) if esami_superati else 0
+    media_ponderata = round(somma_voti_cfu / cfu_completati, 2) if cfu_completati else 0
     return StatsResponse(
-        esami=esami,
-        voti=voti,
-        cfu=cfu,
-        esami_id=esami_id,  # <--- aggiungi questo campo
+        esami=[esame["nome"] for esame in esami],
+        voti=[esame["voto"] for esame in esami],
+        cfu=[esame["cfu"] for esame in esami],
+        esami_id=[esame["id"] for esame in esami],
         media_aritmetica=media_aritmetica,
         media_ponderata=media_ponderata,
-        cfu_totali=cfu_totali,
+        cfu_totali=cfu_totali or 0,
         cfu_completati=cfu_completati
     )
 
+@router.get("/profile/stats", response_model=StatsResponse)
+def get_stats(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_read_db_handler)):
+    user_id = current_user["user_id"]
+    result = db_handler.run_named("profile_stats", params=(user_id, require_student(current_user)))
+    return build_stats(*(result[0] if result else (None, 0, 0, 0, 0, 0)))
+
 
 # --- Endpoint: Corsi del corso di laurea non ancora completati dallo studente che è loggato ---
 # --- Serve per simualre gli esami ---
+register_query("profile_corsi_non_completati", """
+    SELECT c.id, c.nome, c.cfu
+    FROM Corso c
+    WHERE c.id_corso = %s
+    AND c.id <> ALL(COALESCE(
+        (SELECT st.corsi_completati FROM Statistiche_Studente st WHERE st.student_id = %s),
+        '{}'
+    ))
+    ORDER BY c.nome
+""")
+
 @router.get("/courses/not-completed", response_model=List[CourseBase])
 def get_not_completed_courses(
         current_user=Depends(get_current_user), 
-        db_handler: DBHandler = Depends(get_db_handler)):
+        db_handler: DBHandler = Depends(get_read_db_handler)):
     
     user_id = current_user["user_id"]
-    # Recupera il corso di laurea dello studente
-    query_cdl = "SELECT corso_laurea_id FROM Studenti WHERE id = %s"
-    result = db_handler.run_query(query_cdl, params=(user_id,), fetch=True)
-    if not result:
-        raise HTTPException(status_code=404, detail="Studente non trovato")
-    corso_laurea_id = result[0][0]
+    # Il corso di laurea dello studente è nel token
+    corso_laurea_id = require_student(current_user)
     # Prendi tutti i corsi del corso di laurea che NON sono stati completati
-    query = """
-        SELECT c.id, c.nome, c.cfu
-        FROM Corso c
-        WHERE c.id_corso = %s
-        AND c.id NOT IN (
-            SELECT c2.id
-            FROM Corsi_seguiti cs
-            JOIN EdizioneCorso e ON cs.edition_id = e.id AND cs.edition_data = e.data
-            JOIN Corso c2 ON e.id = c2.id
-            WHERE cs.student_id = %s AND cs.stato = 'completato'
-        )
-        ORDER BY c.nome
-    """
-    results = db_handler.run_query(query, params=(corso_laurea_id, user_id), fetch=True)
+    results = db_handler.run_named("profile_corsi_non_completati", params=(corso_laurea_id, user_id))
     return [CourseBase(id=row[0], nome=row[1], cfu=row[2]) for row in results]
 
 
@@ -630,15 +709,27 @@ def get_not_completed_courses(
 
 
 # --- Endpoint: Recensioni dello studente ---
+register_query("profile_recensioni", """
+    SELECT id, student_id, edition_id, edition_data, descrizione, voto
+    FROM Review
+    WHERE student_id = %s AND id > %s
+    ORDER BY id
+    LIMIT %s
+""")
+
 @router.get("/profile/reviews", response_model=list[ReviewResponse])
-def get_student_reviews(current_user=Depends(get_current_user), db_handler: DBHandler = Depends(get_db_handler)):
+def get_student_reviews(
+        response: Response,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        current_user=Depends(get_current_user),
+        db_handler: DBHandler = Depends(get_read_db_handler)):
     user_id = current_user["user_id"]
-    query = """
-        SELECT id, student_id, edition_id, edition_data, descrizione, voto
-        FROM Review
-        WHERE student_id = %s
-    """
-    results = db_handler.run_query(query, params=(user_id,), fetch=True)
+    (after_id,) = decode_cursor(cursor, first=(MIN_UUID,))
+    limit = page_size(limit)
+    results = db_handler.run_named("profile_recensioni", params=(user_id, after_id, limit + 1))
+    results, next_cursor = paginate(results, limit, key=lambda row: (row[0],))
+    set_next_cursor(response, next_cursor)
     return [
         ReviewResponse(
             id=row[0],
@@ -686,3 +777,117 @@ def add_review(
         descrizione=data.descrizione,
         voto=data.voto
     )
+
+
+
+
+####### DASHBOARD ########
+
+
+# --- Endpoint: Dashboard del profilo, tutte le sezioni richieste in una sola query ---
+# Ogni sezione è una subquery LATERAL che diventa JSON (json_build_object/json_agg):
+# le sezioni non richieste hanno un filtro costante falso e non vengono eseguite
+DASHBOARD_SECTIONS = ("me", "courses_current", "courses_completed", "stats", "reviews")
+
+register_query("profile_dashboard", """
+    WITH p AS (SELECT %s::uuid AS user_id, %s::text[] AS sezioni, %s::int AS limite)
+    SELECT me.dati, corsi.correnti, corsi.completati, stats.dati, recensioni.dati
+    FROM p
+    LEFT JOIN LATERAL (
+        SELECT json_build_object(
+            'nome', u.nome, 'cognome', u.cognome, 'email', u.email,
+            'matricola', s.matricola, 'corso_laurea', cdl.nome,
+            'infoMail', i.infoMail, 'sitoWeb', i.sitoWeb, 'cv', i.cv, 'ricevimento', i.ricevimento,
+            'ruolo', CASE
+                WHEN s.id IS NOT NULL THEN 'studente'
+                WHEN i.id IS NOT NULL THEN 'insegnante'
+                ELSE NULL
+            END
+        ) AS dati
+        FROM Utente u
+        LEFT JOIN Studenti s ON u.id = s.id
+        LEFT JOIN Corso_di_Laurea cdl ON s.corso_laurea_id = cdl.id
+        LEFT JOIN Insegnanti_Registrati i ON u.id = i.id
+        WHERE u.id = p.user_id AND 'me' = ANY(p.sezioni)
+    ) me ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT
+            json_agg(corso.dati) AS correnti,
+            json_agg(corso.dati) FILTER (WHERE corso.stato = 'completato') AS completati
+        FROM (
+            SELECT cs.stato, json_build_object(
+                'id', c.id, 'nome', c.nome, 'cfu', c.cfu,
+                'docente_nome', ia.nome, 'docente_cognome', ia.cognome,
+                'edition_id', e.id, 'edition_data', e.data, 'stato', cs.stato, 'voto', cs.voto,
+                'recensito', CASE WHEN cs.stato = 'completato' THEN EXISTS (
+                    SELECT 1 FROM Review r
+                    WHERE r.student_id = cs.student_id AND r.edition_id = e.id AND r.edition_data = e.data
+                ) END
+            ) AS dati
+            FROM Corsi_seguiti cs
+            JOIN EdizioneCorso e ON cs.edition_id = e.id AND cs.edition_data = e.data
+            JOIN Corso c ON e.id = c.id
+            LEFT JOIN Insegnanti_Anagrafici ia ON e.insegnante_anagrafico = ia.id
+            WHERE cs.student_id = p.user_id
+              AND p.sezioni && ARRAY['courses_current', 'courses_completed']
+        ) corso
+    ) corsi ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT json_build_object(
+            'esami', st.esami, 'esami_superati', st.esami_superati,
+            'somma_voti', st.somma_voti, 'somma_voti_cfu', st.somma_voti_cfu,
+            'cfu_completati', st.cfu_completati, 'cfu_totali', cdl.cfu_totali
+        ) AS dati
+        FROM Studenti s
+        JOIN Corso_di_Laurea cdl ON cdl.id = s.corso_laurea_id
+        LEFT JOIN Statistiche_Studente st ON st.student_id = s.id
+        WHERE s.id = p.user_id AND 'stats' = ANY(p.sezioni)
+    ) stats ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+            'id', r.id, 'student_id', r.student_id, 'edition_id', r.edition_id,
+            'edition_data', r.edition_data, 'descrizione', r.descrizione, 'voto', r.voto
+        ) ORDER BY r.id) AS dati
+        FROM (
+            SELECT * FROM Review
+            WHERE student_id = p.user_id AND 'reviews' = ANY(p.sezioni)
+            ORDER BY id
+            LIMIT p.limite + 1
+        ) r
+    ) recensioni ON TRUE
+""")
+
+@router.get("/profile/dashboard", response_model=DashboardResponse)
+def get_dashboard(
+        sections: Optional[str] = None,
+        limit: Optional[int] = None,
+        current_user=Depends(get_current_user),
+        db_handler: DBHandler = Depends(get_read_db_handler)):
+    # sections: elenco separato da virgole (es. "me,stats"), se assente vengono restituite tutte;
+    # le sezioni non richieste restano null nella risposta.
+    # Le recensioni sono la prima pagina di /profile/reviews: le successive si chiedono a quell'endpoint con reviews_next_cursor
+    user_id = current_user["user_id"]
+    sezioni = [s.strip() for s in sections.split(",") if s.strip()] if sections else list(DASHBOARD_SECTIONS)
+    sconosciute = [s for s in sezioni if s not in DASHBOARD_SECTIONS]
+    if sconosciute:
+        raise HTTPException(status_code=400, detail=f"Sezioni non valide: {', '.join(sconosciute)}")
+    limit = page_size(limit)
+
+    result = db_handler.run_named("profile_dashboard", params=(user_id, sezioni, limit))
+    me, correnti, completati, stats, recensioni = result[0]
+
+    dashboard = DashboardResponse()
+    if "me" in sezioni:
+        if me is None:
+            raise HTTPException(status_code=404, detail="Utente non trovato")
+        dashboard.me = UserProfileResponse(**me)
+    if "courses_current" in sezioni:
+        dashboard.courses_current = [CourseResponse(**corso) for corso in correnti or []]
+    if "courses_completed" in sezioni:
+        dashboard.courses_completed = [CourseResponse(**corso) for corso in completati or []]
+    if "stats" in sezioni and stats is not None:
+        dashboard.stats = build_stats(**stats)
+    if "reviews" in sezioni:
+        recensioni, dashboard.reviews_next_cursor = paginate(recensioni or [], limit, key=lambda r: (r["id"],))
+        dashboard.reviews = [ReviewResponse(**r) for r in recensioni]
+    return dashboard
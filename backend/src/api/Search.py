@@ -1,79 +1,138 @@
 from uuid import uuid4
 import bcrypt
-from ..utils.db_utils import get_connection, MODE
+from ..utils.db_utils import MODE
+from ..utils.db_pool import get_pooled_handler, pooled_handler
 from ..utils.db_handler import DBHandler
-from fastapi import APIRouter, HTTPException, status, Depends
+from ..utils.query_registry import register_query
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response, Query
+from ..utils.catalog_cache import cached_catalog
+from ..utils.autocomplete import AUTOCOMPLETE_INDEX
+from ..utils.pagination import page_size, decode_cursor, paginate, MIN_UUID
 from .BaseModel import SearchCorsi, SearchEdizione, SearchMaterials
 
 
-# Database connection dependency for Render
+# Database connection dependency for Render: connessioni prese dal pool condiviso,
+# in autocommit perché il router esegue solo letture
 def get_db_handler():
-    conn = get_connection(mode=MODE)
-    db_handler = DBHandler(conn)
+    db_handler = get_pooled_handler(mode=MODE, read_only=True)
     try:
         yield db_handler
     finally:
         db_handler.close_connection()
 
+# --- Query preparate (PREPARE una volta per connessione, poi EXECUTE per nome) ---
+register_query("search_corsi_laurea", """SELECT DISTINCT nome FROM Corso_di_Laurea""")
+register_query("search_corsi", """
+        SELECT DISTINCT c.nome
+        FROM Corso AS c 
+        JOIN Corso_di_Laurea AS cdl ON c.id_corso = cdl.id
+        WHERE cdl.nome = %s
+        """)
+register_query("search_edizioni", """
+        SELECT DISTINCT c.nome, e.data, e.id
+        FROM Corso c JOIN EdizioneCorso e ON c.id = e.id
+        WHERE c.nome = %s
+        """)
+# Materiali e recensioni sono paginati per id (keyset): l'ultima colonna è la chiave del cursore
+register_query("search_materiali_corso", """
+                SELECT md.path_file, md.tipo, md.verificato, md.rating_medio, md.id
+                FROM Materiale_Didattico md
+                JOIN EdizioneCorso ed ON md.edition_id = ed.id AND md.edition_data = ed.data
+                JOIN Corso c ON c.id = ed.id
+                WHERE c.nome = %s AND md.id > %s
+                ORDER BY md.id
+                LIMIT %s
+                """)
+register_query("search_materiali_edizione", """
+                SELECT md.path_file, md.tipo, md.verificato, md.rating_medio, md.id
+                FROM Materiale_Didattico md
+                WHERE md.edition_id = %s AND md.edition_data = %s AND md.id > %s
+                ORDER BY md.id
+                LIMIT %s
+                """)
+register_query("search_info_corso", """
+                SELECT c.nome,ed.data,i.nome,i.cognome,i.email,c.cfu,c.idoneità, ed.orario, ed.esonero, ed.mod_Esame,c.prerequisiti,c.frequenza_obbligatoria
+                FROM EdizioneCorso ed
+                JOIN Corso c ON c.id = ed.id
+                JOIN Insegnanti_Anagrafici i ON ed.insegnante_anagrafico = i.id
+                WHERE c.nome = %s
+                """)
+register_query("search_info_edizione", """
+                SELECT c.nome,ed.data,i.nome,i.cognome,i.email,c.cfu,c.idoneità, ed.orario, ed.esonero, ed.mod_Esame,c.prerequisiti,c.frequenza_obbligatoria
+                FROM EdizioneCorso ed
+                JOIN Insegnanti_Anagrafici i ON ed.insegnante_anagrafico = i.id
+                JOIN Corso c ON c.id = ed.id
+                WHERE ed.id = %s AND ed.data = %s
+                """)
+register_query("search_review_corso", """
+                SELECT r.descrizione, r.voto, r.id
+                FROM EdizioneCorso ed
+                JOIN Corso c ON c.id = ed.id
+                JOIN Review r ON r.edition_id = ed.id AND edition_data=ed.data
+                WHERE c.nome = %s AND r.id > %s
+                ORDER BY r.id
+                LIMIT %s
+                """)
+register_query("search_review_edizione", """
+                SELECT r.descrizione, r.voto, r.id
+                FROM Review r
+                WHERE r.edition_id = %s AND r.edition_data = %s AND r.id > %s
+                ORDER BY r.id
+                LIMIT %s
+                """)
+
 router = APIRouter()
 
 
-@router.get("/getCorsoLaurea")
-def getCorsoLaurea(db_handler: DBHandler = Depends(get_db_handler)):
+# Liste di catalogo (corsi di laurea, corsi, edizioni): servite dalla cache in memoria,
+# la connessione dal pool viene presa solo in caso di miss
+def _load_corsi_laurea():
+    with pooled_handler(mode=MODE, read_only=True) as db_handler:
+        corsiLaurea = db_handler.run_named("search_corsi_laurea")
     message = "Lista nomi corsi Laurea"
-    corsiLaurea = db_handler.run_query(
-        "SELECT DISTINCT nome FROM Corso_di_Laurea",
-        fetch=True
-    )
     if not corsiLaurea:
         message = "Nessun corso di Laurea trovato"
-
-    return{
+    return {
         "message" : message,
         "nomi" : corsiLaurea
     }
 
+@router.get("/getCorsoLaurea")
+def getCorsoLaurea(request: Request, response: Response):
+    return cached_catalog(request, response, "search:corsi_laurea", _load_corsi_laurea)
+
 @router.post("/getCorso")
-def getCorso(data: SearchCorsi, db_handler: DBHandler = Depends(get_db_handler)):
-    message = "Lista nomi Corsi"
-    corsi = db_handler.run_query(
-        """
-        SELECT DISTINCT c.nome
-        FROM Corso AS c 
-        JOIN Corso_di_Laurea AS cdl ON c.id_corso = cdl.id
-        WHERE cdl.nome = %s
-        """,
-        params=(data.nomeCorso,),
-        fetch=True
-    )
-    if not corsi:
-        message = "nessuno corso trovato"
-    return {
-        "message": message,
-        "nomi": corsi
-    }
+def getCorso(data: SearchCorsi, request: Request, response: Response):
+    def load():
+        with pooled_handler(mode=MODE, read_only=True) as db_handler:
+            corsi = db_handler.run_named("search_corsi", params=(data.nomeCorso,))
+        message = "Lista nomi Corsi"
+        if not corsi:
+            message = "nessuno corso trovato"
+        return {
+            "message": message,
+            "nomi": corsi
+        }
+    return cached_catalog(request, response, f"search:corsi:{data.nomeCorso}", load)
 
 @router.post("/getEdizione")
-def getEdizione(data: SearchEdizione, db_handler: DBHandler = Depends(get_db_handler)):
-    message = "Lista edizione corsi"
-    edizioniCorsi = db_handler.run_query(
-        """
-        SELECT DISTINCT c.nome, e.data, e.id
-        FROM Corso c JOIN EdizioneCorso e ON c.id = e.id
-        WHERE c.nome = %s
-        """,
-        params=(data.nomeCorso,),
-        fetch=True
-    )
-    if not edizioniCorsi:
-        message = "nessuna edizione del corso trovata"
-    return {
-        "message" : message,
-        "edizioni" : edizioniCorsi
-    }
+def getEdizione(data: SearchEdizione, request: Request, response: Response):
+    def load():
+        with pooled_handler(mode=MODE, read_only=True) as db_handler:
+            edizioniCorsi = db_handler.run_named("search_edizioni", params=(data.nomeCorso,))
+        message = "Lista edizione corsi"
+        if not edizioniCorsi:
+            message = "nessuna edizione del corso trovata"
+        return {
+            "message" : message,
+            "edizioni" : edizioniCorsi
+        }
+    return cached_catalog(request, response, f"search:edizioni:{data.nomeCorso}", load)
 
 @router.post("/getMaterials")
 async def get_materials(data: SearchMaterials, db_handler: DBHandler = Depends(get_db_handler)):
+    (after_id,) = decode_cursor(data.cursor, first=(MIN_UUID,))
+    limit = page_size(data.limit)
     try:
         # Validazione logica dei parametri
         if data.edizioneCorso == 'all':
@@ -89,28 +148,11 @@ async def get_materials(data: SearchMaterials, db_handler: DBHandler = Depends(g
                     detail="dataEdizione è obbligatorio per edizione specifica"
                 )
         if data.edizioneCorso == 'all':
-            materiali = db_handler.run_query(
-                """
-                SELECT md.path_file, md.tipo, md.verificato, md.rating_medio
-                FROM Materiale_Didattico md
-                JOIN EdizioneCorso ed ON md.edition_id = ed.id AND md.edition_data = ed.data
-                JOIN Corso c ON c.id = ed.id
-                WHERE c.nome = %s
-                """,
-                params=(data.nomeCorso,),
-                fetch=True
-            )
+            materiali = db_handler.run_named("search_materiali_corso", params=(data.nomeCorso, after_id, limit + 1))
         else:
-            materiali = db_handler.run_query(
-                """
-                SELECT md.path_file, md.tipo, md.verificato, md.rating_medio
-                FROM Materiale_Didattico md
-                WHERE md.edition_id = %s AND md.edition_data = %s
-                """,
-                params=(data.edizioneCorso, data.dataEdizione),
-                fetch=True
-            )
-        return {"materiale": materiali}
+            materiali = db_handler.run_named("search_materiali_edizione", params=(data.edizioneCorso, data.dataEdizione, after_id, limit + 1))
+        materiali, next_cursor = paginate(materiali, limit, key=lambda row: (row[-1],))
+        return {"materiale": [row[:-1] for row in materiali], "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -132,35 +174,17 @@ def getInfoCorso(data: SearchMaterials, db_handler: DBHandler = Depends(get_db_h
                     detail="dataEdizione è obbligatorio per edizione specifica"
                 )
         if data.edizioneCorso == 'all':
-            info = db_handler.run_query(
-                """
-                SELECT c.nome,ed.data,i.nome,i.cognome,i.email,c.cfu,c.idoneità, ed.orario, ed.esonero, ed.mod_Esame,c.prerequisiti,c.frequenza_obbligatoria
-                FROM EdizioneCorso ed
-                JOIN Corso c ON c.id = ed.id
-                JOIN Insegnanti_Anagrafici i ON ed.insegnante_anagrafico = i.id
-                WHERE c.nome = %s
-                """,
-                params=(data.nomeCorso,),
-                fetch=True
-            )
+            info = db_handler.run_named("search_info_corso", params=(data.nomeCorso,))
         else:
-            info = db_handler.run_query(
-                """
-                SELECT c.nome,ed.data,i.nome,i.cognome,i.email,c.cfu,c.idoneità, ed.orario, ed.esonero, ed.mod_Esame,c.prerequisiti,c.frequenza_obbligatoria
-                FROM EdizioneCorso ed
-                JOIN Insegnanti_Anagrafici i ON ed.insegnante_anagrafico = i.id
-                JOIN Corso c ON c.id = ed.id
-                WHERE ed.id = %s AND ed.data = %s
-                """,
-                params=(data.edizioneCorso, data.dataEdizione),
-                fetch=True
-            )
+            info = db_handler.run_named("search_info_edizione", params=(data.edizioneCorso, data.dataEdizione))
         return {"materiale": info}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.post("/getReview")
 def getReview(data: SearchMaterials, db_handler: DBHandler = Depends(get_db_handler)):
+    (after_id,) = decode_cursor(data.cursor, first=(MIN_UUID,))
+    limit = page_size(data.limit)
     try:
         # Validazione logica dei parametri
         if data.edizioneCorso == 'all':
@@ -176,31 +200,16 @@ def getReview(data: SearchMaterials, db_handler: DBHandler = Depends(get_db_hand
                     detail="dataEdizione è obbligatorio per edizione specifica"
                 )
         if data.edizioneCorso == 'all':
-            review = db_handler.run_query(
-                """
-                SELECT r.descrizione, r.voto
-                FROM EdizioneCorso ed
-                JOIN Corso c ON c.id = ed.id
-                JOIN Review r ON r.edition_id = ed.id AND edition_data=ed.data
-                WHERE c.nome = %s
-                """,
-                params=(data.nomeCorso,),
-                fetch=True
-            )
+            review = db_handler.run_named("search_review_corso", params=(data.nomeCorso, after_id, limit + 1))
         else:
-            review = db_handler.run_query(
-                """
-                SELECT r.descrizione, r.voto
-                FROM EdizioneCorso ed
-                JOIN Review r ON r.edition_id = ed.id AND edition_data=ed.data
-                WHERE ed.id = %s AND ed.data = %s
-                """,
-                params=(data.edizioneCorso, data.dataEdizione),
-                fetch=True
-            )
-        return {"materiale": review}
+            review = db_handler.run_named("search_review_edizione", params=(data.edizioneCorso, data.dataEdizione, after_id, limit + 1))
+        review, next_cursor = paginate(review, limit, key=lambda row: (row[-1],))
+        return {"materiale": [row[:-1] for row in review], "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-
+# Suggerimenti per la barra di ricerca: risposti dall'indice in memoria, nessuna query per tasto premuto
+@router.get("/autocomplete")
+def autocomplete_suggestions(q: str = Query(..., min_length=1)):
+    return {"suggestions": AUTOCOMPLETE_INDEX.suggest(q)}
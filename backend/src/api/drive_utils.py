@@ -1,30 +1,129 @@
 # Handle any interaction with Google Drive
 
 import os
+import time
+import logging
+import threading
+from datetime import timezone
 
-def get_drive_service():
-    from google.auth.transport.requests import Request
-    from google.oauth2.credentials import Credentials
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    from googleapiclient.discovery import build
-
-    SCOPES = ["https://www.googleapis.com/auth/drive.file"]
-    creds = None
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                "credentials.json", SCOPES
-            )
-            creds = flow.run_local_server(port=0, browser="chrome")
-        with open("token.json", "w") as token:
+logger = logging.getLogger(__name__)
+
+SCOPES = ["https://www.googleapis.com/auth/drive.file"]
+TOKEN_FILE = "token.json"
+# Il token viene rinnovato in background con questo anticipo (secondi) rispetto alla scadenza
+DRIVE_TOKEN_REFRESH_MARGIN = int(os.getenv("DRIVE_TOKEN_REFRESH_MARGIN", "300"))
+
+
+class DriveClient:
+    def __init__(self):
+        """
+        Long-lived Google Drive client shared by all requests.
+        The credentials are read from token.json once and kept fresh by a background thread,
+        which refreshes them DRIVE_TOKEN_REFRESH_MARGIN seconds before they expire and saves token.json.
+        The discovery client is not thread-safe (httplib2), so every thread gets its own service,
+        built once on top of the shared credentials.
+        Folder ids are cached per (parent, child) and re-resolved only when a lookup fails.
+        """
+        self._creds = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._refresher = None
+        self._folder_ids = {}  # (parent, child) -> id della sottocartella
+
+    def _load_credentials(self):
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        creds = None
+        if os.path.exists(TOKEN_FILE):
+            creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(
+                    "credentials.json", SCOPES
+                )
+                creds = flow.run_local_server(port=0, browser="chrome")
+            self._save(creds)
+        return creds
+
+    def _save(self, creds):
+        with open(TOKEN_FILE, "w") as token:
             token.write(creds.to_json())
-    return build("drive", "v3", credentials=creds)
+
+    def credentials(self):
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load_credentials()
+                if self._creds.refresh_token and self._refresher is None:
+                    self._refresher = threading.Thread(target=self._refresh_loop, name="drive-token-refresh", daemon=True)
+                    self._refresher.start()
+            return self._creds
+
+    def _seconds_to_expiry(self):
+        expiry = self._creds.expiry
+        if expiry is None:
+            return None
+        # google-auth usa datetime UTC naive
+        return expiry.replace(tzinfo=timezone.utc).timestamp() - time.time()
+
+    def _refresh_loop(self):
+        from google.auth.transport.requests import Request
+        while True:
+            remaining = self._seconds_to_expiry()
+            if remaining is None:
+                # token senza scadenza nota: si ricontrolla più tardi
+                time.sleep(DRIVE_TOKEN_REFRESH_MARGIN)
+                continue
+            if remaining > DRIVE_TOKEN_REFRESH_MARGIN:
+                time.sleep(remaining - DRIVE_TOKEN_REFRESH_MARGIN)
+                continue
+            try:
+                with self._lock:
+                    self._creds.refresh(Request())
+                    self._save(self._creds)
+            except Exception as e:
+                # Se il rinnovo fallisce le richieste lo ritentano da sole quando il token scade
+                logger.warning("Rinnovo del token di Google Drive fallito: %s", e)
+                time.sleep(60)
+
+    def service(self):
+        service = getattr(self._local, "service", None)
+        if service is None:
+            from googleapiclient.discovery import build
+            service = build("drive", "v3", credentials=self.credentials(), cache_discovery=False)
+            self._local.service = service
+        return service
+
+    def folder_id(self, parent_name, child_name, service=None):
+        key = (parent_name, child_name)
+        with self._lock:
+            folder_id = self._folder_ids.get(key)
+        if folder_id is None:
+            folder_id = _lookup_folder_id(service or self.service(), parent_name, child_name)
+            with self._lock:
+                self._folder_ids[key] = folder_id
+        return folder_id
+
+    def forget_folder_id(self, parent_name, child_name):
+        with self._lock:
+            self._folder_ids.pop((parent_name, child_name), None)
+
+
+DRIVE_CLIENT = DriveClient()
+
+
+def get_drive_service():
+    return DRIVE_CLIENT.service()
+
 
 def get_folder_id(service, parent_name, child_name):
+    return DRIVE_CLIENT.folder_id(parent_name, child_name, service)
+
+
+def _lookup_folder_id(service, parent_name, child_name):
     ###################################
     # Trova l'ID della cartella FAQBuddy per debugging purposes
     # service = get_service()
@@ -67,10 +166,46 @@ def delete_drive_file(file_id):
     service.files().delete(fileId=file_id).execute()
     
     
-def upload_file_to_drive(file_path, filename, folder_id):
-    service = get_drive_service()
-    from googleapiclient.http import MediaFileUpload
+# Dimensione dei chunk dell'upload resumable: deve essere un multiplo di 256 KB (vincolo dell'API Drive).
+# È anche la memoria massima usata da un upload, qualunque sia la dimensione del file.
+_DRIVE_CHUNK_UNIT = 256 * 1024
+DRIVE_UPLOAD_CHUNK_SIZE = max(1, int(os.getenv("DRIVE_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024))) // _DRIVE_CHUNK_UNIT) * _DRIVE_CHUNK_UNIT
+
+
+def upload_stream_to_drive(service, stream, filename, folder_id, mimetype=None, progress=None):
+    # Upload resumable a chunk di DRIVE_UPLOAD_CHUNK_SIZE letti direttamente dal file object
+    # (es. UploadFile.file): nessuna copia in memoria del file intero e nessun file temporaneo.
+    # Le chiamate sono bloccanti: dagli endpoint async va eseguita con run_in_threadpool.
+    # progress(byte_inviati), se indicata, viene chiamata dopo ogni chunk.
+    from googleapiclient.http import MediaIoBaseUpload
+    stream.seek(0)
+    media = MediaIoBaseUpload(
+        stream,
+        mimetype=mimetype or "application/octet-stream",
+        chunksize=DRIVE_UPLOAD_CHUNK_SIZE,
+        resumable=True
+    )
     file_metadata = {'name': filename, 'parents': [folder_id]}
-    media = MediaFileUpload(file_path, resumable=True)
-    uploaded = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
-    return uploaded.get('id')
\ No newline at end of file
+    request = service.files().create(body=file_metadata, media_body=media, fields='id')
+    response = None
+    while response is None:
+        status, response = request.next_chunk()
+        if status is not None and progress is not None:
+            progress(status.resumable_progress)
+    return response.get('id')
+
+
+def upload_file_to_drive(stream, filename, parent_folder, child_folder, mimetype=None, progress=None):
+    # Carica uno stream nella sottocartella child_folder di parent_folder e ritorna l'id del file su Drive.
+    # Se la cartella in cache non esiste più (404) il suo id viene risolto di nuovo e l'upload ripetuto una volta.
+    from googleapiclient.errors import HttpError
+    service = get_drive_service()
+    folder_id = get_folder_id(service, parent_folder, child_folder)
+    try:
+        return upload_stream_to_drive(service, stream, filename, folder_id, mimetype, progress)
+    except HttpError as e:
+        if e.resp.status != 404:
+            raise
+        DRIVE_CLIENT.forget_folder_id(parent_folder, child_folder)
+        folder_id = get_folder_id(service, parent_folder, child_folder)
+        return upload_stream_to_drive(service, stream, filename, folder_id, mimetype, progress)
@@ -1,9 +1,10 @@
-import bcrypt
-import smtplib
-from email.message import EmailMessage
+from typing import Optional
 import os
 from dotenv import load_dotenv
 import os
+from fastapi import HTTPException, status
+from ..utils.password_hasher import PASSWORD_HASHER, PasswordHasherBusy
+from ..utils.email_outbox import EMAIL_OUTBOX
 
 
 load_dotenv()
@@ -12,22 +13,47 @@ API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000") # read from .
 
 ############# Login && Signup####################################################
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
-
-def send_verification_email(email, token):
-    msg = EmailMessage()
-    msg["Subject"] = "Verifica la tua email"
-    msg["From"] = os.getenv("EMAIL_FROM")
-    msg["To"] = email
+# bcrypt gira sul pool dedicato di PASSWORD_HASHER: con la coda piena si risponde 503 invece di accumulare richieste
+def _hasher_busy(e: PasswordHasherBusy) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "1"}
+    )
+
+async def hash_password(password: str) -> str:
+    try:
+        return await PASSWORD_HASHER.hash(password)
+    except PasswordHasherBusy as e:
+        raise _hasher_busy(e)
+
+async def verify_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """
+    Ritorna se la password è corretta e, se l'hash ha un costo inferiore a PASSWORD_HASH_ROUNDS,
+    il nuovo hash da salvare al posto di quello attuale.
+    Va attesa da un endpoint async: bcrypt gira sul pool di PASSWORD_HASHER senza occupare un thread delle richieste.
+    """
+    try:
+        return await PASSWORD_HASHER.verify(plain_password, hashed_password)
+    except PasswordHasherBusy as e:
+        raise _hasher_busy(e)
+
+def upgrade_password_hash(db_handler, user_id, old_hash: str, new_hash: Optional[str]) -> None:
+    # Aggiorna l'hash solo se nel frattempo la password non è stata cambiata
+    if new_hash:
+        db_handler.execute_sql_insertion(
+            "UPDATE Utente SET pwd_hash = %s WHERE id = %s AND pwd_hash = %s",
+            (new_hash, user_id, old_hash)
+        )
+
+def send_verification_email(db_handler, email, token):
+    # La mail entra nell'outbox nella transazione dell'utente: la invia il sender in background
     link = f"{API_BASE_URL}/verify-email?token={token}"
-    msg.set_content(f"Clicca qui per verificare la tua email: {link}")
-    # Configura il server SMTP (qui esempio con Gmail)
-    with smtplib.SMTP_SSL("smtp.gmail.com", 465) as smtp:
-        smtp.login(os.getenv("EMAIL_USER"), os.getenv("EMAIL_PASS"))
-        smtp.send_message(msg)
+    EMAIL_OUTBOX.enqueue(
+        db_handler,
+        email,
+        "Verifica la tua email",
+        f"Clicca qui per verificare la tua email: {link}"
+    )
 
 ##############################################################################
@@ -0,0 +1,145 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from fastapi import HTTPException, Request
+from dotenv import load_dotenv
+from ..utils.db_utils import MODE
+from ..utils.db_pool import pooled_handler
+from ..utils.db_handler import DBHandler
+from .jwt_handler import create_access_token, decode_access_token
+
+load_dotenv()
+
+# Versione dei claim: i token senza "v" contengono solo user_id e il contesto va letto dal database
+CLAIMS_VERSION = 1
+# Per quanto (secondi) un token decodificato resta in memoria, e quanti token al massimo
+AUTH_CONTEXT_TTL = float(os.getenv("AUTH_CONTEXT_TTL", "60"))
+AUTH_CONTEXT_MAX_TOKENS = int(os.getenv("AUTH_CONTEXT_MAX_TOKENS", "10000"))
+
+# Ruolo, corso di laurea e id anagrafico dell'utente: una riga per utente
+CONTEXT_QUERY = """
+    SELECT
+        CASE
+            WHEN s.id IS NOT NULL THEN 'studente'
+            WHEN i.id IS NOT NULL THEN 'insegnante'
+            ELSE NULL
+        END,
+        s.corso_laurea_id,
+        i.anagrafico_id
+    FROM Utente u
+    LEFT JOIN Studenti s ON s.id = u.id
+    LEFT JOIN Insegnanti_Registrati i ON i.id = u.id
+    WHERE u.id = %s
+"""
+
+
+def load_auth_claims(db_handler: DBHandler, user_id) -> dict:
+    """
+    Reads the claims of a user: user_id, ruolo ('studente', 'insegnante' or None),
+    corso_laurea_id (students) and anagrafico_id (teachers).
+    """
+    rows = db_handler.run_query(CONTEXT_QUERY, params=(str(user_id),), fetch=True)
+    ruolo, corso_laurea_id, anagrafico_id = rows[0] if rows else (None, None, None)
+    return {
+        "user_id": str(user_id),
+        "ruolo": ruolo,
+        "corso_laurea_id": str(corso_laurea_id) if corso_laurea_id else None,
+        "anagrafico_id": str(anagrafico_id) if anagrafico_id else None,
+    }
+
+
+def create_user_token(db_handler: DBHandler, user_id) -> str:
+    """
+    Issues the access token of a user with the claims used by get_auth_context.
+    """
+    return create_access_token({**load_auth_claims(db_handler, user_id), "v": CLAIMS_VERSION})
+
+
+class AuthContextCache:
+    def __init__(self, ttl: float = AUTH_CONTEXT_TTL, max_tokens: int = AUTH_CONTEXT_MAX_TOKENS):
+        """
+        Short-lived LRU cache of decoded tokens, so repeated requests with the same bearer token
+        skip the signature check. An entry never outlives the token's own expiry.
+
+        Args:
+            ttl (float): seconds a decoded token stays cached.
+            max_tokens (int): cached tokens before the least recently used is dropped.
+        """
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "db_lookups": 0}
+
+    def get(self, token: str) -> dict:
+        """
+        Returns the auth context of token. Raises HTTPException(401) if the token is not valid.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(token)
+                self._metrics["hits"] += 1
+                return entry[0]
+            self._metrics["misses"] += 1
+        try:
+            payload = decode_access_token(token)
+        except Exception:
+            raise HTTPException(status_code=401, detail="Token non valido")
+        if payload.get("v") == CLAIMS_VERSION:
+            context = {key: payload.get(key) for key in ("user_id", "ruolo", "corso_laurea_id", "anagrafico_id")}
+        else:
+            # token emesso prima dei claim estesi: il contesto si legge una volta e resta in cache
+            with pooled_handler(mode=MODE, read_only=True) as db_handler:
+                context = load_auth_claims(db_handler, payload["user_id"])
+            with self._lock:
+                self._metrics["db_lookups"] += 1
+        expires_at = min(now + self.ttl, payload.get("exp", now + self.ttl))
+        with self._lock:
+            self._entries[token] = (context, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_tokens:
+                self._entries.popitem(last=False)
+        return context
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tokens": len(self._entries), "ttl": self.ttl, **self._metrics}
+
+
+AUTH_CONTEXT_CACHE = AuthContextCache()
+
+
+def get_auth_context(request: Request) -> dict:
+    """
+    FastAPI dependency: the authenticated user's context, read from the signed claims of the bearer token
+    (user_id, ruolo, corso_laurea_id, anagrafico_id) without querying the database.
+    """
+    auth_header = request.headers.get("authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Token mancante")
+    return AUTH_CONTEXT_CACHE.get(auth_header.split(" ")[1])
+
+
+def require_student(context: dict) -> str:
+    """
+    Returns the corso_laurea_id of the authenticated student, 404 if the user is not a student.
+    """
+    if not context.get("corso_laurea_id"):
+        raise HTTPException(status_code=404, detail="Studente non trovato")
+    return context["corso_laurea_id"]
+
+
+def require_teacher(context: dict) -> str:
+    """
+    Returns the anagrafico_id of the authenticated teacher, 403 if the user is not a teacher.
+    """
+    if not context.get("anagrafico_id"):
+        raise HTTPException(status_code=403, detail="Non autorizzato")
+    return context["anagrafico_id"]
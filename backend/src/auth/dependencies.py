@@ -1,15 +1,13 @@
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
-from .jwt_handler import SECRET_KEY, ALGORITHM
+from .context import AUTH_CONTEXT_CACHE
 
 security = HTTPBearer()
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload["user_id"]
-    except JWTError:
+        return AUTH_CONTEXT_CACHE.get(credentials.credentials)["user_id"]
+    except HTTPException:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token non valido"
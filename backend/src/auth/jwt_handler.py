@@ -1,9 +1,20 @@
+import os
+import logging
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
+from dotenv import load_dotenv
 
-SECRET_KEY = "supersegreto"  # usa dotenv in produzione
-ALGORITHM = "HS256"
-EXPIRE_MINUTES = 60
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+if not SECRET_KEY:
+    # solo per lo sviluppo locale: in produzione JWT_SECRET_KEY va impostata nel .env
+    logger.warning("JWT_SECRET_KEY non impostata, uso la chiave di sviluppo")
+    SECRET_KEY = "supersegreto"
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", "60"))
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -16,4 +27,4 @@ def decode_access_token(token: str):
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
-        raise Exception("Token non valido o scaduto")
\ No newline at end of file
+        raise Exception("Token non valido o scaduto")
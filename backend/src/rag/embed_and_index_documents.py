@@ -1,9 +1,13 @@
 import os
+import sys
 import time
+import argparse
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 from pinecone import Pinecone, ServerlessSpec
 from .utils.pdf_chunker import chunk_pdf
+from .utils.embedding_cache import encode_cached, EMBEDDING_CACHE
+from .utils.ingest_pipeline import IngestPipeline, FileCheckpoint, chunk_digest
 
 # Config
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data'))
@@ -13,13 +17,18 @@ EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 CHUNK_WINDOW = 200
 CHUNK_OVERLAP = 50
 PINECONE_ENV = "us-east-1" 
+# Chunk già caricati (id -> hash): una nuova esecuzione carica solo quelli mancanti o cambiati
+CHECKPOINT_PATH = os.getenv(
+    "DOCUMENTS_CHECKPOINT",
+    os.path.join(os.path.expanduser("~"), ".cache", "faqbuddy", f"{INDEX_NAME}_{NAMESPACE}_checkpoint.json")
+)
 
 
 def get_pdf_files(data_dir):
     return [os.path.join(data_dir, f) for f in os.listdir(data_dir)
             if f.lower().endswith('.pdf') and os.path.isfile(os.path.join(data_dir, f))]
 
-def main():
+def main(restart=False):
     load_dotenv()
     print(f"🔍 Scanning {DATA_DIR} for PDF files...")
     pdf_files = get_pdf_files(DATA_DIR)
@@ -28,12 +37,20 @@ def main():
         print("No PDF files found. Exiting.")
         return
 
-    print(f"🚀 Loading embedding model: {EMBEDDING_MODEL}")
-    model = SentenceTransformer(EMBEDDING_MODEL)
+    # Il modello viene caricato solo se qualche chunk non è già nella cache degli embedding
+    model = None
+    def encode(texts):
+        nonlocal model
+        if model is None:
+            print(f"🚀 Loading embedding model: {EMBEDDING_MODEL}")
+            model = SentenceTransformer(EMBEDDING_MODEL)
+        print(f"🔗 Encoding {len(texts)} new chunks...")
+        return model.encode(texts, show_progress_bar=False)
 
     print(f"🔑 Initializing Pinecone...")
     pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
 
+    checkpoint = FileCheckpoint(CHECKPOINT_PATH)
     if INDEX_NAME not in pc.list_indexes().names():
         print(f"🔨 Creating new Pinecone index: {INDEX_NAME}")
         pc.create_index(
@@ -46,7 +63,10 @@ def main():
             )
         )
         time.sleep(10)
+        restart = True
     index = pc.Index(INDEX_NAME)
+    if restart:
+        checkpoint.clear()
 
     all_chunks = []
     for pdf_path in pdf_files:
@@ -62,36 +82,35 @@ def main():
         except Exception as e:
             print(f"  ❌ Error chunking {pdf_path}: {e}")
 
-    print(f"\n🧮 Total chunks to index: {len(all_chunks)}")
-    if not all_chunks:
-        print("No chunks to index. Exiting.")
+    for chunk in all_chunks:
+        chunk['hash'] = chunk_digest(EMBEDDING_MODEL, chunk)
+    pending = [chunk for chunk in all_chunks if not checkpoint.done(chunk)]
+    print(f"\n🧮 Total chunks: {len(all_chunks)}, {len(all_chunks) - len(pending)} already indexed, {len(pending)} to index")
+    if not pending:
+        print("Nothing to index. Exiting.")
         return
 
-    # Prepare vectors as tuples (id, values, metadata)
-    print(f"🔗 Generating embeddings...")
-    texts = [chunk['text'] for chunk in all_chunks]
-    embeddings = model.encode(texts, show_progress_bar=True)
-    vectors_to_upsert = [
-        (chunk['id'], embedding.tolist(), chunk['metadata'])
-        for chunk, embedding in zip(all_chunks, embeddings)
-    ]
+    # Embedding e upload si sovrappongono: più batch in volo, retry con backoff e checkpoint per batch
+    def embed(batch):
+        embeddings = encode_cached(EMBEDDING_MODEL, [chunk['text'] for chunk in batch], encode)
+        return [
+            (chunk['id'], embedding.tolist(), chunk['metadata'])
+            for chunk, embedding in zip(batch, embeddings)
+        ]
+
+    print(f"\n📤 Uploading {len(pending)} vectors to Pinecone (namespace: {NAMESPACE})...")
+    stats = IngestPipeline(index, NAMESPACE, embed=embed, checkpoint=checkpoint.mark).run(pending)
+    print(f"✅ Embeddings: {EMBEDDING_CACHE.hits} from cache, {EMBEDDING_CACHE.misses} encoded")
 
-    # Upload in batches
-    batch_size = 100
-    total_vectors = len(vectors_to_upsert)
-    print(f"\n📤 Uploading {total_vectors} vectors to Pinecone (namespace: {NAMESPACE})...")
-    for i in range(0, total_vectors, batch_size):
-        batch = vectors_to_upsert[i:i + batch_size]
-        print(f"Uploading batch {i//batch_size + 1}/{(total_vectors + batch_size - 1)//batch_size}")
-        try:
-            index.upsert(vectors=batch, namespace=NAMESPACE)
-            print(f"✅ Batch {i//batch_size + 1} uploaded successfully")
-        except Exception as e:
-            print(f"❌ Error uploading batch {i//batch_size + 1}: {e}")
     print(f"\n🎉 Document chunk indexing completed!")
     print(f"📁 Index: {INDEX_NAME}")
     print(f"🏷️  Namespace: {NAMESPACE}")
-    print(f"📊 Total vectors uploaded: {total_vectors}")
+    print(f"📊 Total vectors uploaded: {stats['upserted']} ({stats['vectors_per_second']} vectors/s)")
+    if stats["failed_batches"]:
+        print(f"❌ {len(stats['failed_batches'])} batches failed: run the script again to resume from the checkpoint")
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Index the PDF documents in Pinecone")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and upload every chunk")
+    main(restart=parser.parse_args().restart)
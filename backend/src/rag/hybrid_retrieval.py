@@ -5,6 +5,7 @@ from sentence_transformers import SentenceTransformer, CrossEncoder
 from pinecone import Pinecone
 from rank_bm25 import BM25Okapi
 from .utils.pdf_chunker import chunk_pdf
+from .utils.embedding_cache import encode_query_cached
 
 # Config
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../data'))
@@ -42,8 +43,8 @@ def bm25_search(query, chunks, top_k=TOP_K):
     return [(chunks[i], scores[i]) for i in top_indices]
 
 def pinecone_search(query, model, pc, top_k=TOP_K):
-    # Embed the query
-    query_emb = model.encode([query])[0].tolist()
+    # Embed the query (cache in memoria: le query non vanno nella cache su disco degli indexer)
+    query_emb = encode_query_cached(EMBEDDING_MODEL, [query], model.encode)[0].tolist()
     index = pc.Index(INDEX_NAME)
     
     # Determine dynamic namespace boosts
@@ -2,18 +2,30 @@
 """
 Update Pinecone Database from Neon Database
 This script updates Pinecone with fresh database chunks from the Neon database.
-It performs a delete and reindex operation for the 'db' namespace.
+The sync is incremental: a hash of every chunk already in the 'db' namespace is kept
+in the Rag_Chunk table (db/migrations/009_rag_chunk_sync.sql), only new or changed
+chunks are re-embedded and upserted, and chunks whose rows disappeared are deleted.
+The namespace is never cleared, so retrieval keeps working while the sync runs.
+
+    cd backend
+    python -m src.rag.update_pinecone_from_neon          # incremental
+    python -m src.rag.update_pinecone_from_neon --full   # re-embed everything
 """
 
 import os
 import sys
 import time
 import json
+import argparse
 import datetime
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 from pinecone import Pinecone, ServerlessSpec
 from .utils.generate_chunks import ChunkGenerator
+from .utils.embedding_cache import encode_cached, EMBEDDING_CACHE
+from .utils.ingest_pipeline import IngestPipeline, chunk_digest
+from ..utils.db_utils import MODE
+from ..utils.db_pool import pooled_handler
 
 # Load environment variables
 load_dotenv()
@@ -22,7 +34,7 @@ load_dotenv()
 INDEX_NAME = "exams-index-enhanced"
 DB_NAMESPACE = "db"  # Dedicated namespace for database chunks
 EMBEDDING_MODEL = "all-mpnet-base-v2"
-BATCH_SIZE = 100
+DELETE_BATCH_SIZE = 1000  # id per chiamata di delete su Pinecone
 
 def log_debug(step, message, data=None):
     """Log debug information to file and console."""
@@ -69,13 +81,19 @@ def check_environment():
     print("✅ Environment variables loaded")
 
 def initialize_pinecone():
-    """Initialize Pinecone client and ensure index exists with correct configuration."""
+    """
+    Initialize Pinecone client and ensure index exists with correct configuration.
+
+    Returns:
+        tuple: the index and whether it was (re)created empty, in which case the stored chunk hashes are stale.
+    """
     step = "initialize_pinecone"
     log_debug(step, "Initializing Pinecone...")
     
     try:
         pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
         log_debug(step, "Pinecone client created.")
+        created = False
         
         # Check if index exists
         if INDEX_NAME not in pc.list_indexes().names():
@@ -91,6 +109,7 @@ def initialize_pinecone():
             )
             log_debug(step, "Waiting for index to be ready...")
             time.sleep(10)
+            created = True
             print(f"✅ Created new index: {INDEX_NAME}")
         else:
             log_debug(step, f"Index {INDEX_NAME} already exists.")
@@ -119,64 +138,95 @@ def initialize_pinecone():
                     )
                     log_debug(step, "New index created with correct dimension.")
                     time.sleep(10)  # Wait for index to be ready
+                    created = True
                     print("✅ Index recreated with correct dimension")
             except Exception as e:
                 log_debug(step, f"Error checking index dimension: {e}")
                 print(f"⚠️  Could not verify index dimension: {e}")
         
         log_debug(step, "Returning Pinecone index object.")
-        return pc.Index(INDEX_NAME)
+        return pc.Index(INDEX_NAME), created
         
     except Exception as e:
         log_debug(step, f"Error initializing Pinecone: {e}")
         print(f"❌ Error initializing Pinecone: {e}")
         sys.exit(1)
 
-def clear_db_namespace(index):
-    """Clear all vectors from the 'db' namespace."""
-    step = "clear_db_namespace"
-    log_debug(step, f"Clearing namespace '{DB_NAMESPACE}'...")
-    
-    try:
-        # Get current stats to show what we're clearing
-        stats = index.describe_index_stats()
-        if DB_NAMESPACE in stats.namespaces:
-            vector_count = stats.namespaces[DB_NAMESPACE].vector_count
-            log_debug(step, f"Found {vector_count} vectors in namespace '{DB_NAMESPACE}'")
-            print(f"🗑️  Clearing {vector_count} vectors from namespace '{DB_NAMESPACE}'...")
+def chunk_hash(chunk):
+    """Hash of what ends up in Pinecone for a chunk: embedding model, text and metadata."""
+    return chunk_digest(EMBEDDING_MODEL, chunk)
+
+def load_synced_hashes():
+    """Load the hash of every chunk already synced to the namespace (chunk id -> hash)."""
+    step = "load_synced_hashes"
+    with pooled_handler(mode=MODE, read_only=True) as db_handler:
+        rows = db_handler.run_query(
+            "SELECT chunk_id, hash FROM Rag_Chunk WHERE namespace = %s",
+            params=(DB_NAMESPACE,), fetch=True
+        )
+    synced = dict(rows or [])
+    log_debug(step, f"Loaded {len(synced)} synced chunk hashes.")
+    print(f"✅ {len(synced)} chunks already synced to namespace '{DB_NAMESPACE}'")
+    return synced
+
+def save_synced_hashes(chunks):
+    """Record chunks as synced, after their vectors have been upserted."""
+    with pooled_handler(mode=MODE) as db_handler:
+        db_handler.run_query("""
+            INSERT INTO Rag_Chunk (namespace, chunk_id, hash)
+            SELECT %s, c.chunk_id, c.hash FROM unnest(%s::text[], %s::text[]) AS c(chunk_id, hash)
+            ON CONFLICT (namespace, chunk_id) DO UPDATE SET hash = EXCLUDED.hash, aggiornato_il = now()
+        """, params=(DB_NAMESPACE, [c["id"] for c in chunks], [c["hash"] for c in chunks]))
+
+def forget_synced_hashes(chunk_ids=None):
+    """Drop the sync state of some chunks, or of the whole namespace."""
+    with pooled_handler(mode=MODE) as db_handler:
+        if chunk_ids is None:
+            db_handler.run_query("DELETE FROM Rag_Chunk WHERE namespace = %s", params=(DB_NAMESPACE,))
         else:
-            log_debug(step, f"No vectors found in namespace '{DB_NAMESPACE}'")
-            print(f"🗑️  No vectors found in namespace '{DB_NAMESPACE}'")
-        
-        index.delete(namespace=DB_NAMESPACE, delete_all=True)
-        log_debug(step, f"Cleared namespace '{DB_NAMESPACE}'")
-        print(f"✅ Cleared namespace '{DB_NAMESPACE}'")
-        
-    except Exception as e:
-        log_debug(step, f"Could not clear namespace: {e}")
-        print(f"⚠️  Warning: Could not clear namespace: {e}")
-        print("Continuing anyway...")
+            db_handler.run_query(
+                "DELETE FROM Rag_Chunk WHERE namespace = %s AND chunk_id = ANY(%s::text[])",
+                params=(DB_NAMESPACE, list(chunk_ids))
+            )
+
+def diff_db_chunks(synced):
+    """
+    Generate chunks from the Neon database and compare them with the synced hashes.
+    Only new or changed chunks are kept in memory.
 
-def generate_db_chunks():
-    """Generate chunks from the Neon database."""
-    step = "generate_db_chunks"
+    Returns:
+        tuple: the chunks to (re)embed, each with its hash, and the ids of all current chunks.
+    """
+    step = "diff_db_chunks"
     log_debug(step, "Generating database chunks from Neon...")
-    
+
     try:
         generator = ChunkGenerator()
-        log_debug(step, "ChunkGenerator instantiated.")
-        chunks = generator.get_chunks()
-        log_debug(step, f"Generated {len(chunks)} database chunks.", data={"num_chunks": len(chunks)})
-        print(f"✅ Generated {len(chunks)} database chunks from Neon")
-        return chunks
-        
+        changed = {}
+        current_ids = set()
+        for chunk in generator.iter_chunks():
+            current_ids.add(chunk["id"])
+            digest = chunk_hash(chunk)
+            if synced.get(chunk["id"]) != digest:
+                # a parità di id vale l'ultimo chunk, come farebbe l'upsert su Pinecone
+                changed[chunk["id"]] = {**chunk, "hash": digest}
+        changed = list(changed.values())
+        new = sum(1 for chunk in changed if chunk["id"] not in synced)
+        log_debug(step, f"{len(current_ids)} chunks, {new} new, {len(changed) - new} changed.",
+                  data={"num_chunks": len(current_ids), "new": new, "changed": len(changed) - new})
+        print(f"✅ Generated {len(current_ids)} database chunks from Neon: {new} new, {len(changed) - new} changed")
+        return changed, current_ids
+
     except Exception as e:
         log_debug(step, f"Error generating chunks: {e}")
         print(f"❌ Error generating chunks: {e}")
         sys.exit(1)
 
-def create_embeddings(chunks, model):
-    """Create embeddings for the chunks using the specified model."""
+def create_embeddings(chunks, get_model):
+    """
+    Create embeddings for the chunks. Texts already in the embedding cache are not re-encoded;
+    get_model() loads the model only when some text is missing.
+    """
     step = "create_embeddings"
     log_debug(step, f"Creating embeddings for {len(chunks)} chunks...")
     
@@ -186,7 +236,10 @@ def create_embeddings(chunks, model):
         
         # Show progress
         print(f"🤖 Creating embeddings with {EMBEDDING_MODEL}...")
-        embeddings = model.encode(texts, show_progress_bar=True)
+        embeddings = encode_cached(
+            EMBEDDING_MODEL, texts,
+            lambda missing: get_model().encode(missing, show_progress_bar=False)
+        )
         log_debug(step, "Embeddings created.")
         
         vectors = []
@@ -209,36 +262,80 @@ def create_embeddings(chunks, model):
     except Exception as e:
         log_debug(step, f"Error creating embeddings: {e}")
         print(f"❌ Error creating embeddings: {e}")
-        sys.exit(1)
+        raise
 
-def upload_to_pinecone(vectors, index):
-    """Upload vectors to Pinecone in batches."""
-    step = "upload_to_pinecone"
-    log_debug(step, f"Uploading {len(vectors)} vectors to namespace '{DB_NAMESPACE}'...")
-    
-    total_vectors = len(vectors)
-    uploaded = 0
-    
-    for i in range(0, total_vectors, BATCH_SIZE):
-        batch = vectors[i:i + BATCH_SIZE]
-        batch_num = i // BATCH_SIZE + 1
-        total_batches = (total_vectors + BATCH_SIZE - 1) // BATCH_SIZE
-        
-        log_debug(step, f"Uploading batch {batch_num}/{total_batches} ({len(batch)} vectors)...")
-        
-        try:
-            index.upsert(vectors=batch, namespace=DB_NAMESPACE)
-            uploaded += len(batch)
-            log_debug(step, f"Batch {batch_num} uploaded successfully.")
-            print(f"✅ Batch {batch_num}/{total_batches} uploaded ({uploaded}/{total_vectors} vectors)")
-            
-        except Exception as e:
-            log_debug(step, f"Error uploading batch {batch_num}: {e}")
-            print(f"❌ Error uploading batch {batch_num}: {e}")
-            sys.exit(1)
-    
-    log_debug(step, f"Successfully uploaded {uploaded} vectors to namespace '{DB_NAMESPACE}'")
-    print(f"🎉 Successfully uploaded {uploaded} vectors to namespace '{DB_NAMESPACE}'")
+def sync_changed_chunks(chunks, get_model, index):
+    """
+    Embed and upsert the changed chunks through the ingestion pipeline: embedding overlaps with
+    concurrent upserts, failed upserts are retried with backoff, and the hashes of a batch are
+    saved right after its upsert, so the next run resumes from the batches that were not uploaded.
+
+    Returns:
+        dict: pipeline statistics (upserted vectors, failed batches, vectors per second).
+    """
+    step = "sync_changed_chunks"
+    log_debug(step, f"Syncing {len(chunks)} chunks to namespace '{DB_NAMESPACE}'...")
+
+    pipeline = IngestPipeline(
+        index, DB_NAMESPACE,
+        embed=lambda batch: create_embeddings(batch, get_model),
+        checkpoint=save_synced_hashes,
+    )
+    stats = pipeline.run(chunks)
+
+    log_debug(step, f"Uploaded {stats['upserted']}/{stats['vectors']} vectors to namespace '{DB_NAMESPACE}'", data=stats)
+    if stats["failed_batches"]:
+        print(f"⚠️  {len(stats['failed_batches'])} batches failed: they will be synced by the next run")
+    else:
+        print(f"🎉 Successfully uploaded {stats['upserted']} vectors to namespace '{DB_NAMESPACE}'")
+    return stats
+
+def delete_vectors(index, chunk_ids):
+    """Delete vectors by id from the namespace, DELETE_BATCH_SIZE ids per call."""
+    chunk_ids = list(chunk_ids)
+    for i in range(0, len(chunk_ids), DELETE_BATCH_SIZE):
+        batch = chunk_ids[i:i + DELETE_BATCH_SIZE]
+        index.delete(ids=batch, namespace=DB_NAMESPACE)
+        forget_synced_hashes(batch)
+
+def delete_removed_chunks(index, synced, current_ids):
+    """Delete the vectors of synced chunks whose source rows no longer exist."""
+    step = "delete_removed_chunks"
+    removed = [chunk_id for chunk_id in synced if chunk_id not in current_ids]
+    if not removed:
+        log_debug(step, "No removed chunks.")
+        return
+    log_debug(step, f"Deleting {len(removed)} removed chunks...")
+    try:
+        delete_vectors(index, removed)
+        print(f"🗑️  Deleted {len(removed)} chunks whose rows no longer exist")
+    except Exception as e:
+        # lo stato non viene toccato per i batch non cancellati: ci si riprova alla prossima sincronizzazione
+        log_debug(step, f"Could not delete removed chunks: {e}")
+        print(f"⚠️  Warning: Could not delete removed chunks: {e}")
+
+def delete_untracked_vectors(index, current_ids):
+    """
+    Delete vectors in the namespace that no current chunk produces. Needed when there is no
+    sync state yet (first incremental run, --full), e.g. vectors left by the old delete-and-reindex.
+    """
+    step = "delete_untracked_vectors"
+    try:
+        untracked = [
+            vector_id
+            for ids in index.list(namespace=DB_NAMESPACE)
+            for vector_id in ids
+            if vector_id not in current_ids
+        ]
+    except Exception as e:
+        log_debug(step, f"Could not list vectors: {e}")
+        print(f"⚠️  Warning: Could not list vectors to remove stale ones: {e}")
+        return
+    if untracked:
+        for i in range(0, len(untracked), DELETE_BATCH_SIZE):
+            index.delete(ids=untracked[i:i + DELETE_BATCH_SIZE], namespace=DB_NAMESPACE)
+        print(f"🗑️  Deleted {len(untracked)} stale vectors")
+    log_debug(step, f"Deleted {len(untracked)} untracked vectors.")
 
 def verify_upload(index):
     """Verify the upload by checking index statistics."""
@@ -266,7 +363,27 @@ def verify_upload(index):
         log_debug(step, f"Could not verify upload: {e}")
         print(f"⚠️  Warning: Could not verify upload: {e}")
 
-def main():
+_model = None
+
+def load_embedding_model():
+    """Load the embedding model (once), on MPS when available."""
+    global _model
+    if _model is not None:
+        return _model
+    print(f"🤖 Loading embedding model: {EMBEDDING_MODEL}")
+    log_debug("main", f"Loading embedding model: {EMBEDDING_MODEL}")
+
+    try:
+        model = SentenceTransformer(EMBEDDING_MODEL, device='mps')
+        log_debug("main", "Embedding model loaded.")
+    except Exception as e:
+        print(f"⚠️  Could not use MPS device, falling back to CPU: {e}")
+        model = SentenceTransformer(EMBEDDING_MODEL)
+        log_debug("main", "Embedding model loaded on CPU.")
+    _model = model
+    return model
+
+def main(full=False):
     """Main function to orchestrate the Pinecone update process."""
     log_debug("main", "Starting Pinecone Database Update from Neon")
     print("🚀 Starting Pinecone Database Update from Neon")
@@ -277,51 +394,56 @@ def main():
     log_debug("main", "Environment checked.")
     
     # Step 2: Initialize Pinecone
-    index = initialize_pinecone()
+    index, created = initialize_pinecone()
     log_debug("main", "Pinecone initialized.")
     
-    # Step 3: Clear existing database namespace
-    clear_db_namespace(index)
-    log_debug("main", "Namespace cleared.")
-    
-    # Step 4: Generate chunks from Neon database
-    chunks = generate_db_chunks()
-    log_debug("main", f"Generated {len(chunks)} chunks.")
-    
-    if not chunks:
-        log_debug("main", "No chunks generated. Exiting.")
-        print("⚠️  No chunks generated. Exiting.")
-        return
-    
-    # Step 5: Load embedding model
-    print(f"🤖 Loading embedding model: {EMBEDDING_MODEL}")
-    log_debug("main", f"Loading embedding model: {EMBEDDING_MODEL}")
+    # Step 3: Load the hashes of the chunks already in the namespace
+    if full or created:
+        # indice nuovo o sincronizzazione completa: lo stato salvato non descrive più il namespace
+        forget_synced_hashes()
+        log_debug("main", "Sync state cleared.")
+    synced = load_synced_hashes()
     
-    try:
-        model = SentenceTransformer(EMBEDDING_MODEL, device='mps')
-        log_debug("main", "Embedding model loaded.")
-    except Exception as e:
-        print(f"⚠️  Could not use MPS device, falling back to CPU: {e}")
-        model = SentenceTransformer(EMBEDDING_MODEL)
-        log_debug("main", "Embedding model loaded on CPU.")
+    # Step 4: Generate chunks from Neon database and diff them against the synced hashes
+    changed, current_ids = diff_db_chunks(synced)
+    log_debug("main", f"{len(changed)} chunks to sync.")
     
-    # Step 6: Create embeddings
-    vectors = create_embeddings(chunks, model)
-    log_debug("main", f"Created {len(vectors)} vectors.")
+    # Step 5: Embed and upsert only new or changed chunks (existing vectors stay searchable)
+    stats = None
+    if changed:
+        # il modello si carica solo se qualche testo non è nella cache degli embedding
+        stats = sync_changed_chunks(changed, load_embedding_model, index)
+        print(f"✅ Embeddings: {EMBEDDING_CACHE.hits} from cache, {EMBEDDING_CACHE.misses} encoded")
+        log_debug("main", "Changed chunks synced.")
+    else:
+        print("✅ Nothing to re-embed")
     
-    # Step 7: Upload to Pinecone
-    upload_to_pinecone(vectors, index)
-    log_debug("main", "Vectors uploaded to Pinecone.")
+    # Step 6: Delete the vectors of rows that no longer exist
+    delete_removed_chunks(index, synced, current_ids)
+    if not synced and not created:
+        delete_untracked_vectors(index, current_ids)
+    log_debug("main", "Removed chunks deleted.")
     
-    # Step 8: Verify upload
+    # Step 7: Verify upload
     verify_upload(index)
     log_debug("main", "Upload verified.")
     
+    if stats and stats["failed_batches"]:
+        # i batch caricati restano salvati in Rag_Chunk: rieseguendo lo script si riprende da quelli falliti
+        log_debug("main", "Pinecone database update completed with failed batches.", data=stats["failed_batches"])
+        print("=" * 60)
+        print(f"❌ {len(stats['failed_batches'])} batches could not be uploaded, run the update again to resume")
+        sys.exit(1)
+
     print("=" * 60)
     print("🎉 Pinecone database update completed successfully!")
-    print(f"📊 Database chunks uploaded to namespace: '{DB_NAMESPACE}'")
+    print(f"📊 {len(changed)} chunks re-embedded in namespace: '{DB_NAMESPACE}'")
     print("💡 Your RAG system is now ready with fresh database data from Neon!")
     log_debug("main", "Pinecone database update completed successfully!")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sync the Neon database chunks to Pinecone")
+    parser.add_argument("--full", action="store_true",
+                        help="re-embed every chunk and remove vectors no chunk produces")
+    args = parser.parse_args()
+    main(full=args.full)
@@ -0,0 +1,256 @@
+"""
+Embedding caches.
+
+EmbeddingCache is the persistent cache shared by the DB indexer and the PDF indexer. Embeddings
+are keyed by (model name, SHA-256 of the text). Vectors are stored as rows of a float32 matrix,
+one file per model, read through a memory map; a SQLite index maps each key to its row. Writes
+take the SQLite write lock, so several processes can share the same cache.
+
+QueryEmbeddingCache is a bounded in-memory LRU for query-time embeddings: user queries are
+mostly unique, so they are never written to disk.
+"""
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# EMBEDDING_CACHE_DIR=off disabilita la cache (ogni testo viene ricalcolato)
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "faqbuddy", "embeddings")
+)
+SQLITE_MAX_PARAMS = 500
+# Embedding di query tenuti in memoria (per processo)
+QUERY_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "1024"))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, directory: str = EMBEDDING_CACHE_DIR):
+        """
+        Args:
+            directory: where the SQLite index and the per-model matrices are stored.
+        """
+        self.directory = directory
+        self._conn: Optional[sqlite3.Connection] = None
+        self._matrices: Dict[str, np.memmap] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.directory, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), timeout=60,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS models (
+                    model TEXT PRIMARY KEY,
+                    dim   INTEGER NOT NULL,
+                    rows  INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model     TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    row       INTEGER NOT NULL,
+                    PRIMARY KEY (model, text_hash)
+                ) WITHOUT ROWID
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _matrix_path(self, model_name: str) -> str:
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name) + ".f32")
+
+    def _matrix(self, model_name: str, dim: int, min_rows: int) -> np.memmap:
+        # la matrice cresce con gli inserimenti: si rimappa quando servono righe oltre quelle mappate
+        matrix = self._matrices.get(model_name)
+        if matrix is None or matrix.shape[0] < min_rows:
+            path = self._matrix_path(model_name)
+            rows = os.path.getsize(path) // (dim * 4)
+            matrix = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, dim))
+            self._matrices[model_name] = matrix
+        return matrix
+
+    def get(self, model_name: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Returns the cached vectors of the given text hashes (missing hashes are left out).
+        """
+        with self._lock:
+            conn = self._connect()
+            model = conn.execute("SELECT dim FROM models WHERE model = ?", (model_name,)).fetchone()
+            if model is None or not hashes:
+                return {}
+            dim = model[0]
+            found = []
+            unique = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique), SQLITE_MAX_PARAMS):
+                batch = unique[i:i + SQLITE_MAX_PARAMS]
+                found.extend(conn.execute(
+                    f"SELECT text_hash, row FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    (model_name, *batch)
+                ).fetchall())
+            if not found:
+                return {}
+            matrix = self._matrix(model_name, dim, max(row for _, row in found) + 1)
+            return {h: np.array(matrix[row]) for h, row in found}
+
+    def put(self, model_name: str, hashes: List[str], vectors: np.ndarray) -> None:
+        """
+        Stores vectors (one row per hash). Hashes already cached are skipped.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not hashes:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                model = conn.execute("SELECT dim, rows FROM models WHERE model = ?", (model_name,)).fetchone()
+                dim, rows = model if model else (vectors.shape[1], 0)
+                if dim != vectors.shape[1]:
+                    raise ValueError(f"{model_name}: cached dimension {dim}, got {vectors.shape[1]}")
+                new = {}
+                for h, vector in zip(hashes, vectors):
+                    if h not in new and conn.execute(
+                        "SELECT 1 FROM embeddings WHERE model = ? AND text_hash = ?", (model_name, h)
+                    ).fetchone() is None:
+                        new[h] = vector
+                if new:
+                    # si scrive dalla riga `rows`: un'eventuale coda lasciata da una scrittura interrotta viene sovrascritta
+                    path = self._matrix_path(model_name)
+                    with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+                        f.seek(rows * dim * 4)
+                        f.write(np.stack(list(new.values())).tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                    conn.executemany(
+                        "INSERT INTO embeddings (model, text_hash, row) VALUES (?, ?, ?)",
+                        [(model_name, h, rows + i) for i, h in enumerate(new)]
+                    )
+                    conn.execute(
+                        "INSERT INTO models (model, dim, rows) VALUES (?, ?, ?) "
+                        "ON CONFLICT (model) DO UPDATE SET rows = excluded.rows",
+                        (model_name, dim, rows + len(new))
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def encode(self, model_name: str, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Returns the embeddings of texts in order, calling encoder only for the texts not cached yet
+        (each distinct text once).
+
+        Args:
+            model_name: name of the embedding model, part of the cache key.
+            texts: texts to embed.
+            encoder: function that embeds a list of texts, e.g. lambda t: model.encode(t).
+        """
+        hashes = [text_hash(text) for text in texts]
+        cached = self.get(model_name, hashes)
+        missing = {h: text for h, text in zip(hashes, texts) if h not in cached}
+        self.hits += len(texts) - sum(1 for h in hashes if h in missing)
+        self.misses += len(missing)
+        if missing:
+            vectors = np.asarray(encoder(list(missing.values())), dtype=np.float32)
+            self.put(model_name, list(missing), vectors)
+            cached.update(zip(missing, vectors))
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([cached[h] for h in hashes])
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = self._connect().execute("SELECT model, dim, rows FROM models").fetchall()
+        return {
+            "directory": self.directory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "models": {model: {"dim": dim, "rows": rows} for model, dim, rows in models},
+        }
+
+
+class QueryEmbeddingCache:
+    def __init__(self, max_entries: int = QUERY_EMBEDDING_CACHE_MAX_ENTRIES):
+        """
+        In-memory LRU of query embeddings, so that repeated queries (e.g. the same question asked
+        again, or embedded by both the T2SQL fallback and the RAG) are encoded once per process.
+
+        Args:
+            max_entries: vectors kept before the least recently used is dropped.
+        """
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()  # (model, text_hash) -> vector
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def encode(self, model_name: str, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Same contract as EmbeddingCache.encode, without touching the disk.
+        """
+        keys = [(model_name, text_hash(text)) for text in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            vectors = np.asarray(encoder(list(missing.values())), dtype=np.float32)
+            found.update(zip(missing, vectors))
+        with self._lock:
+            self.hits += len(texts) - sum(1 for key in keys if key in missing)
+            self.misses += len(missing)
+            for key in missing:
+                self._entries[key] = found[key]
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([found[key] for key in keys])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+EMBEDDING_CACHE = EmbeddingCache()
+QUERY_EMBEDDING_CACHE = QueryEmbeddingCache()
+
+
+def encode_cached(model_name: str, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+    """
+    Embeds texts through the shared persistent cache; with EMBEDDING_CACHE_DIR=off it just calls encoder.
+    Meant for the indexers: every new text is written to disk.
+    """
+    if EMBEDDING_CACHE_DIR.lower() == "off":
+        return np.asarray(encoder(texts), dtype=np.float32)
+    return EMBEDDING_CACHE.encode(model_name, texts, encoder)
+
+
+def encode_query_cached(model_name: str, texts: List[str], encoder: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+    """
+    Embeds query texts through the in-memory QUERY_EMBEDDING_CACHE; nothing is written to disk.
+    """
+    return QUERY_EMBEDDING_CACHE.encode(model_name, texts, encoder)
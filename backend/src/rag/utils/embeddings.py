@@ -4,6 +4,9 @@
 from sentence_transformers import SentenceTransformer
 from typing import Union, List
 import numpy as np
+from .embedding_cache import encode_query_cached
+
+EMBEDDING_MODEL_NAME = "all-mpnet-base-v2"
 
 # Lazy loading to ensure environment variables are loaded first
 _embed_model = None
@@ -13,7 +16,6 @@ def get_embed_model():
     global _embed_model
     if _embed_model is None:
         # TEMPORARILY HARDCODED to bypass environment variable issues
-        EMBEDDING_MODEL_NAME = "all-mpnet-base-v2"
         print(f"Loading SentenceTransformer model: {EMBEDDING_MODEL_NAME}")
         _embed_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
         print("Model loaded successfully.")
@@ -22,6 +24,8 @@ def get_embed_model():
 def embed_texts(texts: Union[str, List[str]]) -> np.ndarray:
     """
     Embed a single string or a list of strings using the global model.
+    Used for queries: texts embedded recently by this process are taken from the in-memory
+    query cache (and the model is not even loaded); nothing is written to the persistent cache.
 
     Args:
         texts: str or list of str to embed.
@@ -31,5 +35,7 @@ def embed_texts(texts: Union[str, List[str]]) -> np.ndarray:
     """
     if isinstance(texts, str):
         texts = [texts]
-    embed_model = get_embed_model()  # Lazy load the model
-    return embed_model.encode(texts, convert_to_numpy=True)
\ No newline at end of file
+    return encode_query_cached(
+        EMBEDDING_MODEL_NAME, texts,
+        lambda missing: get_embed_model().encode(missing, convert_to_numpy=True)  # Lazy load the model
+    )
\ No newline at end of file
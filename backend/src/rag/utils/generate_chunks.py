@@ -1,53 +1,51 @@
-from ...utils.db_utils import get_connection, MODE
+from ...utils.db_utils import MODE
+from ...utils.db_pool import get_pooled_handler
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
 
 load_dotenv()
 
 class ChunkGenerator:
-    def __init__(self):
-        self.conn = get_connection(MODE)  # Use the main app's database connection
-        self.cur = self.conn.cursor()
+    def __init__(self, batch_size: int = 1000):
+        self.db_handler = get_pooled_handler(MODE)  # Use the main app's connection pool
+        self.batch_size = batch_size
 
     def __del__(self):
-        if self.cur:
-            self.cur.close()
-        if self.conn:
-            self.conn.close()
+        if self.db_handler:
+            self.db_handler.close_connection()
 
-    def _execute_query(self, query: str) -> List[tuple]:
-        """Execute a query and fetch all results."""
-        self.cur.execute(query)
-        return self.cur.fetchall()
+    def _execute_query(self, query: str) -> Iterator[tuple]:
+        """Stream query results through a server-side cursor, batch_size rows at a time."""
+        return self.db_handler.iter_query(query, batch_size=self.batch_size)
 
-    def get_department_chunks(self) -> List[Dict[str, Any]]:
+    def get_department_chunks(self) -> Iterator[Dict[str, Any]]:
         rows = self._execute_query("SELECT id, nome FROM Dipartimento")
-        return [
+        return (
             {
                 "id": f"dipartimento_{id}",
                 "text": f"Dipartimento: {nome}",
                 "metadata": {"table_name": "Dipartimento", "primary_key": id}
             }
             for id, nome in rows
-        ]
+        )
 
-    def get_faculty_chunks(self) -> List[Dict[str, Any]]:
+    def get_faculty_chunks(self) -> Iterator[Dict[str, Any]]:
         query = """
             SELECT f.id, f.nome, f.presidente, f.contatti, d.nome as dept_name 
             FROM Facolta f
             JOIN Dipartimento d ON f.dipartimento_id = d.id
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
                 "id": f"facolta_{id}",
                 "text": f"Facoltà: {nome}, afferente al Dipartimento di {dept_name}. Presidente: {presidente}, Contatti: {contatti}.",
                 "metadata": {"table_name": "Facolta", "primary_key": id}
             }
             for id, nome, presidente, contatti, dept_name in rows
-        ]
+        )
 
-    def get_degree_course_chunks(self) -> List[Dict[str, Any]]:
+    def get_degree_course_chunks(self) -> Iterator[Dict[str, Any]]:
         query = """
             SELECT c.id, c.nome, c.descrizione, c.classe, c.tipologia, 
                    c.mail_segreteria, f.nome as faculty_name
@@ -55,7 +53,7 @@ class ChunkGenerator:
             JOIN Facolta f ON c.id_facolta = f.id
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
                 "id": f"corso_di_laurea_{id}",
                 "text": f"Corso di Laurea in {nome} (Classe {classe}, {tipologia}), offerto dalla Facoltà di {faculty_name}. "
@@ -63,9 +61,9 @@ class ChunkGenerator:
                 "metadata": {"table_name": "Corso_di_Laurea", "primary_key": id}
             }
             for id, nome, descrizione, classe, tipologia, mail_segreteria, faculty_name in rows
-        ]
+        )
     
-    def get_course_chunks(self) -> List[Dict[str, Any]]:
+    def get_course_chunks(self) -> Iterator[Dict[str, Any]]:
         query = """
             SELECT c.id, c.nome, c.cfu, c.idoneità, c.prerequisiti, 
                    c.frequenza_obbligatoria, cdl.nome as degree_name
@@ -73,7 +71,7 @@ class ChunkGenerator:
             JOIN Corso_di_Laurea cdl ON c.id_corso = cdl.id
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
                 "id": f"corso_{id}",
                 "text": f"Corso: {nome}, parte del Corso di Laurea in {degree_name}. "
@@ -83,31 +81,34 @@ class ChunkGenerator:
                 "metadata": {"table_name": "Corso", "primary_key": id}
             }
             for id, nome, cfu, idoneita, prerequisiti, frequenza_obbligatoria, degree_name in rows
-        ]
+        )
 
-    def get_course_edition_chunks(self) -> List[Dict[str, Any]]:
+    def get_course_edition_chunks(self) -> Iterator[Dict[str, Any]]:
+        # una riga (e un chunk) per edizione: id e data formano la chiave, le piattaforme sono aggregate
         query = """
             SELECT ec.id, ec.data, ec.mod_Esame, c.nome as course_name, 
-                   ia.nome as prof_nome, ia.cognome as prof_cognome, p.Nome as piattaforma
+                   ia.nome as prof_nome, ia.cognome as prof_cognome,
+                   string_agg(p.Nome, ', ' ORDER BY p.Nome) as piattaforma
             FROM EdizioneCorso ec
             JOIN Corso c ON ec.id = c.id
             JOIN Insegnanti_Anagrafici ia ON ec.insegnante_anagrafico = ia.id
             LEFT JOIN EdizioneCorso_Piattaforme ecp ON ec.id = ecp.edizione_id AND ec.data = ecp.edizione_data
             LEFT JOIN Piattaforme p ON ecp.piattaforma_nome = p.Nome
+            GROUP BY ec.id, ec.data, ec.mod_Esame, c.nome, ia.nome, ia.cognome
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
-                "id": f"edizione_corso_{id}",
+                "id": f"edizione_corso_{id}_{data}",
                 "text": f"Edizione del corso di {course_name} per il periodo '{data}'. "
                         f"Docente: {prof_nome} {prof_cognome}. Modalità d'esame: {mod_Esame}. "
                         f"Piattaforma: {piattaforma or 'Non specificata'}.",
                 "metadata": {"table_name": "EdizioneCorso", "primary_key": id}
             }
             for id, data, mod_Esame, course_name, prof_nome, prof_cognome, piattaforma in rows
-        ]
+        )
 
-    def get_material_chunks(self) -> List[Dict[str, Any]]:
+    def get_material_chunks(self) -> Iterator[Dict[str, Any]]:
         query = """
             SELECT m.id, m.path_file, m.tipo, m.verificato, m.data_caricamento,
                    c.nome as course_name
@@ -115,7 +116,7 @@ class ChunkGenerator:
             JOIN Corso c ON m.edition_id = c.id
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
                 "id": f"materiale_didattico_{id}",
                 "text": f"Materiale didattico per il corso di {course_name} (tipo: {tipo}), caricato da un utente, per privacy non viene mostrato il nome e cognome."
@@ -123,9 +124,9 @@ class ChunkGenerator:
                 "metadata": {"table_name": "Materiale_Didattico", "primary_key": id}
             }
             for id, path_file, tipo, verificato, data_caricamento, course_name in rows
-        ]
+        )
 
-    def get_review_chunks(self) -> List[Dict[str, Any]]:
+    def get_review_chunks(self) -> Iterator[Dict[str, Any]]:
         query = """
             SELECT r.id, r.descrizione, r.voto, c.nome as course_name
             FROM Review r
@@ -133,7 +134,7 @@ class ChunkGenerator:
             JOIN Corso c ON ec.id = c.id
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
                 "id": f"review_{id}",
                 "text": f"Recensione di uno studente per il corso di {course_name}. "
@@ -141,9 +142,9 @@ class ChunkGenerator:
                 "metadata": {"table_name": "Review", "primary_key": id}
             }
             for id, descrizione, voto, course_name in rows
-        ]
+        )
     
-    def get_valutazione_chunks(self) -> List[Dict[str, Any]]:
+    def get_valutazione_chunks(self) -> Iterator[Dict[str, Any]]:
         query = """
             SELECT v.voto, v.commento, v.data, s.id as student_id, m.id as materiale_id
             FROM Valutazione v 
@@ -151,7 +152,7 @@ class ChunkGenerator:
             JOIN Studenti s ON s.id = v.student_id
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
                 "id": f"valutazione_{student_id}_{materiale_id}",
                 "text": f"Valutazione di uno studente per il materiale didattico {materiale_id}."
@@ -163,16 +164,20 @@ class ChunkGenerator:
                 }
             }
             for voto, commento, data, student_id, materiale_id in rows
-        ]
+        )
     
-    def get_piattaforma_chunks(self) -> List[Dict[str, Any]]:
+    def get_piattaforma_chunks(self) -> Iterator[Dict[str, Any]]:
+        # un chunk per piattaforma: codici ed edizioni sono aggregati
         query = """
-            SELECT p.Nome, ecp.codice, ecp.edizione_id
+            SELECT p.Nome,
+                   string_agg(DISTINCT ecp.codice, ', ') as codice,
+                   string_agg(DISTINCT ecp.edizione_id::text, ', ') as edizione_id
             FROM Piattaforme p 
             JOIN EdizioneCorso_Piattaforme ecp ON p.Nome = ecp.piattaforma_nome
+            GROUP BY p.Nome
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
                 "id": f"piattaforma_{nome}",
                 "text": f"Piattaforma: {nome}, con codice: {codice or 'Nessun codice disponibile'}. "
@@ -180,16 +185,16 @@ class ChunkGenerator:
                 "metadata": {"table_name": "Piattaforme", "primary_key": nome}
             }
             for nome, codice, edizione_id in rows
-        ]
+        )
     
-    def get_insegnante_chunks(self) -> List[Dict[str, Any]]:
+    def get_insegnante_chunks(self) -> Iterator[Dict[str, Any]]:
         query = """
             SELECT ia.id, ia.email, ia.nome, ia.cognome, ir.sitoWeb, ir.cv, ir.ricevimento
             FROM Insegnanti_Anagrafici ia
             LEFT JOIN Insegnanti_Registrati ir ON ia.utente_id = ir.id
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
                 "id": f"insegnante_{id}",
                 "text": f"Insegnante: {nome} {cognome}, raggiungibile all'email: {email or 'Non disponibile'}"
@@ -198,9 +203,9 @@ class ChunkGenerator:
                 "metadata": {"table_name": "Insegnanti_Anagrafici", "primary_key": id}
             }
             for id, email, nome, cognome, sitoWeb, cv, ricevimento in rows
-        ]
+        )
     
-    def get_thesis_chunks(self) -> List[Dict[str, Any]]:
+    def get_thesis_chunks(self) -> Iterator[Dict[str, Any]]:
         query = """
             SELECT t.id, t.titolo, cdl.nome as corso_laurea_nome, s.matricola as studente_matricola, t.file
             FROM Tesi t
@@ -208,7 +213,7 @@ class ChunkGenerator:
             JOIN Studenti s ON t.student_id = s.id
         """
         rows = self._execute_query(query)
-        return [
+        return (
             {
                 "id": f"tesi_{id}",
                 "text": f"Tesi di laurea: {titolo}, del Corso di Laurea in {corso_laurea_nome}. "
@@ -216,25 +221,26 @@ class ChunkGenerator:
                 "metadata": {"table_name": "Tesi", "primary_key": id}
             }
             for id, titolo, corso_laurea_nome, studente_matricola, file in rows
-        ]
+        )
+
+    def iter_chunks(self) -> Iterator[Dict[str, Any]]:
+        """Lazily generate all chunks, one table at a time, without materializing the result sets."""
+        yield from self.get_department_chunks()
+        yield from self.get_faculty_chunks()
+        yield from self.get_degree_course_chunks()
+        yield from self.get_course_chunks()
+        yield from self.get_course_edition_chunks()
+        yield from self.get_material_chunks()
+        yield from self.get_review_chunks()
+        yield from self.get_valutazione_chunks()
+        yield from self.get_piattaforma_chunks()
+        yield from self.get_insegnante_chunks()
+        yield from self.get_thesis_chunks()
 
     def get_chunks(self) -> List[Dict[str, Any]]:
         """Generate all chunks from the database."""
-        chunks = []
-        
         try:
-            chunks.extend(self.get_department_chunks())
-            chunks.extend(self.get_faculty_chunks())
-            chunks.extend(self.get_degree_course_chunks())
-            chunks.extend(self.get_course_chunks())
-            chunks.extend(self.get_course_edition_chunks())
-            chunks.extend(self.get_material_chunks())
-            chunks.extend(self.get_review_chunks())
-            chunks.extend(self.get_valutazione_chunks())
-            chunks.extend(self.get_piattaforma_chunks())
-            chunks.extend(self.get_insegnante_chunks())
-            chunks.extend(self.get_thesis_chunks())
-            
+            chunks = list(self.iter_chunks())
             print(f"✅ Generated {len(chunks)} chunks from database")
             return chunks
             
@@ -0,0 +1,203 @@
+"""
+Pipelined ingestion into Pinecone, shared by the DB indexer and the PDF indexer.
+
+The calling thread embeds one batch at a time and hands it to a bounded queue; a pool of
+upsert threads drains the queue, so embedding and uploads overlap and several upserts are
+in flight at once. A failed upsert is retried with exponential backoff; a batch that keeps
+failing is reported at the end instead of aborting the run. After every successful upsert
+the checkpoint callback records the batch, so a later run resumes from what is missing.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import hashlib
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "100"))
+# Upsert in parallelo e batch già calcolati che possono attendere l'upload (oltre si ferma l'embedding)
+INGEST_UPSERT_WORKERS = int(os.getenv("INGEST_UPSERT_WORKERS", "4"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "5"))
+# Attesa prima del primo nuovo tentativo (secondi), raddoppiata a ogni fallimento
+INGEST_RETRY_DELAY = float(os.getenv("INGEST_RETRY_DELAY", "1"))
+
+
+def chunk_digest(model_name: str, chunk: Dict[str, Any]) -> str:
+    """Hash of what ends up in Pinecone for a chunk: embedding model, text and metadata."""
+    payload = json.dumps(
+        {"model": model_name, "text": chunk["text"], "metadata": chunk["metadata"]},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FileCheckpoint:
+    def __init__(self, path: str):
+        """
+        Checkpoint kept in a JSON file (chunk id -> digest) for indexers without a database table.
+        The file is rewritten atomically after every batch.
+
+        Args:
+            path: location of the checkpoint file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._entries: Dict[str, str] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entries = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def done(self, chunk: Dict[str, Any]) -> bool:
+        return self._entries.get(chunk["id"]) == chunk["hash"]
+
+    def mark(self, chunks: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries.update((chunk["id"], chunk["hash"]) for chunk in chunks)
+            self._write()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._write()
+
+    def _write(self) -> None:
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, encoding="utf-8") as tmp:
+            json.dump(self._entries, tmp)
+        os.replace(tmp.name, self.path)
+
+
+class IngestPipeline:
+    def __init__(self, index, namespace: str, embed: Callable[[List[dict]], List[Any]],
+                 checkpoint: Optional[Callable[[List[dict]], None]] = None,
+                 batch_size: int = INGEST_BATCH_SIZE, upsert_workers: int = INGEST_UPSERT_WORKERS,
+                 queue_size: int = INGEST_QUEUE_SIZE, max_attempts: int = INGEST_MAX_ATTEMPTS,
+                 retry_delay: float = INGEST_RETRY_DELAY, log: Callable[[str], None] = print):
+        """
+        Args:
+            index: Pinecone index.
+            namespace: namespace the vectors are upserted to.
+            embed: turns a batch of chunks into the vectors to upsert (dicts or (id, values, metadata) tuples).
+            checkpoint: called with a batch once its vectors are in Pinecone.
+            batch_size: chunks per embedding and upsert batch.
+            upsert_workers: upserts in flight at once.
+            queue_size: embedded batches waiting for an upsert thread.
+            max_attempts: attempts per upsert before the batch is reported as failed.
+            retry_delay: seconds before the first retry, doubled at every attempt.
+            log: progress output.
+        """
+        self.index = index
+        self.namespace = namespace
+        self.embed = embed
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.upsert_workers = upsert_workers
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.log = log
+        self._lock = threading.Lock()
+
+    def run(self, chunks: List[dict]) -> dict:
+        """
+        Embeds and upserts chunks.
+
+        Returns:
+            dict: vectors upserted, failed batches (number and error), retries, elapsed seconds
+                  and throughput in vectors per second.
+        """
+        batches = [chunks[i:i + self.batch_size] for i in range(0, len(chunks), self.batch_size)]
+        self._total_batches = len(batches)
+        self._stats = {"vectors": len(chunks), "upserted": 0, "retries": 0, "failed_batches": [],
+                       "embed_seconds": 0.0}
+        self._started = time.perf_counter()
+
+        pending: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=self.queue_size)
+        workers = [
+            threading.Thread(target=self._upsert_worker, args=(pending,), name=f"upsert-{i}", daemon=True)
+            for i in range(min(self.upsert_workers, len(batches)))
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for batch_num, batch in enumerate(batches, 1):
+                embed_started = time.perf_counter()
+                try:
+                    vectors = self.embed(batch)
+                except Exception as e:
+                    self._failed(batch_num, e)
+                    continue
+                finally:
+                    self._stats["embed_seconds"] += time.perf_counter() - embed_started
+                # con la coda piena l'embedding aspetta gli upload invece di accumulare vettori in memoria
+                pending.put((batch_num, batch, vectors))
+        finally:
+            for _ in workers:
+                pending.put(None)
+            for worker in workers:
+                worker.join()
+
+        elapsed = time.perf_counter() - self._started
+        stats = dict(self._stats)
+        stats["seconds"] = round(elapsed, 2)
+        stats["embed_seconds"] = round(stats["embed_seconds"], 2)
+        stats["vectors_per_second"] = round(stats["upserted"] / elapsed, 1) if elapsed else 0.0
+        self.log(f"📈 {stats['upserted']}/{stats['vectors']} vectors in {stats['seconds']}s "
+                 f"({stats['vectors_per_second']} vectors/s, embedding {stats['embed_seconds']}s, "
+                 f"{stats['retries']} retries, {len(stats['failed_batches'])} failed batches)")
+        return stats
+
+    def _upsert_worker(self, pending: queue.Queue) -> None:
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            batch_num, batch, vectors = item
+            if self._upsert(batch_num, vectors):
+                if self.checkpoint is not None:
+                    try:
+                        self.checkpoint(batch)
+                    except Exception as e:
+                        # i vettori sono su Pinecone: alla prossima esecuzione il batch viene solo ricaricato
+                        self.log(f"⚠️  Checkpoint of batch {batch_num} not saved: {e}")
+                with self._lock:
+                    self._stats["upserted"] += len(batch)
+                    upserted = self._stats["upserted"]
+                elapsed = time.perf_counter() - self._started
+                self.log(f"✅ Batch {batch_num}/{self._total_batches} uploaded "
+                         f"({upserted}/{self._stats['vectors']} vectors, {upserted / elapsed:.1f} vectors/s)")
+
+    def _upsert(self, batch_num: int, vectors: List[Any]) -> bool:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.index.upsert(vectors=vectors, namespace=self.namespace)
+                return True
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    self._failed(batch_num, e)
+                    return False
+                delay = self.retry_delay * 2 ** (attempt - 1) * (1 + random.random() * 0.25)
+                self.log(f"🔁 Batch {batch_num} failed (attempt {attempt}/{self.max_attempts}), "
+                         f"retrying in {delay:.1f}s: {e}")
+                with self._lock:
+                    self._stats["retries"] += 1
+                time.sleep(delay)
+        return False
+
+    def _failed(self, batch_num: int, error: Exception) -> None:
+        self.log(f"❌ Batch {batch_num}/{self._total_batches} failed: {error}")
+        with self._lock:
+            self._stats["failed_batches"].append({"batch": batch_num, "error": str(error)})
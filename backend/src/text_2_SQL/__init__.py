@@ -1 +1,2 @@
-from .converter import TextToSQLConverter
\ No newline at end of file
+from .converter import TextToSQLConverter
+from .sql_guard import SQLExecutionGuard, SQLGuardRejection
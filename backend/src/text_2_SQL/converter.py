@@ -6,7 +6,15 @@ class TextToSQLConverter:
     def __init__(self):
         pass
 
-    def create_prompt(self, question: str, schema: str) -> str:
+    def create_prompt(self, question: str, schema: str, feedback: Optional[str] = None) -> str:
+        # Se il tentativo precedente è stato rifiutato, il motivo viene riportato all'LLM
+        feedback_section = ""
+        if feedback:
+            feedback_section = f"""
+    ### TENTATIVO PRECEDENTE RIFIUTATO
+    {feedback}
+    Correggi la query tenendo conto di questo errore.
+"""
         prompt = f"""
     Sei un assistente SQL esperto.
 
@@ -49,7 +57,7 @@ class TextToSQLConverter:
         SQL: SELECT ia.nome, ia.cognome FROM Insegnanti_Anagrafici ia JOIN EdizioneCorso e ON ia.id = e.insegnante_anagrafico JOIN Corso c ON e.id = c.id WHERE c.nome = 'Fondamenti di algebra e geometria';
     ### SCHEMA
     {schema}
-
+{feedback_section}
     ### DOMANDA:
     {question}
 
@@ -0,0 +1,170 @@
+import os
+import logging
+from psycopg2 import errors
+from ..utils.db_handler import DBHandler
+
+logger = logging.getLogger(__name__)
+
+# Limiti di esecuzione per le query generate dall'LLM (sovrascrivibili da .env)
+MAX_PLAN_COST = float(os.getenv("T2SQL_MAX_PLAN_COST", "50000"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("T2SQL_STATEMENT_TIMEOUT_MS", "3000"))
+MAX_ROWS = int(os.getenv("T2SQL_MAX_ROWS", "50"))
+
+
+def _split_statements(sql: str) -> list[str]:
+    """
+    Splits SQL on the semicolons outside string literals, quoted identifiers and comments.
+    Comments are replaced by a space; empty statements are dropped.
+
+    Args:
+        sql (str): SQL text, possibly with several statements.
+
+    Returns:
+        list[str]: the statements, stripped and without terminator.
+    """
+    statements, current = [], []
+    i, n = 0, len(sql)
+    while i < n:
+        char = sql[i]
+        if char in ("'", '"'):
+            # '' (o "") dentro un literal chiude e riapre subito: il contenuto resta invariato
+            end = sql.find(char, i + 1)
+            end = n if end == -1 else end + 1
+            current.append(sql[i:end])
+            i = end
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end == -1 else end
+            current.append(" ")
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            i = n if end == -1 else end + 2
+            current.append(" ")
+        elif char == ";":
+            statements.append("".join(current))
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statements.append("".join(current))
+    return [s.strip() for s in statements if s.strip()]
+
+
+class SQLGuardRejection(Exception):
+    """
+    Raised when a generated query is refused before (or during) execution.
+    The message is meant to be shown to the LLM on the next attempt.
+    """
+    pass
+
+
+class SQLExecutionGuard:
+    def __init__(self, db_handler: DBHandler, max_cost: float = MAX_PLAN_COST,
+                 timeout_ms: int = STATEMENT_TIMEOUT_MS, max_rows: int = MAX_ROWS):
+        """
+        Wraps a DBHandler to run LLM-generated SELECTs under cost, time and size limits.
+
+        Args:
+            db_handler (DBHandler): handler whose connection is used for execution.
+            max_cost (float): highest planner total cost accepted by EXPLAIN.
+            timeout_ms (int): statement_timeout applied to the transaction.
+            max_rows (int): maximum number of rows returned to the caller.
+        """
+        self.db_handler = db_handler
+        self.max_cost = max_cost
+        self.timeout_ms = timeout_ms
+        self.max_rows = max_rows
+
+    def normalize(self, sql_query: str) -> str:
+        """
+        Strips terminator and comments and refuses multi-statement input.
+        Semicolons inside string literals do not count as separators.
+
+        Args:
+            sql_query (str): SQL query as cleaned by the converter.
+
+        Returns:
+            str: single statement without terminator.
+        """
+        statements = _split_statements(sql_query)
+        if len(statements) > 1:
+            raise SQLGuardRejection("La query contiene più istruzioni: genera una sola SELECT.")
+        if not statements:
+            raise SQLGuardRejection("La query è vuota: genera una SELECT.")
+        return statements[0]
+
+    def enforce_limit(self, sql: str) -> str:
+        """
+        Wraps the query in an outer SELECT with LIMIT max_rows. The query text is not rewritten,
+        so any LIMIT, OFFSET, FETCH FIRST or locking clause it already has stays valid.
+
+        Args:
+            sql (str): normalized SQL query.
+
+        Returns:
+            str: query whose result size is bounded by max_rows.
+        """
+        return f"SELECT * FROM (\n{sql}\n) AS _guarded LIMIT {int(self.max_rows)}"
+
+    def estimate_cost(self, cursor, sql: str) -> float:
+        """
+        Runs EXPLAIN (without ANALYZE) and returns the planner's total cost.
+
+        Args:
+            cursor: open cursor inside the guarded transaction.
+            sql (str): query to explain.
+
+        Returns:
+            float: estimated total cost of the plan.
+        """
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+        return float(plan[0]["Plan"]["Total Cost"])
+
+    def run(self, sql_query: str) -> tuple[list[tuple], list[str]]:
+        """
+        Executes a generated query in a read-only transaction with statement_timeout,
+        after checking its plan cost and bounding its row count.
+
+        Args:
+            sql_query (str): SQL query produced by the LLM.
+
+        Returns:
+            tuple: Query results (at most max_rows) and columns' names.
+
+        Raises:
+            SQLGuardRejection: if the query is too expensive, too slow or not a single read.
+        """
+        sql = self.enforce_limit(self.normalize(sql_query))
+        conn = self.db_handler.conn
+        # Chiude eventuali transazioni implicite (es. lettura dello schema) così che
+        # SET TRANSACTION READ ONLY sia la prima istruzione della nuova transazione.
+        conn.rollback()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION READ ONLY")
+                cursor.execute("SET LOCAL statement_timeout = %s", (self.timeout_ms,))
+                cost = self.estimate_cost(cursor, sql)
+                logger.info("T2SQL plan cost %.1f (max %.1f)", cost, self.max_cost)
+                if cost > self.max_cost:
+                    raise SQLGuardRejection(
+                        f"Piano troppo costoso (costo stimato {cost:.0f} > {self.max_cost:.0f}): "
+                        "evita prodotti cartesiani, aggiungi condizioni di JOIN e filtri WHERE, "
+                        "seleziona solo le colonne necessarie."
+                    )
+                cursor.execute(sql)
+                rows = cursor.fetchmany(self.max_rows)
+                columns = [desc[0] for desc in cursor.description]
+                return rows, columns
+        except errors.QueryCanceled:
+            raise SQLGuardRejection(
+                f"La query ha superato il limite di {self.timeout_ms} ms: semplificala e aggiungi filtri."
+            )
+        except errors.ReadOnlySqlTransaction:
+            raise SQLGuardRejection("Sono ammesse solo query di lettura (SELECT).")
+        except errors.SyntaxError as e:
+            raise SQLGuardRejection(f"Errore di sintassi nella query: {e.diag.message_primary}.")
+        finally:
+            conn.rollback()
+
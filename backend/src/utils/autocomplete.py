@@ -0,0 +1,321 @@
+import os
+import re
+import time
+import heapq
+import bisect
+import itertools
+import logging
+import threading
+import unicodedata
+from typing import Optional
+from dotenv import load_dotenv
+from .db_utils import MODE
+from .db_pool import pooled_handler
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Ogni quanto l'indice viene ricostruito anche senza scritture locali (le scritture degli altri worker non lo invalidano)
+AUTOCOMPLETE_REFRESH = float(os.getenv("AUTOCOMPLETE_REFRESH", "600"))  # secondi
+AUTOCOMPLETE_LIMIT = 5
+MAX_PREFIX = 40  # lunghezza massima dei prefissi precalcolati
+PREFIX_TOP = 10  # suggerimenti tenuti per ogni prefisso
+
+TEMPLATES = [
+    "Mostra tutti i corsi del primo semestre",
+    "Elenca tutti i corsi di {corso_laurea}",
+    "Chi è il docente di {nome_corso}?",
+    "Mostra i materiali didattici per il corso {nome_corso}",
+    "Quali sono gli orari di ricevimento dei professori?",
+    "Quali corsi prevedono la frequenza obbligatoria?",
+    "Mostra tutte le informazioni sul corso {nome_corso}",
+    "Elenca i professori che ricevono il {giorno_settimana}",
+    "Quali sono le tesi disponibili nel dipartimento di {nome_dipartimento}?",
+    "Mostra tutti i corsi tenuti dal professor {nome_professore}",
+    "Elenca gli studenti iscritti al corso di laurea in {corso_laurea}",
+    "Elenca i corsi che utilizzano la piattaforma {nome_piattaforma}",
+]
+
+GIORNI_SETTIMANA = ["lunedì", "martedì", "mercoledì", "giovedì", "venerdì"]
+
+# Tutti i valori dei segnaposto in un'unica query
+_VALUES_QUERY = """
+    SELECT 'corso_laurea', nome FROM Corso_di_Laurea
+    UNION ALL SELECT 'nome_corso', nome FROM Corso
+    UNION ALL SELECT 'nome_professore', nome || ' ' || cognome FROM Insegnanti_Anagrafici
+    UNION ALL SELECT 'nome_piattaforma', Nome FROM Piattaforme
+    UNION ALL SELECT 'nome_dipartimento', nome FROM Dipartimento
+"""
+
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercase, accents removed, whitespace collapsed: "Chi è il  Docente" -> "chi e il docente".
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+def expand_templates(templates: list[str], values: dict[str, list[str]]) -> list[str]:
+    """
+    Replaces the placeholder of each template with every value of that kind.
+    Templates whose placeholder has no values are dropped.
+    """
+    expanded = []
+    for template in templates:
+        match = _PLACEHOLDER.search(template)
+        if match is None:
+            expanded.append(template)
+        else:
+            expanded += [template.replace(match.group(0), value) for value in values.get(match.group(1), [])]
+    return expanded
+
+
+def _trigrams(word: str) -> set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _within_distance(a: str, b: str, max_distance: int) -> bool:
+    """
+    Levenshtein distance between a and b is at most max_distance (bounded, stops early).
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > max_distance:
+            return False
+        previous = current
+    return previous[-1] <= max_distance
+
+
+class _Snapshot:
+    def __init__(self, suggestions: list[str]):
+        """
+        Immutable index over the expanded suggestions. Queries read one snapshot,
+        rebuilds create a new one and swap the reference, so no lock is needed to search.
+        """
+        # l'id di un suggerimento è anche il suo rango (più corti prima, a parità l'ordine dei template):
+        # ordinare i risultati significa solo prendere gli id più piccoli
+        order = sorted(range(len(suggestions)), key=lambda i: (len(suggestions[i]), i))
+        self.suggestions = [suggestions[i] for i in order]
+        self.normalized = [normalize_text(s) for s in self.suggestions]
+        self.built_at = time.monotonic()
+
+        # prefisso del testo normalizzato -> id dei migliori suggerimenti che iniziano così
+        prefixes = {}
+        for sid, text in enumerate(self.normalized):
+            for end in range(1, min(len(text), MAX_PREFIX) + 1):
+                ids = prefixes.setdefault(text[:end], [])
+                if len(ids) < PREFIX_TOP:
+                    ids.append(sid)
+        self.prefixes = {prefix: tuple(ids) for prefix, ids in prefixes.items()}
+
+        # parola -> suggerimenti che la contengono, vocabolario ordinato per le ricerche per prefisso
+        postings = {}
+        for sid, text in enumerate(self.normalized):
+            for word in set(_WORD.findall(text)):
+                postings.setdefault(word, []).append(sid)
+        self.postings = {word: tuple(ids) for word, ids in postings.items()}  # già in ordine di rango
+        self.posting_sets = {word: frozenset(ids) for word, ids in postings.items()}
+        self.vocabulary = sorted(self.postings)
+
+        # trigramma -> parole, per trovare le parole simili a una parola scritta male
+        trigrams = {}
+        for word in self.vocabulary:
+            for trigram in _trigrams(word):
+                trigrams.setdefault(trigram, []).append(word)
+        self.trigrams = trigrams
+
+    def words_with_prefix(self, prefix: str) -> list[str]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + "\uffff")
+        return self.vocabulary[start:end]
+
+    def similar_words(self, word: str) -> list[str]:
+        """
+        Vocabulary words within edit distance 1 (2 for words of 8+ letters) of word.
+        Candidates are those sharing at least one trigram, so the whole vocabulary is never scanned.
+        """
+        if len(word) < 4:
+            return []
+        max_distance = 2 if len(word) >= 8 else 1
+        candidates = set()
+        for trigram in _trigrams(word):
+            candidates.update(self.trigrams.get(trigram, ()))
+        return [c for c in candidates if _within_distance(word, c, max_distance)]
+
+    def match(self, words: list[str], fuzzy: bool, k: int, exclude: set) -> list[int]:
+        """
+        The k best suggestions (not in exclude) containing every word, the last one as a prefix
+        since it is being typed. With fuzzy, a word that matches nothing is replaced by the
+        similar vocabulary words.
+        The shortest posting list is scanned in rank order and the others are only probed,
+        so common words ("il", "di", "corso") cost a lookup, not a set intersection.
+        """
+        groups = []
+        for position, word in enumerate(words):
+            last = position == len(words) - 1
+            variants = self.words_with_prefix(word) if last else ([word] if word in self.postings else [])
+            if not variants and fuzzy:
+                variants = self.similar_words(word)
+            if not variants:
+                return []
+            groups.append(variants)
+        groups.sort(key=lambda variants: sum(len(self.postings[v]) for v in variants))
+
+        driver, others = groups[0], groups[1:]
+        if len(driver) == 1:
+            scan = self.postings[driver[0]]
+        else:
+            scan = (sid for sid, _ in itertools.groupby(heapq.merge(*(self.postings[v] for v in driver))))
+        probes = [[self.posting_sets[v] for v in variants] for variants in others]
+
+        found = []
+        for sid in scan:
+            if sid in exclude or not all(any(sid in ids for ids in sets) for sets in probes):
+                continue
+            found.append(sid)
+            if len(found) == k:
+                break
+        return found
+
+
+class AutocompleteIndex:
+    def __init__(self, templates: list[str] = TEMPLATES, refresh_every: float = AUTOCOMPLETE_REFRESH):
+        """
+        Question suggestions for the search bar, answered from memory.
+        TEMPLATES are expanded once with every catalog name and indexed by prefix of the whole text,
+        by word (so "docente analisi" finds "Chi è il docente di Analisi I?") and by trigram
+        for typos ("anlisi" -> "analisi"). Rebuilds run in a background thread and never block a keystroke;
+        refresh() is called by the endpoints that write the catalog.
+
+        Args:
+            templates (list): question templates with one {placeholder} each at most.
+            refresh_every (float): seconds after which the index is rebuilt even without refresh().
+        """
+        self.templates = templates
+        self.refresh_every = refresh_every
+        self._snapshot: Optional[_Snapshot] = None
+        self._build_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._rebuilding = False  # un thread di ricostruzione è attivo
+        self._pending = False  # è stata chiesta una ricostruzione non ancora iniziata
+        self._metrics = {"queries": 0, "builds": 0, "build_errors": 0, "last_build_seconds": 0.0}
+
+    def build(self, values: dict[str, list[str]]) -> None:
+        """
+        Builds the index from the placeholder values and swaps it in.
+
+        Args:
+            values (dict): placeholder name -> values, e.g. {"nome_corso": ["Analisi I", ...]}.
+        """
+        start = time.perf_counter()
+        snapshot = _Snapshot(expand_templates(self.templates, values))
+        self._snapshot = snapshot
+        self._metrics["builds"] += 1
+        self._metrics["last_build_seconds"] = round(time.perf_counter() - start, 4)
+        logger.info("Autocomplete index built: %d suggestions in %.3fs", len(snapshot.suggestions),
+                    self._metrics["last_build_seconds"])
+
+    def load(self) -> None:
+        """
+        Reads the catalog names from the database and rebuilds the index.
+        """
+        with self._build_lock:
+            self._load()
+
+    def _load(self) -> None:
+        with pooled_handler(mode=MODE, read_only=True) as db_handler:
+            rows = db_handler.run_query(_VALUES_QUERY, fetch=True)
+        values = {"giorno_settimana": list(GIORNI_SETTIMANA)}
+        for kind, value in rows:
+            values.setdefault(kind, []).append(value)
+        for names in values.values():
+            names.sort()
+        self.build(values)
+
+    def refresh(self) -> None:
+        """
+        Rebuilds the index in a background thread; searches keep using the current one meanwhile.
+        A refresh requested during a rebuild triggers one more rebuild, since the running one
+        may have read the catalog before the write.
+        """
+        with self._state_lock:
+            self._pending = True
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._refresh_worker, name="autocomplete-refresh", daemon=True).start()
+
+    def _refresh_worker(self) -> None:
+        while True:
+            with self._state_lock:
+                if not self._pending:
+                    self._rebuilding = False
+                    return
+                self._pending = False
+            try:
+                self.load()
+            except Exception:
+                self._metrics["build_errors"] += 1
+                logger.exception("Autocomplete index rebuild failed, keeping the previous one")
+
+    def _current(self) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Prima richiesta del processo: l'indice si costruisce una volta sola, le altre attendono
+            with self._build_lock:
+                if self._snapshot is None:
+                    self._load()
+            snapshot = self._snapshot
+        elif time.monotonic() - snapshot.built_at > self.refresh_every and not self._rebuilding:
+            self.refresh()
+        return snapshot
+
+    def suggest(self, query: str, limit: int = AUTOCOMPLETE_LIMIT) -> list[str]:
+        """
+        Args:
+            query (str): text typed so far.
+            limit (int): maximum number of suggestions.
+
+        Returns:
+            list: suggestions, those starting with the query first, then those containing
+            all of its words, then those matching after correcting typos; shorter ones first within each group.
+        """
+        snapshot = self._current()
+        self._metrics["queries"] += 1
+        text = normalize_text(query)
+        if not text:
+            return []
+
+        ranked = list(snapshot.prefixes.get(text, ())) if len(text) <= MAX_PREFIX else []
+        words = _WORD.findall(text)
+        if len(ranked) < limit and words:
+            ranked += snapshot.match(words, False, limit - len(ranked), set(ranked))
+            if len(ranked) < limit:
+                ranked += snapshot.match(words, True, limit - len(ranked), set(ranked))
+        return [snapshot.suggestions[sid] for sid in ranked[:limit]]
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "suggestions": len(snapshot.suggestions) if snapshot else 0,
+            "prefixes": len(snapshot.prefixes) if snapshot else 0,
+            "words": len(snapshot.vocabulary) if snapshot else 0,
+            "age_seconds": round(time.monotonic() - snapshot.built_at, 1) if snapshot else None,
+            "rebuilding": self._rebuilding,
+            **self._metrics,
+        }
+
+
+AUTOCOMPLETE_INDEX = AutocompleteIndex()
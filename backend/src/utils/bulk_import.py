@@ -0,0 +1,196 @@
+import io
+import os
+import csv
+import json
+import codecs
+from typing import Iterator, Optional
+from dotenv import load_dotenv
+from .db_handler import DBHandler
+
+load_dotenv()
+
+# Errori riportati nella risposta di un import (il conteggio totale è sempre completo)
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+STAGING_TABLE = "import_staging"
+FORMATS = ("csv", "ndjson")
+
+
+class ImportFormatError(ValueError):
+    """
+    Raised when the uploaded file cannot be read at all (unknown format, missing columns).
+    """
+    pass
+
+
+class ImportSpec:
+    def __init__(self, columns: list[str], required: list[str], resolved: Optional[list[str]] = None,
+                 steps: Optional[list[str]] = None, insert: str = ""):
+        """
+        Describes a bulk import.
+
+        Args:
+            columns (list): fields read from the file, loaded as TEXT into the staging table.
+            required (list): fields that must be present in the CSV header.
+            resolved (list): extra staging columns filled by the steps (e.g. "corso_id UUID").
+            steps (list): SQL run in order on the staging table. Validations set errore on the rows
+                          they reject (only where errore IS NULL), resolutions fill the resolved columns with joins.
+            insert (str): INSERT ... SELECT ... FROM import_staging WHERE errore IS NULL.
+        """
+        self.columns = columns
+        self.required = required
+        self.resolved = resolved or []
+        self.steps = steps or []
+        self.insert = insert
+
+
+def detect_format(filename: Optional[str], formato: Optional[str]) -> str:
+    """
+    Returns "csv" or "ndjson", from the explicit formato or from the file extension.
+    """
+    if formato:
+        formato = formato.lower()
+    elif filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        formato = "ndjson"
+    else:
+        formato = "csv"
+    if formato not in FORMATS:
+        raise ImportFormatError(f"Formato non supportato: {formato} (ammessi: {', '.join(FORMATS)})")
+    return formato
+
+
+def _cell(value) -> str:
+    # Valori NDJSON -> testo; None e "" diventano NULL nella COPY
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value).strip()
+
+
+def read_rows(binary_file, spec: ImportSpec, formato: str, errors: list) -> Iterator[list]:
+    """
+    Reads the uploaded file lazily and yields [riga, field1, field2, ...] for every record.
+    Records that cannot be parsed are appended to errors as (riga, message) and skipped.
+    The CSV header is checked immediately, before anything is sent to the database.
+
+    Args:
+        binary_file: file object of the upload.
+        spec (ImportSpec): columns to read.
+        formato (str): "csv" (with header) or "ndjson" (one JSON object per line).
+        errors (list): receives the parse errors.
+
+    Raises:
+        ImportFormatError: if required columns are missing from the CSV header.
+    """
+    text = codecs.getreader("utf-8-sig")(binary_file)
+    if formato == "ndjson":
+        return _read_ndjson(text, spec, errors)
+    reader = csv.DictReader(text)
+    header = [name.strip() for name in (reader.fieldnames or [])]
+    missing = [c for c in spec.required if c not in header]
+    if missing:
+        raise ImportFormatError(f"Colonne mancanti nell'intestazione: {', '.join(missing)}")
+    reader.fieldnames = header
+    return _read_csv(reader, spec, errors)
+
+
+def _read_csv(reader: csv.DictReader, spec: ImportSpec, errors: list) -> Iterator[list]:
+    for record in reader:
+        if None in record:
+            errors.append((reader.line_num, "Numero di campi maggiore delle colonne dell'intestazione"))
+            continue
+        yield [reader.line_num] + [_cell(record.get(c)) for c in spec.columns]
+
+
+def _read_ndjson(text, spec: ImportSpec, errors: list) -> Iterator[list]:
+    for line_num, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            errors.append((line_num, "JSON non valido"))
+            continue
+        if not isinstance(record, dict):
+            errors.append((line_num, "La riga deve contenere un oggetto JSON"))
+            continue
+        yield [line_num] + [_cell(record.get(c)) for c in spec.columns]
+
+
+class CsvStream(io.TextIOBase):
+    def __init__(self, rows: Iterator[list]):
+        """
+        File-like view of an iterator of rows as CSV text, for DBHandler.copy_from:
+        rows are serialized only when COPY asks for the next chunk, so the upload is never held in memory.
+        """
+        self._rows = rows
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+        self._pending = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if size < 0:
+            size = len(self._pending)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+
+def run_import(db_handler: DBHandler, spec: ImportSpec, binary_file, formato: str, dry_run: bool = False) -> dict:
+    """
+    Bulk import: COPY into a temporary staging table, set-wise validation and reference
+    resolution in SQL, then a single INSERT ... SELECT of the valid rows.
+    Runs in one transaction; the staging table is dropped at commit.
+
+    Args:
+        db_handler (DBHandler): handler of the request.
+        spec (ImportSpec): what to import.
+        binary_file: file object of the upload.
+        formato (str): "csv" or "ndjson".
+        dry_run (bool): validate only, nothing is inserted.
+
+    Returns:
+        dict: righe lette, inserite, scartate and the first IMPORT_MAX_ERRORS errors ({riga, errore}).
+    """
+    parse_errors = []
+    rows = read_rows(binary_file, spec, formato, parse_errors)
+    staging_columns = ", ".join(
+        ["riga INT PRIMARY KEY"] + [f"{c} TEXT" for c in spec.columns] + spec.resolved + ["errore TEXT"]
+    )
+    with db_handler.unit_of_work():
+        db_handler.run_query(f"CREATE TEMP TABLE {STAGING_TABLE} ({staging_columns}) ON COMMIT DROP")
+        righe = db_handler.copy_from(STAGING_TABLE, ["riga"] + spec.columns, CsvStream(rows))
+        db_handler.run_query(f"ANALYZE {STAGING_TABLE}")
+        for step in spec.steps:
+            db_handler.run_query(step)
+        inserite = 0
+        if not dry_run:
+            with db_handler.conn.cursor() as cursor:
+                cursor.execute(spec.insert)
+                inserite = cursor.rowcount
+        scartate = db_handler.run_query(
+            f"SELECT COUNT(*) FROM {STAGING_TABLE} WHERE errore IS NOT NULL", fetch=True
+        )[0][0]
+        rejected = db_handler.run_query(
+            f"SELECT riga, errore FROM {STAGING_TABLE} WHERE errore IS NOT NULL ORDER BY riga LIMIT %s",
+            params=(IMPORT_MAX_ERRORS,), fetch=True
+        )
+    errori = sorted(parse_errors + [tuple(row) for row in rejected])[:IMPORT_MAX_ERRORS]
+    return {
+        "righe": righe + len(parse_errors),
+        "inserite": inserite,
+        "scartate": scartate + len(parse_errors),
+        "dry_run": dry_run,
+        "errori": [{"riga": riga, "errore": errore} for riga, errore in errori],
+    }
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Durata in memoria delle voci di catalogo e max-age comunicato ai browser (sovrascrivibili da .env)
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "600"))  # secondi
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "60"))  # secondi
+# Voci tenute in memoria: alcune chiavi dipendono dall'input del client (es. nome del corso cercato)
+CATALOG_CACHE_MAX_ENTRIES = int(os.getenv("CATALOG_CACHE_MAX_ENTRIES", "1000"))
+
+
+class CatalogCache:
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL, max_entries: int = CATALOG_CACHE_MAX_ENTRIES):
+        """
+        In-process read-through LRU cache for near-static catalog data (corsi di laurea, corsi,
+        edizioni, insegnanti). Entries are dropped by invalidate() when Add/Profile write the
+        catalog, and in any case after ttl seconds (other workers cannot invalidate this one).
+
+        Args:
+            ttl (float): seconds after which an entry is reloaded from the database.
+            max_entries (int): entries kept before the least recently used is dropped.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[Any, str, float]] = OrderedDict()  # key -> (payload, etag, stored_at)
+        self._loading = {}  # key -> lock finché la voce è in caricamento, così che più miss concorrenti eseguano una sola query
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._metrics = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def get(self, key: str, loader: Callable[[], Any]) -> tuple[Any, str]:
+        """
+        Returns the cached payload for key, calling loader on a miss.
+
+        Args:
+            key (str): cache key, e.g. "corsi:<nome corso di laurea>".
+            loader (callable): function that reads the payload from the database.
+
+        Returns:
+            tuple: the payload and its ETag.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                # Un'altra richiesta potrebbe aver caricato la voce mentre si aspettava il lock
+                entry = self._lookup(key, count=False)
+                if entry is not None:
+                    return entry
+                with self._lock:
+                    generation = self._generation
+                    self._metrics["misses"] += 1
+                payload = loader()
+                etag = self.make_etag(payload)
+                with self._lock:
+                    # Se nel frattempo il catalogo è stato invalidato, il payload potrebbe essere vecchio
+                    if generation == self._generation:
+                        self._store(key, (payload, etag, time.monotonic()))
+                return payload, etag
+        finally:
+            # caricamento concluso: chi aspetta ancora il lock lo ha già in mano e trova la voce in cache
+            with self._lock:
+                if self._loading.get(key) is key_lock:
+                    del self._loading[key]
+
+    def _store(self, key: str, entry: tuple[Any, str, float]) -> None:
+        # chiamata con self._lock già acquisito
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._metrics["evictions"] += 1
+
+    def _lookup(self, key: str, count: bool = True) -> Optional[tuple[Any, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, etag, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self._metrics["hits"] += 1
+            return payload, etag
+
+    def invalidate(self, prefix: str = "") -> None:
+        """
+        Drops the entries whose key starts with prefix (all of them by default).
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+            self._generation += 1
+            self._metrics["invalidations"] += 1
+        logger.info("Catalog cache invalidated (prefix=%r)", prefix)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "loading": len(self._loading),
+                    "ttl": self.ttl, **self._metrics}
+
+    @staticmethod
+    def make_etag(payload: Any) -> str:
+        body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+        return f'"{hashlib.sha1(body.encode("utf-8")).hexdigest()}"'
+
+
+CATALOG_CACHE = CatalogCache()
+
+
+def cached_catalog(request: Request, response: Response, key: str, loader: Callable[[], Any]):
+    """
+    Serves a catalog payload from CATALOG_CACHE, setting ETag and Cache-Control.
+    For GET requests whose If-None-Match matches the current ETag an empty 304 is returned.
+
+    Args:
+        request (Request): incoming request, for If-None-Match.
+        response (Response): response injected by FastAPI, used to set the headers.
+        key (str): cache key.
+        loader (callable): function that reads the payload from the database on a miss.
+
+    Returns:
+        The payload, or a 304 Response.
+    """
+    payload, etag = CATALOG_CACHE.get(key, loader)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={CATALOG_CACHE_MAX_AGE}, must-revalidate"}
+    if request.method == "GET" and etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return payload
+
+
+def invalidate_catalog(prefix: str = "") -> None:
+    """
+    Invalidates the catalog cache after a write to Corso, EdizioneCorso, Corso_di_Laurea,
+    Insegnanti_Anagrafici or Piattaforme.
+    """
+    CATALOG_CACHE.invalidate(prefix)
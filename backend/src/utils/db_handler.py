@@ -1,18 +1,73 @@
+import time
 import logging
+from uuid import uuid4
+from contextlib import contextmanager
+from psycopg2 import errors
 from ..utils.db_utils import get_database_schema
-from typing import Optional
+from ..utils.query_registry import QUERY_REGISTRY
+from typing import Iterator, Optional
 
 logger = logging.getLogger(__name__)
 
+# Numero di righe trasferite per ogni round trip dai cursori server-side
+DEFAULT_BATCH_SIZE = 2000
+
 class DBHandler():
-    def __init__(self, connection):
+    def __init__(self, connection, pool=None, read_only: bool = False):
         """
         Initializes the database handler.
 
         Args:
             connection: psycopg2 connection to the database.
+            pool: ConnectionPool the connection was acquired from, if any.
+            read_only (bool): If True the session is read-only (the server rejects any write) and in
+                              autocommit: every statement is its own transaction and no COMMIT round trip
+                              is sent. The pool restores a read-write, transactional session on release.
         """
         self.conn = connection
+        self.pool = pool
+        self.read_only = read_only
+        self._uow_depth = 0
+        if read_only:
+            self.conn.set_session(readonly=True, autocommit=True)
+
+    @contextmanager
+    def unit_of_work(self):
+        """
+        Groups several statements in a single transaction, committed once on exit
+        and rolled back entirely if any statement fails. Nested units join the outer one.
+
+        Usage:
+            with db_handler.unit_of_work():
+                db_handler.execute_sql_insertion(...)
+                db_handler.execute_sql_insertion(...)
+        """
+        if self._uow_depth:
+            self._uow_depth += 1
+            try:
+                yield self
+            finally:
+                self._uow_depth -= 1
+            return
+        autocommit = self.conn.autocommit
+        if autocommit:
+            self.conn.autocommit = False
+        self._uow_depth = 1
+        try:
+            yield self
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self._uow_depth = 0
+            if autocommit:
+                self.conn.autocommit = True
+
+    def _commit_if_needed(self) -> None:
+        # In autocommit (read_only) o dentro una unit of work il commit non va inviato qui
+        if not self.conn.autocommit and not self._uow_depth:
+            self.conn.commit()
 
 
     def run_query(self, query: str, params: Optional[tuple] = None, many: bool = False, fetch: bool = False, columns: bool = False, rollback: bool = False) -> list[tuple]:
@@ -41,7 +96,7 @@ class DBHandler():
                 else:
                     cursor.execute(query)
     
-                self.conn.commit()
+                self._commit_if_needed()
     
                 if fetch:
                     result = cursor.fetchall()
@@ -54,6 +109,99 @@ class DBHandler():
                 self.conn.rollback()
             raise e
 
+    def run_named(self, name: str, params: Optional[tuple] = None, fetch: bool = True, columns: bool = False) -> list[tuple]:
+        """
+        Executes a query registered with register_query as a server-side prepared statement.
+        The statement is prepared the first time it runs on this connection and then reused,
+        and the registry records its hit count and execution time.
+
+        Args:
+            name (str): Name the query was registered with.
+            params (tuple): Parameters with values for placeholders.
+            fetch (bool): Default true, set false for statements without results.
+            columns (bool): Default false, set true to retrieve query's results and columns' names.
+
+        Returns:
+            list: Query's result, as in run_query.
+            None: If fetch is false.
+        """
+        with self.conn.cursor() as cursor:
+            QUERY_REGISTRY.ensure_prepared(self.conn, cursor, name)
+            start = time.perf_counter()
+            try:
+                cursor.execute(QUERY_REGISTRY.execute_statement(name), params)
+            except errors.InvalidSqlStatementName:
+                if self._uow_depth:
+                    raise
+                # La sessione ha perso lo statement (es. pooler in transaction mode): lo ripreparo una volta
+                self.conn.rollback()
+                QUERY_REGISTRY.forget(self.conn, name)
+                QUERY_REGISTRY.ensure_prepared(self.conn, cursor, name)
+                cursor.execute(QUERY_REGISTRY.execute_statement(name), params)
+            result = cursor.fetchall() if fetch else None
+            QUERY_REGISTRY.record(name, time.perf_counter() - start)
+            self._commit_if_needed()
+            if fetch and columns:
+                return result, [desc[0] for desc in cursor.description]
+            return result
+
+    def iter_batches(self, query: str, params: Optional[tuple] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[list[tuple]]:
+        """
+        Streams the results of a query through a named (server-side) cursor, one batch at a time.
+        Only batch_size rows are held in memory, whatever the size of the result set.
+        The transaction is committed once the cursor is exhausted and rolled back if iteration fails or stops early.
+
+        Args:
+            query (str): SQL query.
+            params (tuple): Parameters with values for placeholders.
+            batch_size (int): Number of rows requested from the server with each fetchmany.
+
+        Returns:
+            Iterator[list[tuple]]: Lists of at most batch_size rows.
+        """
+        # I cursori named richiedono una transazione: in autocommit la si apre solo per la lettura
+        autocommit = self.conn.autocommit
+        if autocommit:
+            self.conn.autocommit = False
+        cursor = self.conn.cursor(name=f"dbh_{uuid4().hex}")
+        cursor.itersize = batch_size
+        completed = False
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+            completed = True
+        finally:
+            # Il cursore named vive solo dentro la transazione: va chiuso prima di terminarla,
+            # anche quando il consumatore abbandona l'iterazione a metà.
+            if not cursor.closed:
+                cursor.close()
+            if not self._uow_depth:
+                if completed:
+                    self.conn.commit()
+                else:
+                    self.conn.rollback()
+            if autocommit:
+                self.conn.autocommit = True
+
+    def iter_query(self, query: str, params: Optional[tuple] = None, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[tuple]:
+        """
+        Row-by-row version of iter_batches, in constant memory.
+
+        Args:
+            query (str): SQL query.
+            params (tuple): Parameters with values for placeholders.
+            batch_size (int): Number of rows requested from the server with each fetchmany.
+
+        Returns:
+            Iterator[tuple]: Query's rows.
+        """
+        for rows in self.iter_batches(query, params=params, batch_size=batch_size):
+            yield from rows
+
     def execute_sql_insertion(self, query: str, params: tuple) -> None:
         """
         Executes an SQL insertion with the provided parameter tuple using the general query runner.
@@ -79,7 +227,26 @@ class DBHandler():
             None:
         """
         self.run_query(query, params=data, many=True)
-    
+
+    def copy_from(self, table: str, columns: list[str], stream) -> int:
+        """
+        Loads rows into a table with COPY ... FROM STDIN in CSV format: a single statement
+        streams the whole input, instead of one INSERT round trip per row.
+
+        Args:
+            table (str): Destination table (trusted name, not a user value).
+            columns (list[str]): Destination columns, in the order of the CSV fields.
+            stream: File-like object whose read(size) returns CSV text, read lazily by psycopg2.
+
+        Returns:
+            int: Number of rows copied.
+        """
+        with self.conn.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", stream)
+            copied = cursor.rowcount
+            self._commit_if_needed()
+            return copied
+
     def execute_query(self, query: str) -> list[tuple]:
         """
         Handles an SQL query and retrieves results with the general query runner.
@@ -121,12 +288,16 @@ class DBHandler():
     
     def close_connection(self) -> None:
         """
-        Closes the database connection.
+        Closes the database connection, or gives it back to its pool when it is pooled.
 
         Returns:
             None
         """
-        if self.conn:
+        if self.conn and self.pool is not None:
+            self.pool.release(self.conn)
+            self.conn = None
+            logger.debug("Database connection released to the pool.")
+        elif self.conn:
             self.conn.close()
             logger.info("Database connection closed.")
         else:
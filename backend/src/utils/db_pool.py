@@ -0,0 +1,274 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from psycopg2 import extensions
+from dotenv import load_dotenv
+from .db_utils import get_connection, MODE
+from .db_handler import DBHandler
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Configurazione del pool (sovrascrivibile da .env)
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # secondi
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "5"))  # secondi
+POOL_HEALTHCHECK_AFTER = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))  # secondi di inattività
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection becomes available within the acquire timeout.
+    """
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, mode: str = MODE, min_size: int = POOL_MIN_SIZE, max_size: int = POOL_MAX_SIZE,
+                 max_lifetime: float = POOL_MAX_LIFETIME, acquire_timeout: float = POOL_ACQUIRE_TIMEOUT,
+                 healthcheck_after: float = POOL_HEALTHCHECK_AFTER):
+        """
+        Thread-safe pool of psycopg2 connections shared by the whole process.
+
+        Args:
+            mode (str): 'local' or 'neon', forwarded to get_connection.
+            min_size (int): connections opened eagerly and kept idle.
+            max_size (int): upper bound on open connections.
+            max_lifetime (float): seconds after which a connection is closed and replaced.
+            acquire_timeout (float): seconds a caller waits for a free connection before PoolTimeout.
+            healthcheck_after (float): idle seconds after which a connection is pinged before reuse.
+        """
+        self.mode = mode
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.healthcheck_after = healthcheck_after
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (conn, created_at, last_used)
+        self._created_at = {}  # id(conn) -> created_at
+        self._size = 0
+        self._metrics = {
+            "acquired": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "healthcheck_failures": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+        for _ in range(min_size):
+            conn = self._open()
+            self._idle.append((conn, self._created_at[id(conn)], time.monotonic()))
+
+    def _open(self):
+        conn = get_connection(mode=self.mode)
+        self._created_at[id(conn)] = time.monotonic()
+        self._size += 1
+        self._metrics["created"] += 1
+        return conn
+
+    def _discard(self, conn) -> None:
+        # Da chiamare tenendo il lock
+        self._created_at.pop(id(conn), None)
+        self._size -= 1
+        self._lock.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, created_at: float) -> bool:
+        return time.monotonic() - created_at > self.max_lifetime
+
+    def _healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """
+        Returns a connection, reusing an idle one when possible.
+        New connections and health checks are done outside the lock, so a slow
+        TLS handshake does not block callers that can reuse an idle connection.
+
+        Returns:
+            psycopg2 connection owned by the caller until release().
+
+        Raises:
+            PoolTimeout: if the pool is exhausted for longer than acquire_timeout.
+        """
+        start = time.monotonic()
+        deadline = start + self.acquire_timeout
+        while True:
+            with self._lock:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        logger.warning("DB pool exhausted: no connection within %.1fs", self.acquire_timeout)
+                        raise PoolTimeout(f"Nessuna connessione disponibile entro {self.acquire_timeout}s")
+                    self._lock.wait(remaining)
+                if self._idle:
+                    conn, created_at, last_used = self._idle.pop()
+                else:
+                    # Riserva lo slot e apre la connessione fuori dal lock
+                    self._size += 1
+                    conn = None
+
+            if conn is None:
+                try:
+                    conn = get_connection(mode=self.mode)
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._created_at[id(conn)] = time.monotonic()
+                    self._metrics["created"] += 1
+                    return self._checkout(conn, start)
+
+            if conn.closed or self._expired(created_at):
+                with self._lock:
+                    self._metrics["recycled"] += 1
+                    self._discard(conn)
+                continue
+            if time.monotonic() - last_used > self.healthcheck_after and not self._healthy(conn):
+                with self._lock:
+                    self._metrics["healthcheck_failures"] += 1
+                    self._discard(conn)
+                continue
+            with self._lock:
+                return self._checkout(conn, start)
+
+    def _checkout(self, conn, start: float):
+        # Da chiamare tenendo il lock
+        waited = time.monotonic() - start
+        self._metrics["acquired"] += 1
+        self._metrics["wait_time_total"] += waited
+        self._metrics["wait_time_max"] = max(self._metrics["wait_time_max"], waited)
+        return conn
+
+    def release(self, conn) -> None:
+        """
+        Gives a connection back to the pool, rolling back any transaction left open.
+        Broken or expired connections are closed instead of being reused.
+
+        Args:
+            conn: connection previously obtained with acquire().
+        """
+        with self._lock:
+            created_at = self._created_at.get(id(conn))
+        if created_at is None:
+            # Connessione non appartenente al pool
+            conn.close()
+            return
+        reusable = not conn.closed
+        if reusable and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                reusable = False
+        if reusable and (conn.autocommit or conn.readonly):
+            # Gli handler read-only lavorano in autocommit con la sessione in sola lettura:
+            # il pool restituisce sempre connessioni transazionali e scrivibili
+            try:
+                if conn.readonly:
+                    # in autocommit set_session agisce su default_transaction_read_only della sessione
+                    conn.autocommit = True
+                    conn.set_session(readonly="DEFAULT")
+                conn.autocommit = False
+            except Exception:
+                reusable = False
+        with self._lock:
+            if not reusable or self._expired(created_at):
+                self._metrics["recycled"] += 1
+                self._discard(conn)
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+                self._lock.notify()
+
+    def close_all(self) -> None:
+        """
+        Closes every idle connection (e.g. at shutdown).
+        """
+        with self._lock:
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+
+    def stats(self) -> dict:
+        """
+        Returns the pool size and acquire metrics, including timeouts and wait times.
+        """
+        with self._lock:
+            acquired = self._metrics["acquired"]
+            return {
+                "mode": self.mode,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **self._metrics,
+                "wait_time_avg": self._metrics["wait_time_total"] / acquired if acquired else 0.0,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(mode: str = MODE) -> ConnectionPool:
+    """
+    Returns the process-wide pool for the given mode, creating it on first use.
+    """
+    with _pools_lock:
+        if mode not in _pools:
+            _pools[mode] = ConnectionPool(mode=mode)
+            logger.info("DB pool '%s' created (min=%d, max=%d)", mode, POOL_MIN_SIZE, POOL_MAX_SIZE)
+        return _pools[mode]
+
+
+def get_pooled_handler(mode: str = MODE, read_only: bool = False) -> DBHandler:
+    """
+    Returns a DBHandler on a pooled connection. close_connection() gives it back to the pool.
+    With read_only=True the session is read-only and in autocommit: writes fail and no COMMIT is sent.
+    """
+    pool = get_pool(mode)
+    return DBHandler(pool.acquire(), pool=pool, read_only=read_only)
+
+
+@contextmanager
+def pooled_handler(mode: str = MODE, read_only: bool = False):
+    """
+    Context manager version of get_pooled_handler, for code that only needs a connection
+    on some paths (e.g. a cache miss) and therefore cannot take it as a FastAPI dependency.
+    """
+    db_handler = get_pooled_handler(mode=mode, read_only=read_only)
+    try:
+        yield db_handler
+    finally:
+        db_handler.close_connection()
+
+
+def pool_stats() -> dict:
+    """
+    Metrics of every pool created so far, keyed by mode.
+    """
+    with _pools_lock:
+        pools = dict(_pools)
+    return {mode: pool.stats() for mode, pool in pools.items()}
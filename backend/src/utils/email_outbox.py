@@ -0,0 +1,241 @@
+import os
+import smtplib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from email.message import EmailMessage
+from typing import Callable, ContextManager, Optional
+from dotenv import load_dotenv
+from .db_utils import MODE
+from .db_pool import pooled_handler
+from .db_handler import DBHandler
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "smtp" in produzione; "file" scrive le email come .eml in EMAIL_FILE_DIR (sviluppo e test)
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "smtp")
+EMAIL_FILE_DIR = os.getenv("EMAIL_FILE_DIR", os.path.join(tempfile.gettempdir(), "faqbuddy-outbox"))
+# Di default Gmail su SSL; per un server SMTP locale (es. MailHog su 1025) SMTP_SSL=false e nessun EMAIL_USER
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Email inviate con una sola connessione SMTP
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+# Attesa prima del primo nuovo tentativo (secondi), raddoppiata a ogni fallimento
+EMAIL_RETRY_DELAY = float(os.getenv("EMAIL_RETRY_DELAY", "30"))
+# Un'email 'in_invio' non aggiornata da così tanti secondi appartiene a un sender morto e torna in coda
+EMAIL_STALE_AFTER = int(os.getenv("EMAIL_STALE_AFTER", "600"))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "5"))
+
+
+class SMTPMailer:
+    """
+    Sends through an SMTP server, opening one connection (and one login) per batch.
+    """
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, use_ssl: bool = SMTP_SSL,
+                 user: Optional[str] = None, password: Optional[str] = None, timeout: float = SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.user = user if user is not None else os.getenv("EMAIL_USER")
+        self.password = password if password is not None else os.getenv("EMAIL_PASS")
+        self.timeout = timeout
+
+    @contextmanager
+    def session(self):
+        smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+        with smtp_class(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.user:
+                smtp.login(self.user, self.password)
+            yield smtp
+
+
+class FileMailer:
+    """
+    Local stand-in for SMTP: every message is written to <directory>/<id>.eml, so tests and
+    development can read the mail that would have been sent.
+    """
+    def __init__(self, directory: str = EMAIL_FILE_DIR):
+        self.directory = directory
+
+    @contextmanager
+    def session(self):
+        os.makedirs(self.directory, exist_ok=True)
+        yield self
+
+    def send_message(self, msg: EmailMessage) -> None:
+        name = msg["X-Outbox-Id"] or str(len(os.listdir(self.directory)))
+        with open(os.path.join(self.directory, f"{name}.eml"), "wb") as f:
+            f.write(msg.as_bytes())
+
+
+_MAILERS = {"smtp": SMTPMailer, "file": FileMailer}
+
+
+def build_message(outbox_id, destinatario: str, oggetto: str, corpo: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = oggetto
+    msg["From"] = os.getenv("EMAIL_FROM")
+    msg["To"] = destinatario
+    msg["X-Outbox-Id"] = str(outbox_id)
+    msg.set_content(corpo)
+    return msg
+
+
+class EmailOutbox:
+    def __init__(self, mailer=None, batch_size: int = EMAIL_BATCH_SIZE, max_attempts: int = EMAIL_MAX_ATTEMPTS,
+                 connect: Optional[Callable[[], ContextManager[DBHandler]]] = None):
+        """
+        Transactional outbox for email. enqueue() inserts an Email_Outbox row with the caller's
+        handler, so the mail is committed (or rolled back) together with the rows it refers to;
+        a background thread claims batches with FOR UPDATE SKIP LOCKED, sends them over a single
+        SMTP session and retries failures with exponential backoff. Rows left 'in_invio' by a
+        crashed sender are claimed again after EMAIL_STALE_AFTER seconds.
+
+        Args:
+            mailer: object whose session() yields something with send_message(msg);
+                    defaults to the EMAIL_BACKEND one (SMTPMailer or FileMailer).
+            batch_size (int): emails sent per SMTP connection.
+            max_attempts (int): attempts before an email is marked 'fallita'.
+            connect: returns a context manager yielding the DBHandler used by the sender;
+                     defaults to a pooled connection (tests pass one bound to their schema).
+        """
+        self.mailer = mailer
+        self.connect = connect or (lambda: pooled_handler(mode=MODE))
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._metrics = {"enqueued": 0, "sent": 0, "batches": 0, "retried": 0, "failed": 0}
+
+    def enqueue(self, db_handler: DBHandler, destinatario: str, oggetto: str, corpo: str) -> None:
+        """
+        Queues an email. Call it inside the unit_of_work of the rows it belongs to, then wake()
+        once the transaction is committed.
+        """
+        db_handler.execute_sql_insertion(
+            "INSERT INTO Email_Outbox (destinatario, oggetto, corpo) VALUES (%s, %s, %s)",
+            (destinatario, oggetto, corpo)
+        )
+        self._metrics["enqueued"] += 1
+
+    def wake(self) -> None:
+        # il sender di questo processo controlla subito la coda invece di aspettare EMAIL_POLL_INTERVAL
+        self._wakeup.set()
+
+    def start(self) -> None:
+        """
+        Starts the sender thread, once per process.
+        """
+        with self._lock:
+            if self.mailer is None:
+                if EMAIL_BACKEND not in _MAILERS:
+                    raise ValueError(f"EMAIL_BACKEND deve essere uno tra: {', '.join(_MAILERS)}")
+                self.mailer = _MAILERS[EMAIL_BACKEND]()
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._sender, name="email-outbox", daemon=True)
+            self._thread.start()
+
+    def stats(self) -> dict:
+        """
+        Backend and local counters of this process.
+        """
+        return {
+            "backend": type(self.mailer).__name__ if self.mailer else None,
+            "running": self._thread is not None,
+            "batch_size": self.batch_size,
+            **self._metrics,
+        }
+
+    def drain(self) -> int:
+        """
+        Sends one batch of due emails. Returns how many were claimed (0 when the queue is empty).
+        """
+        batch = self._claim()
+        if batch:
+            self._send(batch)
+        return len(batch)
+
+    def _sender(self) -> None:
+        while True:
+            try:
+                claimed = self.drain()
+            except Exception:
+                logger.exception("Email outbox: batch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wakeup.wait(EMAIL_POLL_INTERVAL)
+                self._wakeup.clear()
+
+    def _claim(self) -> list[tuple]:
+        with self.connect() as db_handler:
+            return db_handler.run_query("""
+                UPDATE Email_Outbox
+                SET stato = 'in_invio', tentativi = tentativi + 1, aggiornato_il = now()
+                WHERE id IN (
+                    SELECT id FROM Email_Outbox
+                    WHERE (stato = 'in_coda' AND prossimo_tentativo <= now())
+                       OR (stato = 'in_invio' AND aggiornato_il < now() - make_interval(secs => %s))
+                    ORDER BY prossimo_tentativo
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, destinatario, oggetto, corpo, tentativi
+            """, params=(EMAIL_STALE_AFTER, self.batch_size), fetch=True) or []
+
+    def _send(self, batch: list[tuple]) -> None:
+        sent, failed = [], []
+        try:
+            with self.mailer.session() as smtp:
+                for outbox_id, destinatario, oggetto, corpo, tentativi in batch:
+                    try:
+                        smtp.send_message(build_message(outbox_id, destinatario, oggetto, corpo))
+                        sent.append(outbox_id)
+                    except smtplib.SMTPRecipientsRefused as e:
+                        # indirizzo rifiutato: riprovare non serve
+                        failed.append((outbox_id, self.max_attempts, e))
+                    except Exception as e:
+                        failed.append((outbox_id, tentativi, e))
+        except Exception as e:
+            # connessione o login falliti: tutto il batch non ancora inviato torna in coda
+            done = set(sent) | {outbox_id for outbox_id, _, _ in failed}
+            failed.extend((row[0], row[4], e) for row in batch if row[0] not in done)
+        self._metrics["batches"] += 1
+        with self.connect() as db_handler:
+            with db_handler.unit_of_work():
+                if sent:
+                    db_handler.run_query("""
+                        UPDATE Email_Outbox
+                        SET stato = 'inviata', inviata_il = now(), errore = NULL, aggiornato_il = now()
+                        WHERE id = ANY(%s::uuid[])
+                    """, params=([str(outbox_id) for outbox_id in sent],))
+                for outbox_id, tentativi, error in failed:
+                    self._failed(db_handler, outbox_id, tentativi, error)
+        self._metrics["sent"] += len(sent)
+
+    def _failed(self, db_handler: DBHandler, outbox_id, tentativi: int, error: Exception) -> None:
+        logger.warning("Email %s not sent (attempt %d/%d): %s", outbox_id, tentativi, self.max_attempts, error)
+        if tentativi >= self.max_attempts:
+            db_handler.run_query("""
+                UPDATE Email_Outbox SET stato = 'fallita', errore = %s, aggiornato_il = now() WHERE id = %s
+            """, params=(str(error), outbox_id))
+            self._metrics["failed"] += 1
+        else:
+            delay = EMAIL_RETRY_DELAY * 2 ** (tentativi - 1)
+            db_handler.run_query("""
+                UPDATE Email_Outbox
+                SET stato = 'in_coda', errore = %s, aggiornato_il = now(),
+                    prossimo_tentativo = now() + make_interval(secs => %s)
+                WHERE id = %s
+            """, params=(str(error), delay, outbox_id))
+            self._metrics["retried"] += 1
+
+
+EMAIL_OUTBOX = EmailOutbox()
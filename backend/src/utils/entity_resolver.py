@@ -0,0 +1,186 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional
+from dotenv import load_dotenv
+from .db_handler import DBHandler
+
+load_dotenv()
+
+# Le voci scadono come quelle del catalogo (righe cambiate da altri worker vengono riviste) e ogni
+# dizionario tiene al massimo ENTITY_RESOLVER_MAX_ENTRIES chiavi: le matricole e le email arrivano dai client
+ENTITY_RESOLVER_TTL = float(os.getenv("ENTITY_RESOLVER_TTL", os.getenv("CATALOG_CACHE_TTL", "600")))  # secondi
+ENTITY_RESOLVER_MAX_ENTRIES = int(os.getenv("ENTITY_RESOLVER_MAX_ENTRIES", "10000"))
+
+# Lookup eseguiti in caso di miss (indici idx_*_lookup); tests/test_indexes.py ne controlla i piani
+CORSO_DI_LAUREA_QUERY = "SELECT id FROM Corso_di_Laurea WHERE LOWER(nome) = %s LIMIT 1"
+CORSO_QUERY = "SELECT id, id_corso FROM Corso WHERE LOWER(nome) = %s LIMIT 1"
+INSEGNANTE_QUERY = """SELECT id FROM Insegnanti_Anagrafici
+                      WHERE LOWER(nome) = %s AND LOWER(cognome) = %s LIMIT 1"""
+STUDENTE_QUERY = """SELECT s.id, s.corso_laurea_id, u.nome, u.cognome
+                    FROM Studenti s JOIN Utente u ON s.id = u.id
+                    WHERE s.matricola = %s LIMIT 1"""
+UTENTE_QUERY = "SELECT id, nome, cognome FROM Utente WHERE LOWER(email) = %s LIMIT 1"
+
+
+def normalize_name(value: str) -> str:
+    """
+    Normalized form used to match names typed by users against the catalog
+    (case-insensitive, surrounding whitespace ignored). Mirrors LOWER(...) in the SQL lookups.
+    """
+    return value.strip().lower()
+
+
+class EntityResolver:
+    def __init__(self, ttl: float = ENTITY_RESOLVER_TTL, max_entries: int = ENTITY_RESOLVER_MAX_ENTRIES):
+        """
+        Resolves names, emails and matricole to ids through in-memory LRU dictionaries
+        keyed by normalized value. On a miss the entity is read with an indexed lookup
+        (see the idx_*_lookup indexes in db/schema.sql) and remembered for ttl seconds; misses are
+        not cached, so rows inserted by other workers are found on the next request.
+        Endpoints that insert or rename entities keep the dictionaries in sync with remember_corso/forget_user.
+
+        Args:
+            ttl (float): seconds after which an entry is read again from the database.
+            max_entries (int): entries per dictionary before the least recently used is dropped.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # ogni dizionario: chiave -> (valore, salvato_il)
+        self._corsi_laurea = OrderedDict()  # nome normalizzato -> id
+        self._corsi = OrderedDict()  # nome normalizzato -> (id, id_corso)
+        self._insegnanti = OrderedDict()  # (nome, cognome) normalizzati -> id
+        self._studenti = OrderedDict()  # matricola -> (id, corso_laurea_id, nome, cognome)
+        self._utenti = OrderedDict()  # email normalizzata -> (id, nome, cognome)
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def _cached(self, table: OrderedDict, key):
+        with self._lock:
+            entry = table.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del table[key]
+                self._metrics["expired"] += 1
+                entry = None
+            if entry is None:
+                self._metrics["misses"] += 1
+                return None
+            table.move_to_end(key)
+            self._metrics["hits"] += 1
+            return entry[0]
+
+    def _store(self, table: OrderedDict, key, value) -> None:
+        with self._lock:
+            table[key] = (value, time.monotonic())
+            table.move_to_end(key)
+            while len(table) > self.max_entries:
+                table.popitem(last=False)
+                self._metrics["evictions"] += 1
+
+    def corso_di_laurea_id(self, db_handler: DBHandler, nome: str) -> Optional[str]:
+        """
+        Args:
+            db_handler (DBHandler): handler used on a miss.
+            nome (str): name of the corso di laurea.
+
+        Returns:
+            str: id of the corso di laurea, or None if it does not exist.
+        """
+        key = normalize_name(nome)
+        cdl_id = self._cached(self._corsi_laurea, key)
+        if cdl_id is None:
+            rows = db_handler.run_query(CORSO_DI_LAUREA_QUERY, params=(key,), fetch=True)
+            if not rows:
+                return None
+            cdl_id = rows[0][0]
+            self._store(self._corsi_laurea, key, cdl_id)
+        return cdl_id
+
+    def corso(self, db_handler: DBHandler, nome: str) -> Optional[tuple]:
+        """
+        Returns:
+            tuple: (id, id_corso di laurea) of the course, or None if it does not exist.
+        """
+        key = normalize_name(nome)
+        corso = self._cached(self._corsi, key)
+        if corso is None:
+            rows = db_handler.run_query(CORSO_QUERY, params=(key,), fetch=True)
+            if not rows:
+                return None
+            corso = tuple(rows[0])
+            self._store(self._corsi, key, corso)
+        return corso
+
+    def insegnante_id(self, db_handler: DBHandler, nome: str, cognome: str) -> Optional[str]:
+        """
+        Returns:
+            str: id in Insegnanti_Anagrafici, or None if the teacher does not exist.
+        """
+        key = (normalize_name(nome), normalize_name(cognome))
+        insegnante_id = self._cached(self._insegnanti, key)
+        if insegnante_id is None:
+            rows = db_handler.run_query(INSEGNANTE_QUERY, params=key, fetch=True)
+            if not rows:
+                return None
+            insegnante_id = rows[0][0]
+            self._store(self._insegnanti, key, insegnante_id)
+        return insegnante_id
+
+    def studente(self, db_handler: DBHandler, matricola: int) -> Optional[tuple]:
+        """
+        Returns:
+            tuple: (id, corso_laurea_id, nome, cognome) of the student, or None if not found.
+        """
+        studente = self._cached(self._studenti, int(matricola))
+        if studente is None:
+            rows = db_handler.run_query(STUDENTE_QUERY, params=(matricola,), fetch=True)
+            if not rows:
+                return None
+            studente = tuple(rows[0])
+            self._store(self._studenti, int(matricola), studente)
+        return studente
+
+    def utente(self, db_handler: DBHandler, email: str) -> Optional[tuple]:
+        """
+        Returns:
+            tuple: (id, nome, cognome) of the user with that email, or None if not found.
+        """
+        key = normalize_name(email)
+        utente = self._cached(self._utenti, key)
+        if utente is None:
+            rows = db_handler.run_query(UTENTE_QUERY, params=(key,), fetch=True)
+            if not rows:
+                return None
+            utente = tuple(rows[0])
+            self._store(self._utenti, key, utente)
+        return utente
+
+    def remember_corso(self, nome: str, corso_id, cdl_id) -> None:
+        self._store(self._corsi, normalize_name(nome), (corso_id, cdl_id))
+
+    def forget_user(self, user_id) -> None:
+        """
+        Drops every entry of a user (email and matricola), e.g. after the profile was edited.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            for table in (self._utenti, self._studenti):
+                for key in [k for k, (v, _) in table.items() if str(v[0]) == user_id]:
+                    del table[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "corsi_laurea": len(self._corsi_laurea),
+                "corsi": len(self._corsi),
+                "insegnanti": len(self._insegnanti),
+                "studenti": len(self._studenti),
+                "utenti": len(self._utenti),
+                "ttl": self.ttl,
+                "max_entries": self.max_entries,
+                **self._metrics,
+            }
+
+
+ENTITY_RESOLVER = EntityResolver()
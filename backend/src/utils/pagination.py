@@ -0,0 +1,112 @@
+import os
+import json
+import uuid
+import base64
+import binascii
+from typing import Any, Callable, Optional
+from fastapi import HTTPException, Response
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Dimensione delle pagine restituite dagli endpoint paginati (sovrascrivibili da .env)
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+
+# Header con il cursore della pagina successiva, per gli endpoint che restituiscono una lista
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Chiavi minime per la prima pagina: (x) > (MIN) è sempre vero, così prima pagina e successive
+# usano la stessa query preparata e lo stesso range scan sull'indice
+MIN_UUID = "00000000-0000-0000-0000-000000000000"
+MIN_TEXT = ""
+
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    Clamps the requested page size to [1, PAGE_SIZE_MAX], PAGE_SIZE_DEFAULT if not given.
+    """
+    if limit is None:
+        return PAGE_SIZE_DEFAULT
+    return max(1, min(int(limit), PAGE_SIZE_MAX))
+
+
+def encode_cursor(key: tuple) -> str:
+    """
+    Encodes the ordering key of the last row of a page into an opaque token.
+    """
+    raw = json.dumps([str(value) for value in key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str], first: tuple) -> tuple:
+    """
+    Decodes a token produced by encode_cursor.
+
+    Args:
+        token (str): cursor received from the client, None for the first page.
+        first (tuple): key to use for the first page (e.g. (MIN_TEXT, MIN_UUID)).
+
+    Returns:
+        tuple: key after which the next page starts.
+
+    Raises:
+        HTTPException: 400 if the token is malformed.
+    """
+    if not token:
+        return first
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (ValueError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Cursore di paginazione non valido.")
+    if not isinstance(key, list) or len(key) != len(first):
+        raise HTTPException(status_code=400, detail="Cursore di paginazione non valido.")
+    return tuple(_cursor_value(value, start) for value, start in zip(key, first))
+
+
+def _cursor_value(value: Any, start: str) -> str:
+    # Ogni posizione deve avere il tipo della chiave iniziale: le posizioni UUID finiscono in un
+    # cast %s::uuid e un valore non valido farebbe fallire la query con un 500 invece di un 400
+    if not isinstance(value, str):
+        raise HTTPException(status_code=400, detail="Cursore di paginazione non valido.")
+    if start == MIN_UUID:
+        try:
+            return str(uuid.UUID(value))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursore di paginazione non valido.")
+    return value
+
+
+def like_pattern(text: str) -> str:
+    """
+    Turns search text into a LIKE pattern matching it anywhere, lowercase, with % and _ escaped.
+    """
+    escaped = text.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def paginate(rows: list, limit: int, key: Callable[[Any], tuple]) -> tuple[list, Optional[str]]:
+    """
+    Splits a result fetched with LIMIT limit + 1 into the page and the next cursor.
+
+    Args:
+        rows (list): rows ordered by the keyset, at most limit + 1.
+        limit (int): page size.
+        key (callable): returns the ordering key of a row.
+
+    Returns:
+        tuple: rows of the page and the cursor of the next page (None on the last page).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(key(page[-1]))
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """
+    Exposes the next cursor of a list endpoint in the NEXT_CURSOR_HEADER response header.
+    """
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
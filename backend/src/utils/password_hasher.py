@@ -0,0 +1,162 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Costo di bcrypt (log2 delle iterazioni): alzandolo, gli hash esistenti vengono aggiornati al login
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "12"))
+# Hash calcolati in parallelo: di default uno per core
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Richieste che possono attendere un worker libero: oltre si risponde subito 503
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "64"))
+
+
+class PasswordHasherBusy(RuntimeError):
+    """
+    Raised when the hashing queue is full: the endpoint answers 503 instead of piling up requests.
+    """
+    pass
+
+
+def hash_rounds(hashed_password: str) -> Optional[int]:
+    """
+    Returns the cost of a bcrypt hash ("$2b$12$..." -> 12), or None if it is not a bcrypt hash.
+    """
+    parts = hashed_password.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    def __init__(self, rounds: int = PASSWORD_HASH_ROUNDS, workers: int = PASSWORD_HASH_WORKERS,
+                 queue_size: int = PASSWORD_HASH_QUEUE_SIZE):
+        """
+        Runs bcrypt on a dedicated, bounded thread pool. bcrypt releases the GIL while hashing, so
+        the pool uses up to `workers` cores. hash() and verify() are coroutines: the caller awaits
+        the pool without holding a request thread, and at most `queue_size` requests wait for a
+        free worker; past that PasswordHasherBusy is raised right away.
+        verify() also tells the caller when a hash was made with a lower cost than `rounds`,
+        returning the upgraded hash to store.
+
+        Args:
+            rounds (int): bcrypt cost of new hashes.
+            workers (int): threads of the pool.
+            queue_size (int): requests that can wait for a free thread.
+        """
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._metrics = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0,
+                         "wait_ms_total": 0.0, "wait_ms_max": 0.0, "run_ms_total": 0.0}
+
+    async def hash(self, password: str) -> str:
+        """
+        Returns the bcrypt hash of password with the configured cost.
+        """
+        hashed = await self._submit(self._hash, password)
+        self._count("hashed")
+        return hashed
+
+    async def verify(self, password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        """
+        Checks password against hashed_password.
+
+        Returns:
+            tuple: whether the password matches and, if it does but the hash is weaker than the
+                   configured cost, the new hash to save (None otherwise).
+        """
+        ok, upgraded = await self._submit(self._verify, password, hashed_password)
+        self._count("verified")
+        if upgraded is not None:
+            self._count("rehashed")
+        return ok, upgraded
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        rounds = hash_rounds(hashed_password)
+        return rounds is not None and rounds < self.rounds
+
+    def stats(self) -> dict:
+        """
+        Pool size, current queue and counters of this process.
+        """
+        with self._lock:
+            completed = self._metrics["hashed"] + self._metrics["verified"]
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "hashed": self._metrics["hashed"],
+                "verified": self._metrics["verified"],
+                "rehashed": self._metrics["rehashed"],
+                "rejected": self._metrics["rejected"],
+                "avg_wait_ms": round(self._metrics["wait_ms_total"] / completed, 2) if completed else 0.0,
+                "max_wait_ms": round(self._metrics["wait_ms_max"], 2),
+                "avg_run_ms": round(self._metrics["run_ms_total"] / completed, 2) if completed else 0.0,
+            }
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(self.rounds)).decode("utf-8")
+
+    def _verify(self, password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        try:
+            ok = bcrypt.checkpw(password.encode("utf-8"), hashed_password.encode("utf-8"))
+        except ValueError:
+            # hash non valido nel database: la password non può corrispondere
+            logger.warning("Password hash in an unknown format")
+            return False, None
+        if ok and self.needs_rehash(hashed_password):
+            return True, self._hash(password)
+        return ok, None
+
+    async def _submit(self, fn, *args):
+        # acquire non bloccante: l'event loop non si ferma mai ad aspettare un posto in coda
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise PasswordHasherBusy("Troppe richieste di autenticazione, riprova tra poco")
+        queued_at = time.perf_counter()
+        with self._lock:
+            self._pending += 1
+        try:
+            return await asyncio.wrap_future(self._executor.submit(self._run, queued_at, fn, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+    def _run(self, queued_at: float, fn, *args):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+            wait_ms = (started - queued_at) * 1000
+            self._metrics["wait_ms_total"] += wait_ms
+            self._metrics["wait_ms_max"] = max(self._metrics["wait_ms_max"], wait_ms)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._metrics["run_ms_total"] += (time.perf_counter() - started) * 1000
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._metrics[key] += 1
+
+
+PASSWORD_HASHER = PasswordHasher()
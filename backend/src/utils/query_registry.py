@@ -0,0 +1,110 @@
+import re
+import logging
+import threading
+import weakref
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"%s")
+_VALID_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+class QueryRegistry:
+    def __init__(self):
+        """
+        Registry of named SQL statements, prepared server-side (PREPARE) once per connection
+        and then run with EXECUTE, so Postgres parses and plans them only the first time.
+        """
+        self._queries = {}  # name -> (sql con parametri $n, numero di parametri)
+        self._sources = {}  # name -> testo registrato, con i segnaposto %s
+        self._prepared = weakref.WeakKeyDictionary()  # connection -> set di nomi già preparati
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, query: str) -> str:
+        """
+        Registers a parameterized query (psycopg2 %s placeholders) under a name.
+
+        Args:
+            name (str): statement name, lowercase identifier.
+            query (str): SQL query.
+
+        Returns:
+            str: the name, so that routers can keep it in a constant.
+        """
+        if not _VALID_NAME.match(name):
+            raise ValueError(f"Nome di query non valido: {name}")
+        counter = iter(range(1, query.count("%s") + 1))
+        sql = _PLACEHOLDER.sub(lambda _: f"${next(counter)}", query.strip().rstrip(";"))
+        with self._lock:
+            if name in self._queries and self._queries[name][0] != sql:
+                raise ValueError(f"Query '{name}' già registrata con un testo diverso")
+            self._queries[name] = (sql, query.count("%s"))
+            self._sources[name] = query
+            self._stats.setdefault(name, {"hits": 0, "prepares": 0, "total_time": 0.0, "max_time": 0.0})
+        return name
+
+    def sql(self, name: str) -> str:
+        """
+        Returns the query registered under name, with its psycopg2 %s placeholders
+        (e.g. to EXPLAIN the exact statement an endpoint runs).
+        """
+        return self._sources[name]
+
+    def ensure_prepared(self, conn, cursor, name: str) -> None:
+        """
+        Sends PREPARE for the statement if this connection has not seen it yet.
+        Prepared statements live for the whole session, so a pooled connection prepares each one once.
+        """
+        prepared = self._prepared.setdefault(conn, set())
+        if name in prepared:
+            return
+        sql, _ = self._queries[name]
+        cursor.execute(f"PREPARE {name} AS {sql}")
+        prepared.add(name)
+        logger.debug("Prepared statement '%s' on connection %x", name, id(conn))
+        with self._lock:
+            self._stats[name]["prepares"] += 1
+
+    def forget(self, conn, name: str) -> None:
+        """
+        Marks the statement as not prepared on this connection (e.g. after the server lost it).
+        """
+        self._prepared.get(conn, set()).discard(name)
+
+    def execute_statement(self, name: str) -> str:
+        """
+        Returns the EXECUTE statement for the query, with psycopg2 placeholders for its parameters.
+        """
+        _, n_params = self._queries[name]
+        if not n_params:
+            return f"EXECUTE {name}"
+        return f"EXECUTE {name} ({', '.join(['%s'] * n_params)})"
+
+    def record(self, name: str, elapsed: float) -> None:
+        with self._lock:
+            stats = self._stats[name]
+            stats["hits"] += 1
+            stats["total_time"] += elapsed
+            stats["max_time"] = max(stats["max_time"], elapsed)
+
+    def stats(self) -> dict:
+        """
+        Returns, for each named query, how many times it ran, how many times it was prepared
+        and its total, average and maximum execution time in seconds.
+        """
+        with self._lock:
+            return {
+                name: {**s, "avg_time": s["total_time"] / s["hits"] if s["hits"] else 0.0}
+                for name, s in self._stats.items()
+            }
+
+
+QUERY_REGISTRY = QueryRegistry()
+
+
+def register_query(name: str, query: str) -> str:
+    """
+    Registers a query in the process-wide registry used by DBHandler.run_named.
+    """
+    return QUERY_REGISTRY.register(name, query)
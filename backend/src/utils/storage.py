@@ -0,0 +1,203 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Callable, Optional
+from dotenv import load_dotenv
+from .db_handler import DBHandler
+
+load_dotenv()
+
+# "drive" in produzione, "local" per sviluppo e test (nessuna credenziale Google necessaria)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "drive")
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", os.path.join(tempfile.gettempdir(), "faqbuddy-storage"))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class HashingReader:
+    def __init__(self, stream):
+        """
+        Wraps a readable binary stream and hashes (SHA-256) and counts the bytes as they are read,
+        so the content hash comes for free while the file is copied or uploaded.
+        """
+        self._stream = stream
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self._sha256.update(data)
+        self.size += len(data)
+        return data
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+
+def copy_hashed(source, destination) -> tuple[str, int]:
+    """
+    Copies source into destination in HASH_CHUNK_SIZE chunks.
+
+    Returns:
+        tuple: SHA-256 hex digest of the content and its size in bytes.
+    """
+    reader = HashingReader(source)
+    shutil.copyfileobj(reader, destination, HASH_CHUNK_SIZE)
+    return reader.hexdigest(), reader.size
+
+
+class StorageBackend:
+    """
+    Where uploaded files live. put() stores a stream and returns the id saved in the database
+    (Tesi.file, Materiale_Didattico.path_file, Insegnanti_Registrati.cv); delete() removes it.
+    Deduplication is not a backend concern: the Storage_Blob registry (acquire_blob/register_blob/release_blob)
+    maps content hashes to ids, so a backend only ever sees content that is not stored yet.
+    """
+    name = ""
+
+    def put(self, stream, filename: str, parent_folder: str, child_folder: str,
+            mimetype: Optional[str] = None, progress: Optional[Callable[[int], None]] = None) -> str:
+        raise NotImplementedError
+
+    def delete(self, blob_id: str) -> None:
+        raise NotImplementedError
+
+
+class DriveStorage(StorageBackend):
+    """
+    Google Drive, through the shared client of api/drive_utils (chunked resumable uploads, cached folder ids).
+    """
+    name = "drive"
+
+    def put(self, stream, filename, parent_folder, child_folder, mimetype=None, progress=None):
+        from ..api.drive_utils import upload_file_to_drive
+        return upload_file_to_drive(stream, filename, parent_folder, child_folder, mimetype, progress)
+
+    def delete(self, blob_id):
+        from ..api.drive_utils import delete_drive_file
+        delete_drive_file(blob_id)
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str = STORAGE_LOCAL_DIR):
+        """
+        Content-addressed store on the local filesystem: every blob is saved once as
+        <root>/<hash[:2]>/<hash> and its id is the SHA-256 of the content, so storing the
+        same content twice keeps a single file. Used in development and as the test stand-in for Drive.
+
+        Args:
+            root (str): directory of the store.
+        """
+        self.root = root
+
+    def path(self, blob_id: str) -> str:
+        return os.path.join(self.root, blob_id[:2], blob_id)
+
+    def put(self, stream, filename, parent_folder, child_folder, mimetype=None, progress=None):
+        os.makedirs(self.root, exist_ok=True)
+        stream.seek(0)
+        with tempfile.NamedTemporaryFile(dir=self.root, prefix=".upload-", delete=False) as tmp:
+            blob_id, size = copy_hashed(stream, tmp)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        path = self.path(blob_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp.name, path)
+        if progress is not None:
+            progress(size)
+        return blob_id
+
+    def open(self, blob_id: str):
+        return open(self.path(blob_id), "rb")
+
+    def delete(self, blob_id):
+        try:
+            os.remove(self.path(blob_id))
+        except FileNotFoundError:
+            pass
+
+
+_BACKENDS = {"drive": DriveStorage, "local": LocalStorage}
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+    """
+    Returns the process-wide backend selected by STORAGE_BACKEND.
+    """
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND not in _BACKENDS:
+                raise ValueError(f"STORAGE_BACKEND deve essere uno tra: {', '.join(_BACKENDS)}")
+            _storage = _BACKENDS[STORAGE_BACKEND]()
+        return _storage
+
+
+def find_blob(db_handler: DBHandler, backend: str, content_hash: str) -> Optional[str]:
+    """
+    Returns the id of the blob already stored with this content hash, if any.
+    """
+    rows = db_handler.run_query(
+        "SELECT blob_id FROM Storage_Blob WHERE hash = %s AND backend = %s",
+        params=(content_hash, backend), fetch=True
+    )
+    return rows[0][0] if rows else None
+
+
+def acquire_blob(db_handler: DBHandler, backend: str, content_hash: str) -> Optional[str]:
+    """
+    Takes one more reference to an existing blob. Returns None if the blob was released
+    in the meantime, in which case the content has to be stored again.
+    """
+    rows = db_handler.run_query("""
+        UPDATE Storage_Blob SET riferimenti = riferimenti + 1
+        WHERE hash = %s AND backend = %s
+        RETURNING blob_id
+    """, params=(content_hash, backend), fetch=True)
+    return rows[0][0] if rows else None
+
+
+def register_blob(db_handler: DBHandler, backend: str, content_hash: str, blob_id: str, size: int) -> str:
+    """
+    Records a newly stored blob with one reference. If the same content was registered concurrently,
+    the existing blob gains the reference and its id is returned: the caller then deletes its own copy.
+    """
+    rows = db_handler.run_query("""
+        INSERT INTO Storage_Blob (hash, backend, blob_id, byte, riferimenti)
+        VALUES (%s, %s, %s, %s, 1)
+        ON CONFLICT (hash, backend) DO UPDATE SET riferimenti = Storage_Blob.riferimenti + 1
+        RETURNING blob_id
+    """, params=(content_hash, backend, blob_id, size), fetch=True)
+    return rows[0][0]
+
+
+def release_blob(db_handler: DBHandler, blob_id: str, storage: Optional[StorageBackend] = None) -> bool:
+    """
+    Drops one reference to a blob and deletes it from storage when nobody uses it any more.
+    Files uploaded before the registry existed have no Storage_Blob row and are deleted directly.
+
+    Returns:
+        bool: True if the file was deleted from storage.
+    """
+    storage = storage or get_storage()
+    with db_handler.unit_of_work():
+        rows = db_handler.run_query("""
+            UPDATE Storage_Blob SET riferimenti = riferimenti - 1
+            WHERE backend = %s AND blob_id = %s
+            RETURNING riferimenti
+        """, params=(storage.name, blob_id), fetch=True)
+        if rows and rows[0][0] > 0:
+            return False
+        if rows:
+            db_handler.run_query(
+                "DELETE FROM Storage_Blob WHERE backend = %s AND blob_id = %s",
+                params=(storage.name, blob_id)
+            )
+    storage.delete(blob_id)
+    return True
@@ -0,0 +1,314 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+from uuid import uuid4
+from typing import Callable, Optional
+from dotenv import load_dotenv
+from .db_utils import MODE
+from .db_pool import pooled_handler
+from .db_handler import DBHandler
+from .storage import StorageBackend, copy_hashed, find_blob, acquire_blob, register_blob
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Cartella in cui gli upload attendono di essere caricati: deve sopravvivere ai riavvii
+# ed essere la stessa per tutti i worker che leggono la tabella Upload_Job
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "faqbuddy-upload-spool"))
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "2"))
+UPLOAD_MAX_ATTEMPTS = int(os.getenv("UPLOAD_MAX_ATTEMPTS", "5"))
+# Attesa prima del primo nuovo tentativo (secondi), raddoppiata a ogni fallimento
+UPLOAD_RETRY_DELAY = float(os.getenv("UPLOAD_RETRY_DELAY", "10"))
+# Un job 'in_corso' non aggiornato da così tanti secondi appartiene a un worker morto e torna in coda
+UPLOAD_STALE_AFTER = int(os.getenv("UPLOAD_STALE_AFTER", "900"))
+UPLOAD_POLL_INTERVAL = float(os.getenv("UPLOAD_POLL_INTERVAL", "2"))
+
+_JOB_COLUMNS = ("id, tipo, filename, mimetype, parent_folder, child_folder, spool_path, dati, tentativi, file_id, "
+                "hash, byte_totali")
+
+
+class UploadRejected(ValueError):
+    """
+    Raised by a finalizer when the job can never succeed (e.g. the material is already present):
+    the job is marked 'fallito' at once instead of being retried.
+    """
+    pass
+
+
+def spool_upload(stream, job_id: str, spool_dir: str = UPLOAD_SPOOL_DIR) -> tuple[str, int, str]:
+    """
+    Copies an uploaded file into the spool in chunks, hashing it on the way, and flushes it to disk.
+    The file is written under a temporary name and renamed, so the spool never holds partial files.
+
+    Args:
+        stream: file object of the upload.
+        job_id (str): id of the job, used as file name.
+        spool_dir (str): spool directory.
+
+    Returns:
+        tuple: path of the spooled file, its size in bytes and its SHA-256.
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+    path = os.path.join(spool_dir, job_id)
+    partial = f"{path}.part"
+    stream.seek(0)
+    with open(partial, "wb") as f:
+        content_hash, size = copy_hashed(stream, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+    return path, size, content_hash
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadJobQueue:
+    def __init__(self, workers: int = UPLOAD_WORKERS, max_attempts: int = UPLOAD_MAX_ATTEMPTS):
+        """
+        Background uploads. The request only spools the file (hashing it) and inserts an Upload_Job row
+        (stato 'in_coda'); a pool of worker threads claims the jobs with FOR UPDATE SKIP LOCKED and
+        stores the file with retries and exponential backoff, unless a blob with the same content hash
+        is already in Storage_Blob, in which case that blob is reused and nothing is uploaded.
+        The finalizer registered for the job's tipo (e.g. the INSERT into Tesi) runs in the same
+        transaction that takes the blob reference and marks the job 'completato'.
+        The blob id is saved as soon as the upload succeeds, so a retry after a failed finalizer
+        does not upload the file twice. Jobs left 'in_corso' by a crashed worker are claimed again
+        after UPLOAD_STALE_AFTER seconds.
+
+        Args:
+            workers (int): number of worker threads.
+            max_attempts (int): attempts before a job is marked 'fallito'.
+        """
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._finalizers: dict[str, Callable] = {}
+        self._storage: Optional[StorageBackend] = None
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._metrics = {"enqueued": 0, "completed": 0, "deduplicated": 0, "retried": 0, "failed": 0}
+
+    def register(self, tipo: str, finalizer: Optional[Callable] = None) -> None:
+        """
+        Declares a job tipo. finalizer(db_handler, dati, file_id) runs once the file is stored,
+        inside the transaction that completes the job; tipi without a finalizer only upload the file.
+        """
+        self._finalizers[tipo] = finalizer
+
+    def start(self, storage: StorageBackend) -> None:
+        """
+        Starts the worker threads, once per process.
+
+        Args:
+            storage (StorageBackend): where the files are stored.
+        """
+        with self._lock:
+            self._storage = storage
+            if self._threads:
+                return
+            os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f"upload-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, db_handler: DBHandler, tipo: str, stream, filename: str, parent_folder: str,
+                child_folder: str, mimetype: Optional[str] = None, dati: Optional[dict] = None) -> str:
+        """
+        Spools the file and queues its upload. Blocking: call it with run_in_threadpool from async endpoints.
+
+        Args:
+            db_handler (DBHandler): handler of the request.
+            tipo (str): a tipo declared with register.
+            stream: file object of the upload.
+            filename (str): name of the file on Drive.
+            parent_folder (str): Drive folder.
+            child_folder (str): Drive subfolder.
+            mimetype (str): content type of the upload.
+            dati (dict): values the finalizer needs (JSON serializable).
+
+        Returns:
+            str: id of the job.
+        """
+        if tipo not in self._finalizers:
+            raise ValueError(f"Tipo di upload non registrato: {tipo}")
+        job_id = str(uuid4())
+        path, size, content_hash = spool_upload(stream, job_id)
+        try:
+            db_handler.execute_sql_insertion("""
+                INSERT INTO Upload_Job (id, tipo, filename, mimetype, parent_folder, child_folder, spool_path, dati,
+                                        byte_totali, hash)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s, %s)
+            """, (job_id, tipo, filename, mimetype, parent_folder, child_folder, path, json.dumps(dati or {}),
+                  size, content_hash))
+        except Exception:
+            _remove(path)
+            raise
+        self._metrics["enqueued"] += 1
+        self._wakeup.set()
+        return job_id
+
+    def status(self, db_handler: DBHandler, job_id: str) -> Optional[dict]:
+        """
+        Returns the state and progress of a job, or None if it does not exist.
+        """
+        rows = db_handler.run_query("""
+            SELECT id, tipo, stato, filename, byte_caricati, byte_totali, tentativi, file_id, errore,
+                   creato_il, aggiornato_il
+            FROM Upload_Job WHERE id = %s
+        """, params=(job_id,), fetch=True)
+        if not rows:
+            return None
+        (job_id, tipo, stato, filename, caricati, totali, tentativi, file_id, errore,
+         creato_il, aggiornato_il) = rows[0]
+        return {
+            "job_id": str(job_id),
+            "tipo": tipo,
+            "stato": stato,
+            "filename": filename,
+            "byte_caricati": caricati,
+            "byte_totali": totali,
+            "progresso": round(100 * caricati / totali, 1) if totali else 100.0,
+            "tentativi": tentativi,
+            "file_id": file_id,
+            "errore": errore,
+            "creato_il": creato_il.isoformat(),
+            "aggiornato_il": aggiornato_il.isoformat(),
+        }
+
+    def stats(self) -> dict:
+        """
+        Worker count and local counters of this process.
+        """
+        return {
+            "workers": len(self._threads),
+            "storage": self._storage.name if self._storage else None,
+            "spool_dir": UPLOAD_SPOOL_DIR,
+            **self._metrics,
+        }
+
+    def _worker(self) -> None:
+        while True:
+            try:
+                job = self._claim()
+            except Exception:
+                logger.exception("Upload queue: claim failed")
+                job = None
+            if job is None:
+                self._wakeup.wait(UPLOAD_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._process(job)
+
+    def _claim(self) -> Optional[tuple]:
+        with pooled_handler(mode=MODE) as db_handler:
+            rows = db_handler.run_query(f"""
+                UPDATE Upload_Job
+                SET stato = 'in_corso', tentativi = tentativi + 1, aggiornato_il = now()
+                WHERE id = (
+                    SELECT id FROM Upload_Job
+                    WHERE (stato = 'in_coda' AND prossimo_tentativo <= now())
+                       OR (stato = 'in_corso' AND aggiornato_il < now() - make_interval(secs => %s))
+                    ORDER BY prossimo_tentativo
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {_JOB_COLUMNS}
+            """, params=(UPLOAD_STALE_AFTER,), fetch=True)
+        return rows[0] if rows else None
+
+    def _process(self, job: tuple) -> None:
+        (job_id, tipo, filename, mimetype, parent_folder, child_folder, path, dati, tentativi, file_id,
+         content_hash, size) = job
+        backend = self._storage.name
+        try:
+            reused = None
+            if file_id is None and content_hash is not None:
+                with pooled_handler(mode=MODE, read_only=True) as db_handler:
+                    reused = find_blob(db_handler, backend, content_hash)
+            if file_id is None and reused is None:
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"File non presente nello spool: {path}")
+                with open(path, "rb") as stream:
+                    file_id = self._storage.put(stream, filename, parent_folder, child_folder, mimetype,
+                                                lambda sent: self._progress(job_id, sent))
+                self._set(job_id, "file_id = %s, byte_caricati = byte_totali", (file_id,))
+            with pooled_handler(mode=MODE) as db_handler:
+                with db_handler.unit_of_work():
+                    if reused is not None:
+                        blob_id = acquire_blob(db_handler, backend, content_hash)
+                        if blob_id is None:
+                            # il blob è stato cancellato nel frattempo: al prossimo tentativo si carica il file
+                            raise FileNotFoundError("Il file già presente è stato rimosso, nuovo caricamento")
+                    elif content_hash is not None:
+                        blob_id = register_blob(db_handler, backend, content_hash, file_id, size)
+                    else:
+                        # job accodato prima della migrazione 007: nessun hash, il file non è condiviso
+                        blob_id = file_id
+                    finalizer = self._finalizers.get(tipo)
+                    if finalizer is not None:
+                        finalizer(db_handler, dati, blob_id)
+                    db_handler.run_query("""
+                        UPDATE Upload_Job
+                        SET stato = 'completato', file_id = %s, byte_caricati = byte_totali, errore = NULL,
+                            aggiornato_il = now()
+                        WHERE id = %s
+                    """, params=(blob_id, job_id))
+            if file_id is not None and blob_id != file_id:
+                # stesso contenuto registrato da un altro job in parallelo: la copia caricata qui è superflua
+                self._storage.delete(file_id)
+            _remove(path)
+            self._metrics["completed"] += 1
+            if reused is not None:
+                self._metrics["deduplicated"] += 1
+        except UploadRejected as e:
+            # il file caricato da questo job non è stato registrato: nessuno lo userà
+            if file_id is not None:
+                try:
+                    self._storage.delete(file_id)
+                except Exception:
+                    logger.warning("Upload queue: file %s of rejected job %s not deleted", file_id, job_id)
+            self._failed(job_id, path, self.max_attempts, e)
+        except Exception as e:
+            self._failed(job_id, path, tentativi, e)
+
+    def _progress(self, job_id, sent: int) -> None:
+        # aggiorna anche aggiornato_il: il job non viene considerato abbandonato finché avanza
+        try:
+            self._set(job_id, "byte_caricati = %s", (sent,))
+        except Exception:
+            logger.warning("Upload queue: progress of job %s not saved", job_id)
+
+    def _failed(self, job_id, path: str, tentativi: int, error: Exception) -> None:
+        logger.warning("Upload job %s failed (attempt %d/%d): %s", job_id, tentativi, self.max_attempts, error)
+        try:
+            if tentativi >= self.max_attempts:
+                self._set(job_id, "stato = 'fallito', errore = %s", (str(error),))
+                _remove(path)
+                self._metrics["failed"] += 1
+            else:
+                delay = UPLOAD_RETRY_DELAY * 2 ** (tentativi - 1)
+                self._set(job_id, """stato = 'in_coda', errore = %s,
+                          prossimo_tentativo = now() + make_interval(secs => %s)""", (str(error), delay))
+                self._metrics["retried"] += 1
+        except Exception:
+            # il job resta 'in_corso' e viene ripreso dopo UPLOAD_STALE_AFTER
+            logger.exception("Upload queue: state of job %s not saved", job_id)
+
+    def _set(self, job_id, assignments: str, params: tuple) -> None:
+        with pooled_handler(mode=MODE) as db_handler:
+            db_handler.run_query(
+                f"UPDATE Upload_Job SET {assignments}, aggiornato_il = now() WHERE id = %s",
+                params=params + (job_id,)
+            )
+
+
+UPLOAD_JOBS = UploadJobQueue()
@@ -0,0 +1,81 @@
+import os
+import uuid
+import importlib.util
+from contextlib import contextmanager
+from pathlib import Path
+import pytest
+from src.utils.db_utils import get_connection
+from src.utils.db_handler import DBHandler
+
+# Fixture condivisa dai test sul database (test_indexes.py, test_rating.py): crea uno schema
+# temporaneo, applica schema.sql + migrations/ e lo elimina alla fine, il DB di sviluppo non
+# viene toccato. Il modulo di test fornisce solo i propri dati:
+#   SCHEMA_PREFIX                  prefisso del nome dello schema
+#   load_before_migrations(cur)    dati scritti con lo schema originale (es. per verificare un backfill)
+#   load_after_migrations(cur)     dati scritti dopo le migration
+# TEST_DB_MODE sceglie il database ('local' di default, o 'neon').
+
+DB_DIR = Path(__file__).resolve().parents[2] / "db"
+TEST_DB_MODE = os.getenv("TEST_DB_MODE", "local")
+
+
+def load_migrate():
+    spec = importlib.util.spec_from_file_location("faqbuddy_migrate", DB_DIR / "migrate.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def migrate():
+    # db/migrate.py non è un package importabile: i test lo ricevono come fixture
+    return load_migrate()
+
+
+@pytest.fixture(scope="module")
+def cur(request):
+    try:
+        conn = get_connection(mode=TEST_DB_MODE)
+    except Exception as e:
+        pytest.skip(f"Database '{TEST_DB_MODE}' non raggiungibile: {e}")
+    module = request.module
+    schema_name = f"{getattr(module, 'SCHEMA_PREFIX', 'test')}_{uuid.uuid4().hex[:8]}"
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"CREATE SCHEMA {schema_name}")
+        cursor.execute(f"SET search_path TO {schema_name}, public")
+        cursor.execute((DB_DIR / "schema.sql").read_text(encoding="utf-8"))
+        if hasattr(module, "load_before_migrations"):
+            module.load_before_migrations(cursor)
+        conn.commit()
+        load_migrate().apply_migrations(conn, verbose=False)
+        if hasattr(module, "load_after_migrations"):
+            module.load_after_migrations(cursor)
+            conn.commit()
+        yield cursor
+    finally:
+        conn.rollback()
+        cursor.execute(f"DROP SCHEMA IF EXISTS {schema_name} CASCADE")
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+
+@pytest.fixture
+def schema_handler(cur):
+    # Per il codice che apre connessioni proprie (es. il sender dell'outbox): ogni chiamata
+    # restituisce un context manager con un DBHandler su una nuova connessione allo schema temporaneo
+    cur.execute("SHOW search_path")
+    search_path = cur.fetchone()[0]
+
+    @contextmanager
+    def connect():
+        conn = get_connection(mode=TEST_DB_MODE)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SET search_path TO {search_path}")
+            conn.commit()
+            yield DBHandler(conn)
+        finally:
+            conn.close()
+    return connect
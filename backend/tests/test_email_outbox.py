@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+from email import message_from_bytes
+import pytest
+from src.utils.email_outbox import EmailOutbox, FileMailer, build_message
+
+# FileMailer è lo stand-in locale di SMTP: con EMAIL_BACKEND=file le email dell'outbox
+# finiscono in EMAIL_FILE_DIR come .eml invece di essere inviate.
+# I test con cur/schema_handler lavorano sullo schema temporaneo di conftest.py e verificano
+# l'outbox vero e proprio: email scritte solo al commit, retry con backoff e claim scaduti.
+# python -m pytest -s tests/test_email_outbox.py
+
+SCHEMA_PREFIX = "outbox_test"
+
+
+def test_file_mailer_writes_one_eml_per_message(tmp_path):
+    mailer = FileMailer(str(tmp_path))
+    with mailer.session() as smtp:
+        smtp.send_message(build_message("a1", "studente@example.com", "Verifica la tua email", "link: http://x/verify"))
+        smtp.send_message(build_message("b2", "docente@example.com", "Verifica la tua email", "link: http://y/verify"))
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["a1.eml", "b2.eml"]
+    msg = message_from_bytes((tmp_path / "a1.eml").read_bytes())
+    assert msg["To"] == "studente@example.com"
+    assert msg["Subject"] == "Verifica la tua email"
+    assert "http://x/verify" in msg.get_payload()
+
+
+class RecordingMailer:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    @contextmanager
+    def session(self):
+        yield self
+
+    def send_message(self, msg):
+        if self.error:
+            raise self.error
+        self.sent.append(msg["To"])
+
+
+def _outbox(cur, destinatario):
+    cur.execute("SELECT stato, tentativi, errore, prossimo_tentativo > now() FROM Email_Outbox WHERE destinatario = %s",
+                (destinatario,))
+    return cur.fetchone()
+
+
+def test_rolled_back_email_is_not_sent(cur, schema_handler):
+    mailer = RecordingMailer()
+    outbox = EmailOutbox(mailer, connect=schema_handler)
+    with pytest.raises(RuntimeError):
+        with schema_handler() as db_handler, db_handler.unit_of_work():
+            outbox.enqueue(db_handler, "rollback@example.com", "Verifica", "link")
+            # es. l'INSERT di Utente fallisce dopo l'enqueue
+            raise RuntimeError("signup fallito")
+
+    assert outbox.drain() == 0
+    assert mailer.sent == []
+    assert _outbox(cur, "rollback@example.com") is None
+    cur.connection.rollback()
+
+
+def test_failed_send_is_retried_with_backoff(cur, schema_handler):
+    mailer = RecordingMailer(error=ConnectionError("smtp non raggiungibile"))
+    outbox = EmailOutbox(mailer, connect=schema_handler)
+    with schema_handler() as db_handler, db_handler.unit_of_work():
+        outbox.enqueue(db_handler, "retry@example.com", "Verifica", "link")
+
+    assert outbox.drain() == 1
+    stato, tentativi, errore, rimandata = _outbox(cur, "retry@example.com")
+    assert (stato, tentativi) == ("in_coda", 1)
+    assert "smtp non raggiungibile" in errore
+    assert rimandata
+    # prossimo_tentativo nel futuro: il sender non la riprende subito
+    assert outbox.drain() == 0
+    cur.connection.rollback()
+
+
+def test_stale_claim_is_sent_again(cur, schema_handler):
+    # riga lasciata 'in_invio' da un sender terminato durante l'invio
+    cur.execute("""
+        INSERT INTO Email_Outbox (destinatario, oggetto, corpo, stato, tentativi, aggiornato_il)
+        VALUES ('stale@example.com', 'Verifica', 'link', 'in_invio', 1, now() - interval '1 day')
+    """)
+    cur.connection.commit()
+    mailer = RecordingMailer()
+    outbox = EmailOutbox(mailer, connect=schema_handler)
+
+    assert outbox.drain() == 1
+    assert mailer.sent == ["stale@example.com"]
+    stato, tentativi, _, _ = _outbox(cur, "stale@example.com")
+    assert (stato, tentativi) == ("inviata", 2)
+    cur.connection.rollback()
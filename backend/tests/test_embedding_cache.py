@@ -0,0 +1,62 @@
+import numpy as np
+from src.rag.utils.embedding_cache import EmbeddingCache, QueryEmbeddingCache
+
+# La cache degli embedding deve restituire gli stessi vettori dell'encoder, codificando ogni testo
+# una sola volta, anche da una seconda istanza (cioè un altro processo) sulla stessa cartella.
+# La cache delle query resta in memoria e non supera max_entries.
+# python -m pytest -s tests/test_embedding_cache.py
+
+
+class CountingEncoder:
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.encoded = []
+
+    def __call__(self, texts):
+        self.encoded.extend(texts)
+        return np.stack([
+            np.random.default_rng(abs(hash(text)) % 2**32).random(self.dim, dtype=np.float32)
+            for text in texts
+        ])
+
+
+def test_only_new_texts_are_encoded(tmp_path):
+    encoder = CountingEncoder()
+    cache = EmbeddingCache(str(tmp_path))
+
+    first = cache.encode("modello", ["a", "b", "a"], encoder)
+    assert encoder.encoded == ["a", "b"]
+    assert np.array_equal(first[0], first[2])
+
+    second = cache.encode("modello", ["b", "c", "a"], encoder)
+    assert encoder.encoded == ["a", "b", "c"]
+    assert np.array_equal(second[0], first[1])
+    assert np.array_equal(second[2], first[0])
+
+    # stessa cartella, nuova istanza: tutto servito dalla cache su disco
+    reopened = EmbeddingCache(str(tmp_path)).encode("modello", ["c", "a", "b"], encoder)
+    assert encoder.encoded == ["a", "b", "c"]
+    assert np.array_equal(reopened, second[[1, 2, 0]])
+
+
+def test_models_do_not_share_vectors(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    small, large = CountingEncoder(dim=4), CountingEncoder(dim=6)
+    assert cache.encode("small", ["x"], small).shape == (1, 4)
+    assert cache.encode("large", ["x"], large).shape == (1, 6)
+    assert small.encoded == ["x"] and large.encoded == ["x"]
+
+
+def test_query_cache_is_bounded():
+    encoder = CountingEncoder()
+    cache = QueryEmbeddingCache(max_entries=2)
+
+    first = cache.encode("modello", ["a", "b"], encoder)
+    assert np.array_equal(cache.encode("modello", ["a"], encoder)[0], first[0])
+    assert encoder.encoded == ["a", "b"]
+
+    # "b" è la voce usata meno di recente: viene eliminata per fare posto a "c"
+    cache.encode("modello", ["c"], encoder)
+    cache.encode("modello", ["a", "b"], encoder)
+    assert encoder.encoded == ["a", "b", "c", "b"]
+    assert cache.stats()["entries"] == 2
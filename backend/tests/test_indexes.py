@@ -0,0 +1,166 @@
+import os
+import uuid
+import hashlib
+import pytest
+# i router registrano le loro query in QUERY_REGISTRY all'import
+from src.api import Search, Profile, Add  # noqa: F401
+from src.utils.query_registry import QUERY_REGISTRY
+from src.utils.pagination import MIN_TEXT, MIN_UUID
+from src.utils.entity_resolver import CORSO_QUERY, STUDENTE_QUERY, UTENTE_QUERY
+
+# Verifica con EXPLAIN che le query degli endpoint più usati sfruttino gli indici delle migration.
+# Lavora nello schema temporaneo della fixture cur di conftest.py, dove carica dati sintetici
+# dopo le migration.
+# python -m pytest -s tests/test_indexes.py
+
+SCHEMA_PREFIX = "index_test"
+SCALE = float(os.getenv("INDEX_TEST_SCALE", "1"))
+
+N_CDL = 100
+N_CORSI = int(5000 * SCALE)
+N_INSEGNANTI = int(1000 * SCALE)
+N_STUDENTI = int(20000 * SCALE)
+N_MATERIALI = int(50000 * SCALE)
+N_REVIEW = int(50000 * SCALE)
+
+
+def _load_synthetic_data(cur):
+    # id deterministici (md5 -> uuid) così che le tabelle si possano collegare senza lookup
+    cur.execute("""
+        INSERT INTO Dipartimento (id, nome) VALUES (md5('dip')::uuid, 'Dipartimento');
+        INSERT INTO Facolta (id, dipartimento_id, nome) VALUES (md5('fac')::uuid, md5('dip')::uuid, 'Facolta');
+
+        INSERT INTO Corso_di_Laurea (id, id_facolta, nome, tipologia)
+        SELECT md5('cdl' || i)::uuid, md5('fac')::uuid, 'Corso di Laurea ' || i, 'Triennale'
+        FROM generate_series(1, %(n_cdl)s) i;
+
+        INSERT INTO Insegnanti_Anagrafici (id, nome, cognome)
+        SELECT md5('ins' || i)::uuid, 'Nome' || i, 'Cognome' || i
+        FROM generate_series(1, %(n_ins)s) i;
+
+        INSERT INTO Corso (id, id_corso, nome, cfu, idoneità)
+        SELECT md5('corso' || i)::uuid, md5('cdl' || (i %% %(n_cdl)s + 1))::uuid, 'Corso ' || i, 6, false
+        FROM generate_series(1, %(n_corsi)s) i;
+
+        INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, esonero, mod_Esame)
+        SELECT md5('corso' || i)::uuid, md5('ins' || (i %% %(n_ins)s + 1))::uuid, sem, false, 'Scritto'
+        FROM generate_series(1, %(n_corsi)s) i, unnest(ARRAY['S1/2024', 'S2/2024']) sem;
+
+        INSERT INTO Utente (id, email, pwd_hash, nome, cognome)
+        SELECT md5('stud' || i)::uuid, 'studente' || i || '@example.com', 'x', 'Nome' || i, 'Cognome' || i
+        FROM generate_series(1, %(n_stud)s) i;
+
+        INSERT INTO Studenti (id, corso_laurea_id, matricola)
+        SELECT md5('stud' || i)::uuid, md5('cdl' || (i %% %(n_cdl)s + 1))::uuid, 1000000 + i
+        FROM generate_series(1, %(n_stud)s) i;
+
+        INSERT INTO Corsi_seguiti (student_id, edition_id, edition_data, stato)
+        SELECT md5('stud' || i)::uuid, md5('corso' || ((i * 7 + k) %% %(n_corsi)s + 1))::uuid, 'S1/2024', 'attivo'
+        FROM generate_series(1, %(n_stud)s) i, generate_series(1, 5) k;
+
+        INSERT INTO Materiale_Didattico (id, utente_id, edition_id, edition_data, path_file)
+        SELECT md5('mat' || i)::uuid, md5('stud' || (i %% %(n_stud)s + 1))::uuid,
+               md5('corso' || (i %% %(n_corsi)s + 1))::uuid, 'S1/2024', 'drive_file_' || i
+        FROM generate_series(1, %(n_mat)s) i;
+
+        INSERT INTO Review (student_id, edition_id, edition_data, descrizione, voto)
+        SELECT md5('stud' || (i %% %(n_stud)s + 1))::uuid, md5('corso' || (i %% %(n_corsi)s + 1))::uuid,
+               'S1/2024', 'Recensione ' || i, i %% 5 + 1
+        FROM generate_series(1, %(n_rev)s) i;
+
+        INSERT INTO Valutazione (student_id, id_materiale, voto)
+        SELECT md5('stud' || (i %% %(n_stud)s + 1))::uuid, md5('mat' || i)::uuid, i %% 5 + 1
+        FROM generate_series(1, %(n_mat)s) i;
+    """, {
+        "n_cdl": N_CDL, "n_ins": N_INSEGNANTI, "n_corsi": N_CORSI,
+        "n_stud": N_STUDENTI, "n_mat": N_MATERIALI, "n_rev": N_REVIEW,
+    })
+
+
+def load_after_migrations(cur):
+    # I trigger di rating e statistiche ricalcolano gli aggregati a ogni riga: inutili durante il caricamento
+    cur.execute("ALTER TABLE Valutazione DISABLE TRIGGER trigger_aggiorna_rating_materiale")
+    cur.execute("ALTER TABLE Corsi_seguiti DISABLE TRIGGER trigger_aggiorna_statistiche_studente")
+    _load_synthetic_data(cur)
+    cur.execute("ALTER TABLE Valutazione ENABLE TRIGGER trigger_aggiorna_rating_materiale")
+    cur.execute("ALTER TABLE Corsi_seguiti ENABLE TRIGGER trigger_aggiorna_statistiche_studente")
+    cur.execute("SELECT ricalcola_statistiche_studente(s.id) FROM Studenti s")
+    cur.execute("SELECT ricalcola_rating_materiale(m.id) FROM Materiale_Didattico m")
+    cur.connection.commit()
+    cur.execute("ANALYZE")
+
+
+def _index_names(plan):
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+    return names
+
+
+def _explain(cur, query, params):
+    cur.execute(f"EXPLAIN (FORMAT JSON) {query}", params)
+    return cur.fetchone()[0][0]["Plan"]
+
+
+def test_migrations_recorded(cur, migrate):
+    cur.execute("SELECT version FROM schema_migrations ORDER BY version")
+    versions = [row[0] for row in cur.fetchall()]
+    assert versions == [version for version, _, _ in migrate.list_migrations()]
+
+
+def _md5_uuid(text):
+    # stesso id di md5(text)::uuid nei dati sintetici
+    return str(uuid.UUID(hashlib.md5(text.encode("utf-8")).hexdigest()))
+
+
+PAGE = 51  # page_size() + 1, come in paginate()
+CORSO_42 = _md5_uuid("corso42")
+
+# (endpoint, query, parametri, indice atteso). Le query sono quelle registrate dai router
+# (QUERY_REGISTRY) o le costanti del resolver: se un endpoint cambia la sua query, il test la segue.
+HOT_QUERIES = [
+    ("Search.getCorso", QUERY_REGISTRY.sql("search_corsi"), ("Corso di Laurea 7",), "idx_corso_id_corso"),
+    ("Search.getEdizione", QUERY_REGISTRY.sql("search_edizioni"), ("Corso 42",), "idx_corso_nome_id"),
+    ("Search.getMaterials (all)", QUERY_REGISTRY.sql("search_materiali_corso"),
+     ("Corso 42", MIN_UUID, PAGE), "idx_materiale_edizione_id"),
+    ("Search.getMaterials (edizione)", QUERY_REGISTRY.sql("search_materiali_edizione"),
+     (CORSO_42, "S1/2024", MIN_UUID, PAGE), "idx_materiale_edizione_id"),
+    ("Search.getReview (edizione)", QUERY_REGISTRY.sql("search_review_edizione"),
+     (CORSO_42, "S1/2024", MIN_UUID, PAGE), "idx_review_edizione_id"),
+    ("Profile /profile/reviews", QUERY_REGISTRY.sql("profile_recensioni"),
+     (_md5_uuid("stud42"), MIN_UUID, PAGE), "idx_review_student_id"),
+    ("Profile /courses/all", QUERY_REGISTRY.sql("profile_corsi_all"),
+     (MIN_TEXT, MIN_UUID, PAGE), "idx_corso_nome_id"),
+    ("Profile /teachers", QUERY_REGISTRY.sql("profile_insegnanti"),
+     (MIN_TEXT, MIN_TEXT, MIN_UUID, PAGE), "idx_insegnanti_anagrafici_cognome_nome_id"),
+    ("Profile /profile/courses/current", QUERY_REGISTRY.sql("profile_corsi_correnti"),
+     (_md5_uuid("stud42"),), "corsi_seguiti_pkey"),
+    ("Profile /teacher/courses/full", QUERY_REGISTRY.sql("profile_corsi_insegnante"),
+     (_md5_uuid("ins42"),), "idx_edizionecorso_insegnante"),
+    ("Profile /profile/stats", QUERY_REGISTRY.sql("profile_stats"),
+     (_md5_uuid("stud42"), _md5_uuid(f"cdl{42 % N_CDL + 1}")), "statistiche_studente_pkey"),
+    ("Add.addValutazione", QUERY_REGISTRY.sql("add_materiale_per_file"),
+     ("drive_file_42", _md5_uuid(f"corso{42 % N_CORSI + 1}"), "S1/2024"), "idx_materiale_path_file"),
+    ("EntityResolver.corso", CORSO_QUERY, ("corso 42",), "idx_corso_nome_lookup"),
+    ("EntityResolver.studente", STUDENTE_QUERY, (1000042,), "idx_studenti_matricola_lookup"),
+    ("EntityResolver.utente", UTENTE_QUERY, ("studente42@example.com",), "idx_utente_email_lookup"),
+    # queste due sono nel corpo PL/pgSQL di aggiorna_rating_materiale / ricalcola_rating_materiale
+    # (db/migrations/005_rating_incrementale.sql): non hanno una costante Python da cui leggerle
+    ("trigger aggiorna_rating_materiale", """
+        UPDATE Materiale_Didattico
+        SET somma_voti = somma_voti + 4, numero_voti = numero_voti + 1
+        WHERE id = md5(%s)::uuid
+     """, ("mat42",), "materiale_didattico_pkey"),
+    ("ricalcola_rating_materiale", """
+        SELECT COALESCE(SUM(voto), 0), COUNT(*) FROM Valutazione WHERE id_materiale = md5(%s)::uuid
+     """, ("mat42",), "idx_valutazione_materiale"),
+]
+
+
+@pytest.mark.parametrize("endpoint,query,params,index", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_uses_index(cur, endpoint, query, params, index):
+    plan = _explain(cur, query, params)
+    used = _index_names(plan)
+    assert index in used, f"{endpoint}: atteso {index}, indici usati {sorted(used) or 'nessuno'}"
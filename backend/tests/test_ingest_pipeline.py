@@ -0,0 +1,48 @@
+import threading
+from src.rag.utils.ingest_pipeline import IngestPipeline, FileCheckpoint
+
+# La pipeline di ingestione deve caricare ogni batch una volta, ritentare gli upsert falliti
+# e, se un batch continua a fallire, riportarlo senza interrompere gli altri né salvarlo nel checkpoint.
+# python -m pytest -s tests/test_ingest_pipeline.py
+
+
+class FlakyIndex:
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})  # primo id del batch -> upsert da far fallire
+        self.upserted = []
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace):
+        with self._lock:
+            first = vectors[0][0]
+            if self.failures.get(first, 0) > 0:
+                self.failures[first] -= 1
+                raise ConnectionError("Pinecone non raggiungibile")
+            self.upserted.extend(vector_id for vector_id, _, _ in vectors)
+
+
+def _chunks(n):
+    return [{"id": f"c{i}", "text": f"testo {i}", "metadata": {}, "hash": f"h{i}"} for i in range(n)]
+
+
+def _embed(batch):
+    return [(chunk["id"], [0.0], chunk["metadata"]) for chunk in batch]
+
+
+def test_retries_and_checkpoint(tmp_path):
+    index = FlakyIndex(failures={"c10": 2, "c20": 10})
+    checkpoint = FileCheckpoint(str(tmp_path / "checkpoint.json"))
+    pipeline = IngestPipeline(index, "test", embed=_embed, checkpoint=checkpoint.mark, batch_size=10,
+                              upsert_workers=3, queue_size=2, max_attempts=3, retry_delay=0.01, log=lambda _: None)
+
+    stats = pipeline.run(_chunks(35))
+
+    assert sorted(index.upserted) == sorted(f"c{i}" for i in range(35) if not 20 <= i < 30)
+    assert stats["upserted"] == 25
+    assert stats["retries"] == 4
+    assert [failed["batch"] for failed in stats["failed_batches"]] == [3]
+
+    # il checkpoint su disco contiene solo i batch caricati: la nuova esecuzione riprende dal batch fallito
+    resumed = FileCheckpoint(str(tmp_path / "checkpoint.json"))
+    pending = [chunk for chunk in _chunks(35) if not resumed.done(chunk)]
+    assert [chunk["id"] for chunk in pending] == [f"c{i}" for i in range(20, 30)]
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+import pytest
+from src.utils.password_hasher import PasswordHasher, PasswordHasherBusy
+
+# Con i worker occupati e la coda piena, il PasswordHasher deve rifiutare subito le nuove richieste
+# (PasswordHasherBusy, cioè 503) senza bloccare l'event loop, e tornare ad accettarle quando si liberano.
+# python -m pytest -s tests/test_password_hasher.py
+
+
+def test_full_queue_is_rejected():
+    release = threading.Event()
+    hasher = PasswordHasher(rounds=4, workers=1, queue_size=1)
+    hasher._hash = lambda password: release.wait(5) and f"hash:{password}"
+
+    async def scenario():
+        running = asyncio.ensure_future(hasher.hash("a"))
+        queued = asyncio.ensure_future(hasher.hash("b"))
+        await asyncio.sleep(0.05)
+
+        # un worker occupato e un posto in coda: la terza richiesta viene rifiutata subito
+        with pytest.raises(PasswordHasherBusy):
+            await asyncio.wait_for(hasher.hash("c"), timeout=1)
+        stats = hasher.stats()
+        assert stats["rejected"] == 1
+        assert stats["running"] == 1 and stats["queued"] == 1
+
+        release.set()
+        assert await asyncio.gather(running, queued) == ["hash:a", "hash:b"]
+        # coda di nuovo libera
+        assert await hasher.hash("d") == "hash:d"
+
+    asyncio.run(scenario())
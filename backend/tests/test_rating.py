@@ -0,0 +1,111 @@
+import random
+
+# Verifica che somma_voti, numero_voti e rating_medio mantenuti in modo incrementale dal trigger
+# su Valutazione (db/migrations/005_rating_incrementale.sql) coincidano con il ricalcolo completo.
+# Lavora nello schema temporaneo della fixture cur di conftest.py: le valutazioni di partenza
+# sono scritte prima delle migration, così si verifica anche il backfill.
+# python -m pytest -s tests/test_rating.py
+
+SCHEMA_PREFIX = "rating_test"
+
+N_STUDENTI = 40
+N_MATERIALI = 8
+N_OPERAZIONI = 500
+
+
+def load_before_migrations(cur):
+    cur.execute("""
+        INSERT INTO Dipartimento (id, nome) VALUES (md5('dip')::uuid, 'Dipartimento');
+        INSERT INTO Facolta (id, dipartimento_id, nome) VALUES (md5('fac')::uuid, md5('dip')::uuid, 'Facolta');
+        INSERT INTO Corso_di_Laurea (id, id_facolta, nome, tipologia)
+        VALUES (md5('cdl')::uuid, md5('fac')::uuid, 'Corso di Laurea', 'Triennale');
+        INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES (md5('ins')::uuid, 'Nome', 'Cognome');
+        INSERT INTO Corso (id, id_corso, nome, cfu, idoneità) VALUES (md5('corso')::uuid, md5('cdl')::uuid, 'Corso', 6, false);
+        INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, esonero, mod_Esame)
+        VALUES (md5('corso')::uuid, md5('ins')::uuid, 'S1/2024', false, 'Scritto');
+
+        INSERT INTO Utente (id, email, pwd_hash, nome, cognome)
+        SELECT md5('stud' || i)::uuid, 'studente' || i || '@example.com', 'x', 'Nome' || i, 'Cognome' || i
+        FROM generate_series(1, %(n_stud)s) i;
+        INSERT INTO Studenti (id, corso_laurea_id, matricola)
+        SELECT md5('stud' || i)::uuid, md5('cdl')::uuid, 1000000 + i
+        FROM generate_series(1, %(n_stud)s) i;
+
+        INSERT INTO Materiale_Didattico (id, utente_id, edition_id, edition_data, path_file)
+        SELECT md5('mat' || i)::uuid, md5('stud1')::uuid, md5('corso')::uuid, 'S1/2024', 'drive_file_' || i
+        FROM generate_series(1, %(n_mat)s) i;
+
+        -- valutazioni scritte prima della migration, con il trigger originale di schema.sql
+        INSERT INTO Valutazione (student_id, id_materiale, voto)
+        SELECT md5('stud' || i)::uuid, md5('mat' || (i %% %(n_mat)s + 1))::uuid, i %% 5 + 1
+        FROM generate_series(1, %(n_stud)s / 2) i;
+    """, {"n_stud": N_STUDENTI, "n_mat": N_MATERIALI})
+
+
+def _mismatches(cur):
+    # materiali i cui aggregati differiscono dal ricalcolo completo su Valutazione
+    cur.execute("""
+        SELECT m.path_file, m.somma_voti, m.numero_voti, m.rating_medio, v.somma, v.numero, v.media
+        FROM Materiale_Didattico m
+        LEFT JOIN (
+            SELECT id_materiale, SUM(voto) AS somma, COUNT(*) AS numero, AVG(voto)::FLOAT AS media
+            FROM Valutazione
+            GROUP BY id_materiale
+        ) v ON v.id_materiale = m.id
+        WHERE m.somma_voti <> COALESCE(v.somma, 0)
+           OR m.numero_voti <> COALESCE(v.numero, 0)
+           OR (m.rating_medio IS NULL) <> (v.media IS NULL)
+           OR abs(m.rating_medio - v.media) > 1e-9
+    """)
+    return cur.fetchall()
+
+
+def test_backfill_matches_full_recomputation(cur):
+    assert _mismatches(cur) == []
+
+
+def test_incremental_updates_match_full_recomputation(cur):
+    rng = random.Random(42)
+    for _ in range(N_OPERAZIONI):
+        student = f"stud{rng.randint(1, N_STUDENTI)}"
+        materiale = f"mat{rng.randint(1, N_MATERIALI)}"
+        operazione = rng.choice(["insert", "update_voto", "update_commento", "sposta", "delete"])
+        if operazione == "insert":
+            cur.execute("""
+                INSERT INTO Valutazione (student_id, id_materiale, voto)
+                VALUES (md5(%s)::uuid, md5(%s)::uuid, %s)
+                ON CONFLICT (student_id, id_materiale) DO UPDATE SET voto = EXCLUDED.voto
+            """, (student, materiale, rng.randint(1, 5)))
+        elif operazione == "update_voto":
+            cur.execute("""
+                UPDATE Valutazione SET voto = %s
+                WHERE student_id = md5(%s)::uuid AND id_materiale = md5(%s)::uuid
+            """, (rng.randint(1, 5), student, materiale))
+        elif operazione == "update_commento":
+            cur.execute("""
+                UPDATE Valutazione SET commento = %s
+                WHERE student_id = md5(%s)::uuid AND id_materiale = md5(%s)::uuid
+            """, ("commento", student, materiale))
+        elif operazione == "sposta":
+            # la valutazione passa a un altro materiale, se lo studente non l'ha già valutato
+            destinazione = f"mat{rng.randint(1, N_MATERIALI)}"
+            cur.execute("""
+                UPDATE Valutazione v SET id_materiale = md5(%s)::uuid
+                WHERE v.student_id = md5(%s)::uuid AND v.id_materiale = md5(%s)::uuid
+                  AND NOT EXISTS (
+                      SELECT 1 FROM Valutazione w
+                      WHERE w.student_id = v.student_id AND w.id_materiale = md5(%s)::uuid
+                  )
+            """, (destinazione, student, materiale, destinazione))
+        else:
+            cur.execute("""
+                DELETE FROM Valutazione
+                WHERE student_id = md5(%s)::uuid AND id_materiale = md5(%s)::uuid
+            """, (student, materiale))
+    assert _mismatches(cur) == []
+
+
+def test_material_without_ratings_has_no_average(cur):
+    cur.execute("DELETE FROM Valutazione WHERE id_materiale = md5('mat1')::uuid")
+    cur.execute("SELECT somma_voti, numero_voti, rating_medio FROM Materiale_Didattico WHERE id = md5('mat1')::uuid")
+    assert cur.fetchone() == (0, 0, None)
@@ -1,5 +1,5 @@
 import pytest
-from src.text_2_SQL import TextToSQLConverter
+from src.text_2_SQL import TextToSQLConverter, SQLExecutionGuard, SQLGuardRejection
 from src.utils.db_handler import DBHandler
 from src.utils.db_utils import get_connection, MODE
 import time
@@ -99,4 +99,48 @@ def test_sql2t(t2sql, db, question, sql):
         assert len(risposta.strip()) > 0
     except Exception as e:
         db.connection_rollback()  # Usa il metodo del tuo DBHandler
-        pytest.fail(f"Errore SQL per la domanda '{question}': {e}")
\ No newline at end of file
+        pytest.fail(f"Errore SQL per la domanda '{question}': {e}")
+# --- TEST SQLExecutionGuard ---
+# python -m pytest -s backend/tests/test_t2sql.py -k guard
+@pytest.mark.parametrize("sql,expected", [
+    ("SELECT * FROM Corso;", "SELECT * FROM Corso"),
+    ("SELECT * FROM Corso WHERE descrizione ILIKE '%a;b%';", "SELECT * FROM Corso WHERE descrizione ILIKE '%a;b%'"),
+    ("SELECT 'l''esame;' AS x; -- commento; finale", "SELECT 'l''esame;' AS x"),
+])
+def test_guard_normalize_single_statement(sql, expected):
+    assert SQLExecutionGuard(None).normalize(sql) == expected
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM Corso; DROP TABLE Corso",
+    "SELECT ';'; DELETE FROM Utente;",
+])
+def test_guard_normalize_rejects_multiple_statements(sql):
+    with pytest.raises(SQLGuardRejection, match="più istruzioni"):
+        SQLExecutionGuard(None).normalize(sql)
+
+# La coda della query (LIMIT ALL, FETCH FIRST, OFFSET, FOR SHARE) non va riscritta: la guardia
+# deve restituire al massimo max_rows righe oppure un SQLGuardRejection, mai un errore di sintassi.
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM generate_series(1, 100) g LIMIT ALL",
+    "SELECT * FROM generate_series(1, 100) g FETCH FIRST 10 ROWS ONLY",
+    "SELECT * FROM generate_series(1, 100) g ORDER BY 1 OFFSET 5 FETCH NEXT 80 ROWS ONLY",
+    "SELECT * FROM generate_series(1, 100) g LIMIT 10 OFFSET 5",
+    "SELECT nome FROM Corso LIMIT 10 OFFSET 5 FOR SHARE",
+])
+def test_guard_row_limiting_tails(db, sql):
+    guard = SQLExecutionGuard(db, max_rows=20)
+    try:
+        rows, _ = guard.run(sql)
+    except SQLGuardRejection as e:
+        assert "sintassi" not in str(e)
+    else:
+        assert len(rows) <= 20
+
+def test_guard_limit_all_is_bounded(db):
+    rows, columns = SQLExecutionGuard(db, max_rows=20).run("SELECT g AS n FROM generate_series(1, 100) g ORDER BY g LIMIT ALL;")
+    assert columns == ["n"]
+    assert [r[0] for r in rows] == list(range(1, 21))
+
+def test_guard_syntax_error_is_rejection(db):
+    with pytest.raises(SQLGuardRejection, match="sintassi"):
+        SQLExecutionGuard(db).run("SELECT * FROM Corso WHERE")
@@ -79,6 +79,15 @@ def run_schema_sql():
         sys.exit(1)
     print("✅ schema.sql executed.")
 
+def run_migrations(env):
+    print("Running migrations...")
+    migrate_path = os.path.join(os.path.dirname(__file__), "migrate.py")
+    result = subprocess.run([sys.executable, migrate_path, env])
+    if result.returncode != 0:
+        print("❌ Error running migrate.py")
+        sys.exit(1)
+    print("✅ migrations applied.")
+
 def run_setup_data(env):
     print("Running setup_data.py...")
     setup_data_path = os.path.join(os.path.dirname(__file__), "setup_data.py")
@@ -101,5 +110,6 @@ if __name__ == "__main__":
             sys.exit(0)
     drop_and_create_db()
     run_schema_sql()
+    run_migrations(env)
     run_setup_data(env)
     print("🎉 Database setup completo!")
\ No newline at end of file
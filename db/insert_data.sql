@@ -1,59 +0,0 @@
-INSERT INTO Dipartimento (id, nome) VALUES ('9aa1ff8b-2f1e-4633-8f6f-3ef264675ed8', 'Ingegneria informatica, automatica e gestionale Antonio Ruberti');
-INSERT INTO Facolta (id, dipartimento_id, presidente, nome, contatti) VALUES ('131f2d98-aaec-463a-b81e-98470357bc69', '9aa1ff8b-2f1e-4633-8f6f-3ef264675ed8', 'Prof. Marco Schaerf', 'Ingegneria dell''informazione, informatica e statistica', 'presidenza-i3s@uniroma1.it');
-INSERT INTO Corso_di_Laurea (id, id_facolta, nome, tipologia, test, cfu_totali) VALUES ('5c317d75-c880-4cc6-9747-8bc93ff916b9', '131f2d98-aaec-463a-b81e-98470357bc69', 'Ingegneria Informatica e Automatica', 'Triennale', TRUE, 180);
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('1c4d3764-3697-461b-b7be-07e21bcab6d3', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Sistemi Operativi', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('facc64a1-bcbc-4507-989b-c5c19064ee44', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Sistemi di Controllo', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('43f08883-7b54-40e2-9fc9-3c92ecb1b518', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Economia', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('1bd0f0d4-c2b3-4e74-9a58-26bd45e94000', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Fisica', 12, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('183c2450-fe5c-49ba-abba-856546006523', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Algoritmi e Strutture Dati', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('716862a1-7bbe-4606-aff1-3b4975bded6e', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Basi di Dati', 6, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('a1bb310e-57c8-46b7-8695-4f14a4cb06cf', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Sistemi di Calcolo', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('f8051a59-2b7e-49a9-924f-3d19c0ef5fb8', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Sistemi Dinamici', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('518987eb-27eb-4043-8117-4d5cfb709851', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Laboratorio di Ingegneria Informatica', 6, TRUE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('2c774da2-76e1-4348-b84f-b1889d5f7841', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Sicurezza', 6, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('99d0d07c-bb23-43f3-919b-c2017a760589', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Complementi di Programmazione', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('505fa646-9fa1-4419-b675-fe347cb1a704', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Programmazione Matematica', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('cec8d844-3aa6-4f03-9902-edfff6be47ae', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Sistemi Operativi e Reti di Calcolatori', 6, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('e21961e5-3020-45d4-862b-594d648d00b4', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Progettazione del Software', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('19e971ff-6b33-4e90-91e5-88b20b874e12', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Fondamenti di Comunicazioni e Internet', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('c351f7cd-1ad8-45ca-a6bc-e7c9963bf455', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Fondamenti di Algebra e Geometria', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('930415af-454b-49a3-9fb8-2c4687065cba', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Introduzione alla Programmazione', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('e9a561ea-2cf1-475d-be08-a02dbdfb2b3e', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Elementi di Calcolo delle Probabilita'' e Statistica', 6, FALSE, 'Nessuno', 'No');
-INSERT INTO Corso (id, id_corso, nome, cfu, idoneità, prerequisiti, frequenza_obbligatoria) VALUES ('591b637c-2f41-4cff-b8c9-dcb4128b87a7', '5c317d75-c880-4cc6-9747-8bc93ff916b9', 'Fondamenti di Matematica', 9, FALSE, 'Nessuno', 'No');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('d4416845-ef8e-4d7d-9706-b2af518761be', 'Paolo', 'Ottolino');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('3cc00f15-bc94-4ea9-b61e-a1c3321fbcb1', 'Giuseppe', 'Oriolo');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('7bedac12-48fc-4fa1-916a-3954fb0d8128', 'Eugenio', 'Oropallo');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('f30c5bdf-5493-4fab-8cf6-39b045b77662', 'Massimo', 'Petrarca');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('aa8dc5a4-9f39-43dd-b833-f15ea3d2e039', 'Luca', 'Becchetti');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('36d654ba-dbd3-440c-be76-8bfd1968e28c', 'Maurizio', 'Lenzerini');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('e34c3a8a-a364-4747-8026-c19e56d64882', 'Daniele', 'Cono D’elia');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('164a5698-60af-4d56-9ed3-8596ce218916', 'Claudia', 'Califano');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('c1955be6-c54d-4495-9b7e-b9be84c4efb1', 'Roberto', 'Navigli');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('4a7e1cd0-a0e8-4a47-b004-849ddcc05671', 'Gabriele', 'Proietti Mattia');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('a9c02949-f4e1-45a6-802a-35c3e794f466', 'Giampaolo', 'Liuzzi');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('552e58a4-8087-42ba-ab42-fdf88e65c0bd', 'Riccardo', 'Lazzeretti');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('5388ecc6-8f1a-4be3-9d07-019d407267f2', 'Francesco', 'Leotta');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('e37327b7-232a-4523-9cd7-707d49d76a95', 'Marco', 'Polverini');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('d02e044a-01cf-441d-881c-814fcee082d8', 'Dario', 'Salvitti');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('3785fbaf-124c-4918-89bc-0b6fc64232da', 'Giuseppe', 'Santucci');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('742a6cc1-45e8-46b2-967f-ced465c03ecf', 'Emilio', 'De Santis');
-INSERT INTO Insegnanti_Anagrafici (id, nome, cognome) VALUES ('83f07cda-e34a-415d-af43-997f40947b20', 'Nicola', 'Galesi');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('1c4d3764-3697-461b-b7be-07e21bcab6d3', 'd4416845-ef8e-4d7d-9706-b2af518761be', 'S1/2025', '', TRUE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('facc64a1-bcbc-4507-989b-c5c19064ee44', '3cc00f15-bc94-4ea9-b61e-a1c3321fbcb1', 'S2/2024', '', TRUE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('43f08883-7b54-40e2-9fc9-3c92ecb1b518', '7bedac12-48fc-4fa1-916a-3954fb0d8128', 'S1/2025', '', TRUE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('1bd0f0d4-c2b3-4e74-9a58-26bd45e94000', 'f30c5bdf-5493-4fab-8cf6-39b045b77662', 'S2/2023', '', FALSE, 'Scritto + Orale');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('183c2450-fe5c-49ba-abba-856546006523', 'aa8dc5a4-9f39-43dd-b833-f15ea3d2e039', 'S2/2024', '', FALSE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('716862a1-7bbe-4606-aff1-3b4975bded6e', '36d654ba-dbd3-440c-be76-8bfd1968e28c', 'S1/2025', '', FALSE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('a1bb310e-57c8-46b7-8695-4f14a4cb06cf', 'e34c3a8a-a364-4747-8026-c19e56d64882', 'S2/2024', '', FALSE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('f8051a59-2b7e-49a9-924f-3d19c0ef5fb8', '164a5698-60af-4d56-9ed3-8596ce218916', 'S1/2024', '', TRUE, 'Scritto + Orale');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('518987eb-27eb-4043-8117-4d5cfb709851', 'c1955be6-c54d-4495-9b7e-b9be84c4efb1', 'S1/2025', '', FALSE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('2c774da2-76e1-4348-b84f-b1889d5f7841', 'e34c3a8a-a364-4747-8026-c19e56d64882', 'S2/2025', '', FALSE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('99d0d07c-bb23-43f3-919b-c2017a760589', '4a7e1cd0-a0e8-4a47-b004-849ddcc05671', 'S2/2023', '', FALSE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('505fa646-9fa1-4419-b675-fe347cb1a704', 'a9c02949-f4e1-45a6-802a-35c3e794f466', 'S1/2024', '', FALSE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('cec8d844-3aa6-4f03-9902-edfff6be47ae', '552e58a4-8087-42ba-ab42-fdf88e65c0bd', 'S1/2025', '', TRUE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('e21961e5-3020-45d4-862b-594d648d00b4', '5388ecc6-8f1a-4be3-9d07-019d407267f2', 'S1/2024', '', TRUE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('19e971ff-6b33-4e90-91e5-88b20b874e12', 'e37327b7-232a-4523-9cd7-707d49d76a95', 'S1/2024', '', TRUE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('c351f7cd-1ad8-45ca-a6bc-e7c9963bf455', 'd02e044a-01cf-441d-881c-814fcee082d8', 'S2/2023', '', FALSE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('930415af-454b-49a3-9fb8-2c4687065cba', '3785fbaf-124c-4918-89bc-0b6fc64232da', 'S1/2023', '', FALSE, 'Scritto');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('e9a561ea-2cf1-475d-be08-a02dbdfb2b3e', '742a6cc1-45e8-46b2-967f-ced465c03ecf', 'S1/2023', '', FALSE, 'Scritto + Orale');
-INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, orario, esonero, mod_Esame) VALUES ('591b637c-2f41-4cff-b8c9-dcb4128b87a7', '83f07cda-e34a-415d-af43-997f40947b20', 'S1/2023', '', FALSE, 'Scritto');
@@ -0,0 +1,117 @@
+"""
+Versioned migrations for the FAQBuddy database.
+
+Every file in migrations/ named NNN_descrizione.sql is applied once, in order, inside
+its own transaction, and recorded in the schema_migrations table. schema.sql stays the
+base schema; create_db.py and reset_database.py run the migrations right after it.
+
+    python migrate.py local            # applica le migration mancanti
+    python migrate.py neon --status    # mostra quali migration sono applicate
+"""
+
+import os
+import re
+import sys
+import hashlib
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+_MIGRATION_FILE = re.compile(r"^(\d{3})_([a-z0-9_]+)\.sql$")
+
+
+def list_migrations(directory=MIGRATIONS_DIR):
+    """Return (version, name, path) for every migration file, sorted by version."""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = _MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((match.group(1), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations)
+
+
+def _checksum(sql):
+    return hashlib.sha256(sql.encode("utf-8")).hexdigest()
+
+
+def ensure_migrations_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    TEXT PRIMARY KEY,
+            name       TEXT NOT NULL,
+            checksum   TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def applied_migrations(cur):
+    cur.execute("SELECT version, checksum FROM schema_migrations")
+    return dict(cur.fetchall())
+
+
+def apply_migrations(conn, directory=MIGRATIONS_DIR, verbose=True):
+    """
+    Apply the pending migrations on an open psycopg2 connection.
+    A migration that fails is rolled back and stops the run, leaving the earlier ones applied.
+
+    Returns:
+        list: versions applied by this call.
+    """
+    with conn.cursor() as cur:
+        ensure_migrations_table(cur)
+        done = applied_migrations(cur)
+    conn.commit()
+
+    applied = []
+    for version, name, path in list_migrations(directory):
+        with open(path, "r", encoding="utf-8") as f:
+            sql = f.read()
+        if version in done:
+            if done[version] != _checksum(sql) and verbose:
+                print(f"⚠️  Migration {version}_{name} modificata dopo essere stata applicata")
+            continue
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (version, name, _checksum(sql))
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            print(f"❌ Migration {version}_{name} fallita")
+            raise
+        applied.append(version)
+        if verbose:
+            print(f"✅ Migration {version}_{name} applicata")
+    return applied
+
+
+def print_status(conn, directory=MIGRATIONS_DIR):
+    with conn.cursor() as cur:
+        ensure_migrations_table(cur)
+        done = applied_migrations(cur)
+    conn.commit()
+    for version, name, _ in list_migrations(directory):
+        print(f"{'✅' if version in done else '⏳'} {version}_{name}")
+
+
+if __name__ == "__main__":
+    from utils import get_connection
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("local", "neon"):
+        print("❌ Devi specificare l'ambiente: python migrate.py local  oppure  neon  [--status]")
+        sys.exit(1)
+    conn = get_connection(sys.argv[1])
+    try:
+        if "--status" in sys.argv[2:]:
+            print_status(conn)
+        else:
+            applied = apply_migrations(conn)
+            if not applied:
+                print("✅ Nessuna migration da applicare.")
+    finally:
+        conn.close()
@@ -0,0 +1,10 @@
+------------------------------------------------
+-- 001: indici per le risoluzioni nome/email/matricola -> id
+-- (backend/src/utils/entity_resolver.py)
+------------------------------------------------
+
+CREATE INDEX IF NOT EXISTS idx_corso_di_laurea_nome_lookup ON Corso_di_Laurea (LOWER(nome));
+CREATE INDEX IF NOT EXISTS idx_corso_nome_lookup ON Corso (LOWER(nome));
+CREATE INDEX IF NOT EXISTS idx_insegnanti_anagrafici_nome_lookup ON Insegnanti_Anagrafici (LOWER(nome), LOWER(cognome));
+CREATE INDEX IF NOT EXISTS idx_studenti_matricola_lookup ON Studenti (matricola);
+CREATE INDEX IF NOT EXISTS idx_utente_email_lookup ON Utente (LOWER(email));
@@ -0,0 +1,21 @@
+------------------------------------------------
+-- 002: indici secondari per JOIN e filtri degli endpoint più usati
+-- Corsi_seguiti.student_id non serve: è la prima colonna della PRIMARY KEY
+------------------------------------------------
+
+-- Search: ricerca edizioni/materiali/info per nome corso (confronto esatto, non LOWER)
+CREATE INDEX IF NOT EXISTS idx_corso_nome ON Corso (nome);
+-- Search.getCorso, Profile corsi disponibili/non completati: corsi di un corso di laurea
+CREATE INDEX IF NOT EXISTS idx_corso_id_corso ON Corso (id_corso);
+-- Profile insegnante: edizioni tenute da un docente
+CREATE INDEX IF NOT EXISTS idx_edizionecorso_insegnante ON EdizioneCorso (insegnante_anagrafico);
+-- Search.getMaterials: materiali di un'edizione
+CREATE INDEX IF NOT EXISTS idx_materiale_edizione ON Materiale_Didattico (edition_id, edition_data);
+-- Add.addValutazione e Profile: materiale a partire dal file su Drive
+CREATE INDEX IF NOT EXISTS idx_materiale_path_file ON Materiale_Didattico (path_file);
+-- Search.getReview: recensioni di un'edizione
+CREATE INDEX IF NOT EXISTS idx_review_edizione ON Review (edition_id, edition_data);
+-- Profile: recensioni dello studente
+CREATE INDEX IF NOT EXISTS idx_review_student ON Review (student_id);
+-- Trigger aggiorna_rating_materiale: valutazioni di un materiale
+CREATE INDEX IF NOT EXISTS idx_valutazione_materiale ON Valutazione (id_materiale);
@@ -0,0 +1,23 @@
+------------------------------------------------
+-- 003: indici per la paginazione keyset (ORDER BY ... LIMIT sulle stesse colonne del filtro)
+-- Sostituiscono gli indici di 002 che coprivano solo il filtro
+------------------------------------------------
+
+-- Search.getMaterials: materiali di un'edizione ordinati per id
+DROP INDEX IF EXISTS idx_materiale_edizione;
+CREATE INDEX IF NOT EXISTS idx_materiale_edizione_id ON Materiale_Didattico (edition_id, edition_data, id);
+
+-- Search.getReview: recensioni di un'edizione ordinate per id
+DROP INDEX IF EXISTS idx_review_edizione;
+CREATE INDEX IF NOT EXISTS idx_review_edizione_id ON Review (edition_id, edition_data, id);
+
+-- Profile /profile/reviews: recensioni dello studente ordinate per id
+DROP INDEX IF EXISTS idx_review_student;
+CREATE INDEX IF NOT EXISTS idx_review_student_id ON Review (student_id, id);
+
+-- Profile /courses/all: corsi ordinati per (nome, id); serve anche le ricerche per nome esatto
+DROP INDEX IF EXISTS idx_corso_nome;
+CREATE INDEX IF NOT EXISTS idx_corso_nome_id ON Corso (nome, id);
+
+-- Profile /teachers: insegnanti ordinati per (cognome, nome, id)
+CREATE INDEX IF NOT EXISTS idx_insegnanti_anagrafici_cognome_nome_id ON Insegnanti_Anagrafici (cognome, nome, id);
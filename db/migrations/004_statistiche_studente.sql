@@ -0,0 +1,94 @@
+------------------------------------------------
+-- 004: statistiche per studente mantenute dai trigger
+-- /profile/stats e /courses/not-completed leggono una riga per chiave primaria
+-- invece di rifare le JOIN Corsi_seguiti -> EdizioneCorso -> Corso a ogni richiesta
+------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS Statistiche_Studente (
+    student_id       UUID PRIMARY KEY REFERENCES Studenti(id) ON DELETE CASCADE,
+    esami_superati   INT NOT NULL DEFAULT 0,   -- corsi completati con voto >= 18
+    somma_voti       INT NOT NULL DEFAULT 0,
+    somma_voti_cfu   INT NOT NULL DEFAULT 0,   -- somma di voto * cfu, per la media ponderata
+    cfu_completati   INT NOT NULL DEFAULT 0,
+    esami            JSONB NOT NULL DEFAULT '[]'::jsonb,  -- [{id, nome, voto, cfu}] ordinati per nome
+    corsi_completati UUID[] NOT NULL DEFAULT '{}'         -- tutti i corsi con stato 'completato'
+);
+
+-- Ricalcola la riga di uno studente: legge solo i suoi Corsi_seguiti (chiave primaria)
+CREATE OR REPLACE FUNCTION ricalcola_statistiche_studente(p_student_id UUID)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO Statistiche_Studente AS st (
+        student_id, esami_superati, somma_voti, somma_voti_cfu, cfu_completati, esami, corsi_completati
+    )
+    SELECT
+        p_student_id,
+        COUNT(*) FILTER (WHERE cs.voto >= 18),
+        COALESCE(SUM(cs.voto) FILTER (WHERE cs.voto >= 18), 0),
+        COALESCE(SUM(cs.voto * c.cfu) FILTER (WHERE cs.voto >= 18), 0),
+        COALESCE(SUM(c.cfu) FILTER (WHERE cs.voto >= 18), 0),
+        COALESCE(
+            jsonb_agg(jsonb_build_object('id', c.id, 'nome', c.nome, 'voto', cs.voto, 'cfu', c.cfu) ORDER BY c.nome)
+                FILTER (WHERE cs.voto >= 18),
+            '[]'::jsonb
+        ),
+        COALESCE(array_agg(DISTINCT c.id), '{}')
+    FROM Corsi_seguiti cs
+    JOIN EdizioneCorso e ON cs.edition_id = e.id AND cs.edition_data = e.data
+    JOIN Corso c ON e.id = c.id
+    WHERE cs.student_id = p_student_id AND cs.stato = 'completato'
+    ON CONFLICT (student_id) DO UPDATE SET
+        esami_superati   = EXCLUDED.esami_superati,
+        somma_voti       = EXCLUDED.somma_voti,
+        somma_voti_cfu   = EXCLUDED.somma_voti_cfu,
+        cfu_completati   = EXCLUDED.cfu_completati,
+        esami            = EXCLUDED.esami,
+        corsi_completati = EXCLUDED.corsi_completati;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION aggiorna_statistiche_studente()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM ricalcola_statistiche_studente(OLD.student_id);
+    END IF;
+    IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.student_id <> OLD.student_id) THEN
+        PERFORM ricalcola_statistiche_studente(NEW.student_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_aggiorna_statistiche_studente ON Corsi_seguiti;
+CREATE TRIGGER trigger_aggiorna_statistiche_studente
+AFTER INSERT OR UPDATE OR DELETE ON Corsi_seguiti
+FOR EACH ROW
+EXECUTE FUNCTION aggiorna_statistiche_studente();
+
+-- Nome e CFU del corso sono copiati nelle statistiche: se cambiano si ricalcolano gli studenti interessati
+CREATE OR REPLACE FUNCTION aggiorna_statistiche_corso()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM ricalcola_statistiche_studente(s.student_id)
+    FROM (
+        SELECT DISTINCT cs.student_id
+        FROM Corsi_seguiti cs
+        WHERE cs.edition_id = NEW.id AND cs.stato = 'completato'
+    ) s;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_aggiorna_statistiche_corso ON Corso;
+CREATE TRIGGER trigger_aggiorna_statistiche_corso
+AFTER UPDATE OF nome, cfu ON Corso
+FOR EACH ROW
+WHEN (OLD.nome IS DISTINCT FROM NEW.nome OR OLD.cfu IS DISTINCT FROM NEW.cfu)
+EXECUTE FUNCTION aggiorna_statistiche_corso();
+
+-- Serve al trigger sul Corso: studenti che hanno seguito le edizioni di un corso
+CREATE INDEX IF NOT EXISTS idx_corsi_seguiti_edizione ON Corsi_seguiti (edition_id, edition_data);
+
+-- Popola le statistiche degli studenti già presenti
+SELECT ricalcola_statistiche_studente(s.id) FROM Studenti s;
@@ -0,0 +1,73 @@
+------------------------------------------------
+-- 005: rating dei materiali aggiornato in modo incrementale
+-- Il trigger su Valutazione ricalcolava AVG e COUNT su tutte le valutazioni del materiale
+-- a ogni scrittura; ora aggiorna somma e numero dei voti e ne ricava rating_medio
+------------------------------------------------
+
+ALTER TABLE Materiale_Didattico ADD COLUMN IF NOT EXISTS somma_voti BIGINT NOT NULL DEFAULT 0;
+
+-- Backfill dai dati esistenti (i materiali senza valutazioni restano a 0 voti, rating NULL come con AVG)
+UPDATE Materiale_Didattico SET somma_voti = 0, numero_voti = 0, rating_medio = NULL;
+
+UPDATE Materiale_Didattico m
+SET somma_voti   = v.somma,
+    numero_voti  = v.numero,
+    rating_medio = v.somma::FLOAT / v.numero
+FROM (
+    SELECT id_materiale, SUM(voto) AS somma, COUNT(*) AS numero
+    FROM Valutazione
+    GROUP BY id_materiale
+) v
+WHERE m.id = v.id_materiale;
+
+ALTER TABLE Materiale_Didattico
+    ALTER COLUMN numero_voti SET DEFAULT 0,
+    ALTER COLUMN numero_voti SET NOT NULL;
+
+-- Applica a un materiale la variazione di somma e numero dei voti (UPDATE sulla chiave primaria,
+-- il lock di riga serializza le valutazioni concorrenti dello stesso materiale)
+CREATE OR REPLACE FUNCTION applica_voto_materiale(p_id_materiale UUID, p_delta_somma INT, p_delta_numero INT)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE Materiale_Didattico
+    SET somma_voti   = somma_voti + p_delta_somma,
+        numero_voti  = numero_voti + p_delta_numero,
+        rating_medio = (somma_voti + p_delta_somma)::FLOAT / NULLIF(numero_voti + p_delta_numero, 0)
+    WHERE id = p_id_materiale;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION aggiorna_rating_materiale()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM applica_voto_materiale(NEW.id_materiale, NEW.voto, 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM applica_voto_materiale(OLD.id_materiale, -OLD.voto, -1);
+    ELSIF OLD.id_materiale IS DISTINCT FROM NEW.id_materiale THEN
+        PERFORM applica_voto_materiale(OLD.id_materiale, -OLD.voto, -1);
+        PERFORM applica_voto_materiale(NEW.id_materiale, NEW.voto, 1);
+    ELSIF OLD.voto <> NEW.voto THEN
+        -- modifiche al solo commento non toccano il materiale
+        PERFORM applica_voto_materiale(NEW.id_materiale, NEW.voto - OLD.voto, 0);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Ricalcolo completo di un materiale, per verifiche e riparazioni manuali
+CREATE OR REPLACE FUNCTION ricalcola_rating_materiale(p_id_materiale UUID)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE Materiale_Didattico m
+    SET somma_voti   = v.somma,
+        numero_voti  = v.numero,
+        rating_medio = v.somma::FLOAT / NULLIF(v.numero, 0)
+    FROM (
+        SELECT COALESCE(SUM(voto), 0) AS somma, COUNT(*) AS numero
+        FROM Valutazione
+        WHERE id_materiale = p_id_materiale
+    ) v
+    WHERE m.id = p_id_materiale;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,31 @@
+------------------------------------------------
+-- 006: coda degli upload verso Drive
+-- /addTesi, /addMaterialeDidattico e /files/upload salvano il file nello spool locale
+-- e rispondono subito con l'id del job; i worker (backend/src/utils/upload_jobs.py)
+-- caricano il file, scrivono la riga Tesi/Materiale_Didattico e aggiornano lo stato
+------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS Upload_Job (
+    id                 UUID PRIMARY KEY,
+    tipo               TEXT NOT NULL,                     -- 'file', 'tesi' o 'materiale'
+    stato              TEXT NOT NULL DEFAULT 'in_coda'
+                       CHECK (stato IN ('in_coda', 'in_corso', 'completato', 'fallito')),
+    filename           TEXT NOT NULL,
+    mimetype           TEXT,
+    parent_folder      TEXT NOT NULL,
+    child_folder       TEXT NOT NULL,
+    spool_path         TEXT NOT NULL,
+    dati               JSONB NOT NULL DEFAULT '{}'::jsonb, -- valori della riga da scrivere a upload completato
+    byte_totali        BIGINT NOT NULL,
+    byte_caricati      BIGINT NOT NULL DEFAULT 0,
+    tentativi          INT NOT NULL DEFAULT 0,
+    file_id            TEXT,                              -- id su Drive, salvato appena l'upload riesce
+    errore             TEXT,
+    creato_il          TIMESTAMPTZ NOT NULL DEFAULT now(),
+    aggiornato_il      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    prossimo_tentativo TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Job da prendere in carico: solo quelli non ancora conclusi
+CREATE INDEX IF NOT EXISTS idx_upload_job_coda ON Upload_Job (prossimo_tentativo)
+    WHERE stato IN ('in_coda', 'in_corso');
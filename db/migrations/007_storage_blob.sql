@@ -0,0 +1,22 @@
+------------------------------------------------
+-- 007: deduplicazione dei file caricati
+-- Ogni contenuto (SHA-256) viene salvato una sola volta per backend di storage;
+-- Tesi, Materiale_Didattico e CV che caricano lo stesso file ne condividono l'id
+-- e il file viene cancellato solo quando non ha più riferimenti
+------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS Storage_Blob (
+    hash        TEXT NOT NULL,      -- SHA-256 del contenuto
+    backend     TEXT NOT NULL,      -- 'drive' o 'local'
+    blob_id     TEXT NOT NULL,      -- id del file nel backend
+    byte        BIGINT NOT NULL,
+    riferimenti INT NOT NULL DEFAULT 0,
+    creato_il   TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (hash, backend)
+);
+
+-- /files/delete/{file_id} rilascia il blob a partire dal suo id
+CREATE UNIQUE INDEX IF NOT EXISTS idx_storage_blob_id ON Storage_Blob (backend, blob_id);
+
+-- hash calcolato mentre il file viene copiato nello spool
+ALTER TABLE Upload_Job ADD COLUMN IF NOT EXISTS hash TEXT;
@@ -0,0 +1,24 @@
+------------------------------------------------
+-- 008: outbox delle email
+-- /signup scrive la mail di verifica nella stessa transazione di Utente ed EmailVerification;
+-- il sender in background (backend/src/utils/email_outbox.py) la invia con retry
+------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS Email_Outbox (
+    id                 UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    destinatario       TEXT NOT NULL,
+    oggetto            TEXT NOT NULL,
+    corpo              TEXT NOT NULL,
+    stato              TEXT NOT NULL DEFAULT 'in_coda'
+                       CHECK (stato IN ('in_coda', 'in_invio', 'inviata', 'fallita')),
+    tentativi          INT NOT NULL DEFAULT 0,
+    errore             TEXT,
+    creato_il          TIMESTAMPTZ NOT NULL DEFAULT now(),
+    aggiornato_il      TIMESTAMPTZ NOT NULL DEFAULT now(),
+    prossimo_tentativo TIMESTAMPTZ NOT NULL DEFAULT now(),
+    inviata_il         TIMESTAMPTZ
+);
+
+-- Email da inviare: solo quelle non ancora concluse
+CREATE INDEX IF NOT EXISTS idx_email_outbox_coda ON Email_Outbox (prossimo_tentativo)
+    WHERE stato IN ('in_coda', 'in_invio');
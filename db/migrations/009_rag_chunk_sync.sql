@@ -0,0 +1,14 @@
+------------------------------------------------
+-- 009: stato della sincronizzazione incrementale verso Pinecone
+-- Per ogni chunk già caricato nel namespace si salva l'hash di testo e metadati:
+-- backend/src/rag/update_pinecone_from_neon.py ricalcola gli embedding solo dei chunk
+-- nuovi o modificati e cancella da Pinecone quelli le cui righe non esistono più
+------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS Rag_Chunk (
+    namespace     TEXT NOT NULL,
+    chunk_id      TEXT NOT NULL,
+    hash          TEXT NOT NULL,      -- SHA-256 di modello di embedding, testo e metadati
+    aggiornato_il TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (namespace, chunk_id)
+);
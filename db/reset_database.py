@@ -97,8 +97,24 @@ def run_schema_sql():
         print("❌ psql command not found. Please install PostgreSQL client tools.")
         sys.exit(1)
 
-def run_setup_data():
-    """Run the data setup script."""
+def run_migrations():
+    """Apply the versioned migrations in migrations/ on top of schema.sql."""
+    print("🧱 Applying migrations...")
+    migrate_path = os.path.join(os.path.dirname(__file__), "migrate.py")
+    
+    try:
+        result = subprocess.run([sys.executable, migrate_path, "local"],
+                              capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"❌ Error running migrate.py: {result.stderr}")
+            sys.exit(1)
+        print("✅ Migrations applied")
+    except Exception as e:
+        print(f"❌ Error running migrate.py: {e}")
+        sys.exit(1)
+
+def run_setup_data(synthetic=0):
+    """Run the data setup script (COPY of the seed data, plus the synthetic dataset if requested)."""
     print("📊 Populating database with sample data...")
     setup_data_path = os.path.join(os.path.dirname(__file__), "setup_data.py")
     
@@ -106,12 +122,16 @@ def run_setup_data():
         print(f"❌ Setup data file not found: {setup_data_path}")
         sys.exit(1)
     
+    cmd = [sys.executable, setup_data_path, "--env", "local"]
+    if synthetic:
+        cmd.extend(["--synthetic", str(synthetic)])
     try:
-        result = subprocess.run([sys.executable, setup_data_path], 
-                              capture_output=True, text=True)
+        result = subprocess.run(cmd, capture_output=True, text=True)
         if result.returncode != 0:
             print(f"❌ Error running setup_data.py: {result.stderr}")
             sys.exit(1)
+        # setup_data.py riporta i tempi delle singole fasi del caricamento
+        print(result.stdout.rstrip())
         print("✅ Sample data loaded successfully")
     except Exception as e:
         print(f"❌ Error running setup_data.py: {e}")
@@ -162,22 +182,38 @@ def verify_database():
         print(f"❌ Error verifying database: {e}")
         sys.exit(1)
 
-def main():
+def timed(label, step, timings, *args):
+    """Run a reset step and record how long it took."""
+    start = time.perf_counter()
+    step(*args)
+    timings.append((label, time.perf_counter() - start))
+
+def main(synthetic=0):
     """Main execution function."""
     print("🚀 Starting FAQBuddy Database Reset")
     print("=" * 50)
     
+    timings = []
     check_environment()
-    drop_and_create_db()
-    run_schema_sql()
-    run_setup_data()
-    verify_database()
+    timed("drop & create", drop_and_create_db, timings)
+    timed("schema.sql", run_schema_sql, timings)
+    timed("migrations", run_migrations, timings)
+    timed("data", run_setup_data, timings, synthetic)
+    timed("verify", verify_database, timings)
     
     print("=" * 50)
     print("🎉 Database reset completed successfully!")
     print(f"📊 Database: {DB_NAME}")
     print(f"🔗 Host: {DB_HOST}:{DB_PORT}")
+    print("⏱️  Reset time:")
+    for label, elapsed in timings:
+        print(f"   {label:<16} {elapsed:8.2f}s")
+    print(f"   {'total':<16} {sum(elapsed for _, elapsed in timings):8.2f}s")
     print("💡 You can now run the Pinecone indexing script to update your vector database.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Reset the local FAQBuddy database")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="STUDENTS",
+                        help="also generate a synthetic dataset with this many students (load testing)")
+    main(synthetic=parser.parse_args().synthetic)
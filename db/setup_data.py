@@ -1,3 +1,21 @@
+"""
+Loads the FAQBuddy data into a database created with schema.sql and the migrations.
+
+    python setup_data.py --env local                       # dati di seed (seed/*.csv)
+    python setup_data.py --env local --synthetic 100000    # seed + 100000 studenti sintetici per i load test
+
+The seed tables are loaded with COPY from the CSV files in seed/ and the synthetic dataset is
+generated inside the database with generate_series, so no row crosses the network one INSERT
+at a time. Secondary indexes and foreign keys are dropped for the load and rebuilt once at the
+end, and the per-row aggregate triggers (rating dei materiali, statistiche studente) are
+replaced by a single recomputation. The time of every phase is reported.
+"""
+
+import os
+import sys
+import time
+import argparse
+from contextlib import contextmanager
 from utils import get_connection
 from dotenv import load_dotenv
 from uuid import uuid4
@@ -5,14 +23,212 @@ import bcrypt
 
 load_dotenv()
 
+SEED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "seed")
+# Ordine di caricamento dei file di seed (le foreign key sono comunque ricreate dopo il caricamento)
+SEED_TABLES = ["Dipartimento", "Facolta", "Corso_di_Laurea", "Insegnanti_Anagrafici", "Corso", "EdizioneCorso"]
+
+# Password di tutti gli utenti sintetici (un solo hash bcrypt per l'intero dataset)
+SYNTHETIC_PASSWORD = os.getenv("SYNTHETIC_PASSWORD", "password")
+SYNTHETIC_SEMESTRI = ["S1/2024", "S2/2024", "S1/2025", "S2/2025"]
+CORSI_PER_CDL = 20
+
+# Trigger che ricalcolano aggregati a ogni riga: spenti durante il caricamento, poi un ricalcolo unico
+AGGREGATE_TRIGGERS = [
+    ("Valutazione", "trigger_aggiorna_rating_materiale"),
+    ("Corsi_seguiti", "trigger_aggiorna_statistiche_studente"),
+]
+
+
+class Timings:
+    def __init__(self):
+        """
+        Collects the duration of the provisioning phases for the final report.
+        """
+        self.phases = []
+
+    @contextmanager
+    def phase(self, label):
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.phases.append((label, elapsed))
+        print(f"⏱️  {label}: {elapsed:.2f}s")
+
+    def report(self):
+        total = sum(elapsed for _, elapsed in self.phases)
+        print("📊 Tempi di caricamento:")
+        for label, elapsed in self.phases:
+            print(f"   {label:<32} {elapsed:8.2f}s")
+        print(f"   {'totale':<32} {total:8.2f}s")
+        return total
+
+
+def copy_seed(cur, seed_dir=SEED_DIR):
+    """
+    Loads every seed/<tabella>.csv with COPY; the CSV header names the columns.
+
+    Returns:
+        int: rows loaded.
+    """
+    total = 0
+    for table in SEED_TABLES:
+        path = os.path.join(seed_dir, f"{table.lower()}.csv")
+        with open(path, "r", encoding="utf-8") as f:
+            columns = f.readline().strip()
+            cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", f)
+            total += cur.rowcount
+    return total
+
+
+def _secondary_indexes(cur):
+    # Indici che non sostengono PRIMARY KEY/UNIQUE: quelli di schema.sql e delle migration
+    cur.execute("""
+        SELECT quote_ident(ic.relname), pg_get_indexdef(ix.indexrelid)
+        FROM pg_index ix
+        JOIN pg_class ic ON ic.oid = ix.indexrelid
+        JOIN pg_namespace n ON n.oid = ic.relnamespace
+        WHERE n.nspname = current_schema()
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c
+              WHERE c.conindid = ix.indexrelid AND c.contype IN ('p', 'u', 'x')
+          )
+        ORDER BY ic.relname
+    """)
+    return cur.fetchall()
+
+
+def _foreign_keys(cur):
+    cur.execute("""
+        SELECT c.conrelid::regclass::text, quote_ident(c.conname), pg_get_constraintdef(c.oid)
+        FROM pg_constraint c
+        JOIN pg_namespace n ON n.oid = c.connamespace
+        WHERE c.contype = 'f' AND n.nspname = current_schema()
+        ORDER BY c.conrelid::regclass::text, c.conname
+    """)
+    return cur.fetchall()
+
+
+@contextmanager
+def deferred_indexes(cur, timings):
+    """
+    Drops secondary indexes and foreign keys and disables the aggregate triggers for the
+    duration of a bulk load, then puts everything back: the foreign keys are validated with
+    one check per constraint, the indexes are built once from sorted data and the aggregates
+    are recomputed. Primary keys and UNIQUE constraints stay, they still guard the load.
+    Everything runs in the caller's transaction, so a failed load leaves the schema intact.
+    """
+    indexes = _secondary_indexes(cur)
+    foreign_keys = _foreign_keys(cur)
+    for table, name, _ in foreign_keys:
+        cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+    for name, _ in indexes:
+        cur.execute(f"DROP INDEX {name}")
+    for table, trigger in AGGREGATE_TRIGGERS:
+        cur.execute(f"ALTER TABLE {table} DISABLE TRIGGER {trigger}")
+
+    yield
+
+    with timings.phase(f"foreign key ({len(foreign_keys)})"):
+        for table, name, definition in foreign_keys:
+            cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+    with timings.phase(f"indici ({len(indexes)})"):
+        for _, definition in indexes:
+            cur.execute(definition)
+    for table, trigger in AGGREGATE_TRIGGERS:
+        cur.execute(f"ALTER TABLE {table} ENABLE TRIGGER {trigger}")
+    with timings.phase("aggregati"):
+        cur.execute("SELECT ricalcola_statistiche_studente(s.id) FROM Studenti s")
+        cur.execute("SELECT ricalcola_rating_materiale(m.id) FROM Materiale_Didattico m")
+
+
+def generate_synthetic(cur, studenti):
+    """
+    Generates a synthetic dataset sized on the number of students, with deterministic ids
+    (md5 -> uuid) so that the tables reference each other without lookups. Per studente:
+    8 corsi seguiti del proprio corso di laurea (metà completati con voto), 2 recensioni,
+    5 valutazioni di materiali; un materiale ogni 2 studenti. Emails are studenteN@synthetic.faqbuddy.it,
+    all with SYNTHETIC_PASSWORD.
 
-def run_sql_file(cur, filename):
-    with open(filename, "r", encoding="utf-8") as f:
-        sql = f.read()
-    # Divide le query per ';' e rimuove eventuali spazi vuoti
-    statements = [s.strip() for s in sql.split(';') if s.strip()]
-    for stmt in statements:
-        cur.execute(stmt)
+    Returns:
+        dict: rows generated per table.
+    """
+    n_cdl = max(1, studenti // 2000)
+    counts = {
+        "Corso_di_Laurea": n_cdl,
+        "Insegnanti_Anagrafici": max(5, studenti // 100),
+        "Corso": n_cdl * CORSI_PER_CDL,
+        "EdizioneCorso": n_cdl * CORSI_PER_CDL * len(SYNTHETIC_SEMESTRI),
+        "Studenti": studenti,
+        "Corsi_seguiti": studenti * 8,
+        "Materiale_Didattico": max(10, studenti // 2),
+        "Review": studenti * 2,
+        "Valutazione": studenti * 5,
+    }
+    pwd_hash = bcrypt.hashpw(SYNTHETIC_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    cur.execute("""
+        INSERT INTO Dipartimento (id, nome) VALUES (md5('syn-dip')::uuid, 'Dipartimento sintetico');
+        INSERT INTO Facolta (id, dipartimento_id, nome)
+        VALUES (md5('syn-fac')::uuid, md5('syn-dip')::uuid, 'Facolta sintetica');
+
+        INSERT INTO Corso_di_Laurea (id, id_facolta, nome, tipologia)
+        SELECT md5('syn-cdl' || c)::uuid, md5('syn-fac')::uuid, 'Corso di Laurea sintetico ' || c, 'Triennale'
+        FROM generate_series(1, %(n_cdl)s) c;
+
+        INSERT INTO Insegnanti_Anagrafici (id, nome, cognome)
+        SELECT md5('syn-ins' || i)::uuid, 'Docente', 'Sintetico ' || i
+        FROM generate_series(1, %(n_ins)s) i;
+
+        -- corso j del corso di laurea c
+        INSERT INTO Corso (id, id_corso, nome, cfu, idoneità)
+        SELECT md5('syn-corso' || c || '-' || j)::uuid, md5('syn-cdl' || c)::uuid,
+               'Corso sintetico ' || c || '-' || j, CASE WHEN j %% 3 = 0 THEN 6 ELSE 9 END, false
+        FROM generate_series(1, %(n_cdl)s) c, generate_series(1, %(n_corsi)s) j;
+
+        INSERT INTO EdizioneCorso (id, insegnante_anagrafico, data, esonero, mod_Esame)
+        SELECT md5('syn-corso' || c || '-' || j)::uuid, md5('syn-ins' || ((c * %(n_corsi)s + j) %% %(n_ins)s + 1))::uuid,
+               sem, j %% 2 = 0, 'Scritto'
+        FROM generate_series(1, %(n_cdl)s) c, generate_series(1, %(n_corsi)s) j, unnest(%(semestri)s::text[]) sem;
+
+        INSERT INTO Utente (id, email, pwd_hash, nome, cognome, email_verificata)
+        SELECT md5('syn-stud' || i)::uuid, 'studente' || i || '@synthetic.faqbuddy.it', %(pwd_hash)s,
+               'Studente', 'Sintetico ' || i, true
+        FROM generate_series(1, %(n_stud)s) i;
+
+        INSERT INTO Studenti (id, corso_laurea_id, matricola)
+        SELECT md5('syn-stud' || i)::uuid, md5('syn-cdl' || (i %% %(n_cdl)s + 1))::uuid, 2000000 + i
+        FROM generate_series(1, %(n_stud)s) i;
+
+        -- k = 1..8 dà corsi distinti del corso di laurea dello studente; i primi 4 sono completati
+        INSERT INTO Corsi_seguiti (student_id, edition_id, edition_data, stato, voto)
+        SELECT md5('syn-stud' || i)::uuid,
+               md5('syn-corso' || (i %% %(n_cdl)s + 1) || '-' || ((i * 7 + k) %% %(n_corsi)s + 1))::uuid,
+               (%(semestri)s::text[])[(i + k) %% 4 + 1],
+               CASE WHEN k <= 4 THEN 'completato' ELSE 'attivo' END::attend_status,
+               CASE WHEN k <= 4 THEN 18 + (i * k) %% 14 END
+        FROM generate_series(1, %(n_stud)s) i, generate_series(1, 8) k;
+
+        INSERT INTO Review (student_id, edition_id, edition_data, descrizione, voto)
+        SELECT md5('syn-stud' || i)::uuid,
+               md5('syn-corso' || (i %% %(n_cdl)s + 1) || '-' || ((i * 7 + k) %% %(n_corsi)s + 1))::uuid,
+               (%(semestri)s::text[])[(i + k) %% 4 + 1], 'Recensione sintetica ' || i || '-' || k, (i + k) %% 5 + 1
+        FROM generate_series(1, %(n_stud)s) i, generate_series(1, 2) k;
+
+        INSERT INTO Materiale_Didattico (id, utente_id, edition_id, edition_data, path_file, tipo, verificato)
+        SELECT md5('syn-mat' || m)::uuid, md5('syn-stud' || (m %% %(n_stud)s + 1))::uuid,
+               md5('syn-corso' || (m %% %(n_cdl)s + 1) || '-' || (m %% %(n_corsi)s + 1))::uuid,
+               (%(semestri)s::text[])[m %% 4 + 1], 'synthetic_file_' || m, 'pdf', m %% 4 = 0
+        FROM generate_series(1, %(n_mat)s) m;
+
+        -- k = 1..5 dà materiali distinti per studente (n_mat >= 10)
+        INSERT INTO Valutazione (student_id, id_materiale, voto)
+        SELECT md5('syn-stud' || i)::uuid, md5('syn-mat' || ((i * 13 + k) %% %(n_mat)s + 1))::uuid, (i + k) %% 5 + 1
+        FROM generate_series(1, %(n_stud)s) i, generate_series(1, 5) k;
+    """, {
+        "n_cdl": n_cdl, "n_ins": counts["Insegnanti_Anagrafici"], "n_corsi": CORSI_PER_CDL,
+        "n_stud": studenti, "n_mat": counts["Materiale_Didattico"],
+        "semestri": SYNTHETIC_SEMESTRI, "pwd_hash": pwd_hash,
+    })
+    return counts
 
 # def normalize_text(val):
 #     val = val.strip()
@@ -290,49 +506,57 @@ def run_sql_file(cur, filename):
 #     return extra_ids
 
 
-def main(env):
-    conn = get_connection(mode=env)
-    cur = conn.cursor()
-    try:
-        run_sql_file(cur, "insert_data.sql")
-
-
-
-        # --- AGGIUNGO QUI IL SUPERUSER ---
-        # Aggiungo un superuser per i test o per mettere materiali o cose #
-        import bcrypt
-        from uuid import uuid4
-
-        # Parametri superuser
-        user_id = str(uuid4())
-        email = "superuser@superuser.it"
-        pwd_hash = bcrypt.hashpw("superpassword".encode(), bcrypt.gensalt()).decode()
-        nome = "Super"
-        cognome = "User"
-        matricola = 1234567
+def insert_superuser(cur):
+    # Aggiungo un superuser per i test o per mettere materiali o cose #
+    user_id = str(uuid4())
+    email = "superuser@superuser.it"
+    pwd_hash = bcrypt.hashpw("superpassword".encode(), bcrypt.gensalt()).decode()
+    nome = "Super"
+    cognome = "User"
+    matricola = 1234567
 
-        # Trova un corso di laurea valido (prendi il primo)
-        cur.execute("SELECT id FROM Corso_di_Laurea LIMIT 1")
-        row = cur.fetchone()
-        if not row:
-            raise Exception("Nessun corso di laurea trovato per assegnare lo studente superuser!")
-        corso_laurea_id = row[0]
+    # Trova un corso di laurea valido (prendi il primo)
+    cur.execute("SELECT id FROM Corso_di_Laurea LIMIT 1")
+    row = cur.fetchone()
+    if not row:
+        raise Exception("Nessun corso di laurea trovato per assegnare lo studente superuser!")
+    corso_laurea_id = row[0]
 
-        # Inserisci l'utente
-        cur.execute(
-            "INSERT INTO Utente (id, email, pwd_hash, nome, cognome, email_verificata) VALUES (%s, %s, %s, %s, %s, %s)",
-            (user_id, email, pwd_hash, nome, cognome, True)
-        )
-        # Inserisci come studente
-        cur.execute(
-            "INSERT INTO Studenti (id, corso_laurea_id, matricola) VALUES (%s, %s, %s)",
-            (user_id, corso_laurea_id, matricola)
-        )
-        # --- FINE SUPERUSER ---
+    # Inserisci l'utente
+    cur.execute(
+        "INSERT INTO Utente (id, email, pwd_hash, nome, cognome, email_verificata) VALUES (%s, %s, %s, %s, %s, %s)",
+        (user_id, email, pwd_hash, nome, cognome, True)
+    )
+    # Inserisci come studente
+    cur.execute(
+        "INSERT INTO Studenti (id, corso_laurea_id, matricola) VALUES (%s, %s, %s)",
+        (user_id, corso_laurea_id, matricola)
+    )
 
 
-
-        conn.commit()
+def main(env, synthetic=0):
+    conn = get_connection(mode=env)
+    cur = conn.cursor()
+    timings = Timings()
+    try:
+        # Solo per questa transazione: più memoria per costruire gli indici, nessuna attesa del flush del WAL
+        cur.execute("SET LOCAL maintenance_work_mem = '256MB'")
+        cur.execute("SET LOCAL synchronous_commit = off")
+        with deferred_indexes(cur, timings):
+            with timings.phase("seed (COPY)"):
+                rows = copy_seed(cur)
+            print(f"✅ {rows} righe di seed caricate")
+            if synthetic:
+                with timings.phase(f"dataset sintetico ({synthetic} studenti)"):
+                    counts = generate_synthetic(cur, synthetic)
+                print("✅ Dati sintetici: " + ", ".join(f"{table} {n}" for table, n in counts.items()))
+        insert_superuser(cur)
+        with timings.phase("commit"):
+            conn.commit()
+        with timings.phase("analyze"):
+            cur.execute("ANALYZE")
+            conn.commit()
+        timings.report()
         print("✅ All data inserted successfully!")
     except Exception as e:
         conn.rollback()
@@ -343,9 +567,16 @@ def main(env):
         conn.close()
 
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 2 or sys.argv[1] != "--env" or len(sys.argv) < 3:
+    parser = argparse.ArgumentParser(description="Popola il database FAQBuddy")
+    parser.add_argument("--env", choices=["local", "neon"], type=str.lower,
+                        help="ambiente: local oppure neon")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="STUDENTI",
+                        help="genera anche un dataset sintetico con questo numero di studenti")
+    args = parser.parse_args()
+    if not args.env:
         print("❌ Devi specificare l'ambiente: python setup_data.py --env local  oppure  --env neon")
         sys.exit(1)
-    env = sys.argv[2].lower()
-    main(env)
\ No newline at end of file
+    if args.synthetic < 0:
+        print("❌ --synthetic deve essere un numero di studenti >= 0")
+        sys.exit(1)
+    main(args.env, synthetic=args.synthetic)
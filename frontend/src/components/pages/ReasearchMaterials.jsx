@@ -4,6 +4,7 @@ import React, { useState, useEffect } from "react";
 import { motion } from "framer-motion";
 import Button from "../utils/Button";
 import axios from "axios";
+import { postPage } from "../utils/pagination";
 import { FaStar } from "react-icons/fa";
 
 const HOST = process.env.NEXT_PUBLIC_HOST;
@@ -19,6 +20,9 @@ export default function ReasearchMaterials() {
   const [materials, setMaterials] = useState([]);
   const [info, setInfo] = useState([]);
   const [reviews, setReviews] = useState([]); 
+  const [materialsCursor, setMaterialsCursor] = useState(null);
+  const [reviewsCursor, setReviewsCursor] = useState(null);
+  const [lastPayload, setLastPayload] = useState(null);
   const [hasSearched, setHasSearched] = useState(false);
   const [includeMaterials, setIncludeMaterials] = useState(true);
   const [includeInfo, setIncludeInfo] = useState(false);
@@ -100,8 +104,10 @@ export default function ReasearchMaterials() {
     if (!includeMaterials && !includeInfo && !includeReviews) return;
     setHasSearched(true);
     setMaterials([]);
+    setMaterialsCursor(null);
     setInfo([]);
     setReviews([]);
+    setReviewsCursor(null);
     try {
       const payload =
         selectedEdition === 'all'
@@ -112,37 +118,44 @@ export default function ReasearchMaterials() {
               nomeCorso: selectedCourse
             };
 
-      const requests = [];
-      if (includeMaterials) {
-        requests.push(axios.post(`${HOST}/getMaterials`, payload));
-      }
-      if (includeInfo) {
-        requests.push(axios.post(`${HOST}/getInfoCorso`, payload));
-      }
-      if (includeReviews) {
-        requests.push(axios.post(`${HOST}/getReview`, payload));
-      }
-
-      const responses = await Promise.all(requests);
-      let collectedMaterials = [], collectedInfo = [], collectedReviews = [];
-      responses.forEach((res) => {
-        const url = res.config.url;
-        if (url.includes('getMaterials')) {
-          collectedMaterials = res.data.materiale;
-        } else if (url.includes('getInfoCorso')) {
-          collectedInfo = res.data.materiale;
-        } else if (url.includes('getReview')) {
-          collectedReviews = res.data.materiale;
-        }
-      });
-      setMaterials(collectedMaterials);
+      // getMaterials e getReview sono paginati: qui solo la prima pagina, le altre con "Carica altri"
+      const emptyPage = { items: [], nextCursor: null };
+      const [materialsPage, collectedInfo, reviewsPage] = await Promise.all([
+        includeMaterials ? postPage(`${HOST}/getMaterials`, payload, 'materiale') : emptyPage,
+        includeInfo ? axios.post(`${HOST}/getInfoCorso`, payload).then(res => res.data.materiale) : [],
+        includeReviews ? postPage(`${HOST}/getReview`, payload, 'materiale') : emptyPage
+      ]);
+      setLastPayload(payload);
+      setMaterials(materialsPage.items);
+      setMaterialsCursor(materialsPage.nextCursor);
       setInfo(collectedInfo);
-      setReviews(collectedReviews);
+      setReviews(reviewsPage.items);
+      setReviewsCursor(reviewsPage.nextCursor);
     } catch (error) {
       console.error('[POST getMaterials/getInfoCorso/getReview] error:', error);
     }
   };
 
+  const loadMoreMaterials = async () => {
+    try {
+      const page = await postPage(`${HOST}/getMaterials`, lastPayload, 'materiale', materialsCursor);
+      setMaterials(prev => [...prev, ...page.items]);
+      setMaterialsCursor(page.nextCursor);
+    } catch (error) {
+      console.error('[POST getMaterials] error:', error);
+    }
+  };
+
+  const loadMoreReviews = async () => {
+    try {
+      const page = await postPage(`${HOST}/getReview`, lastPayload, 'materiale', reviewsCursor);
+      setReviews(prev => [...prev, ...page.items]);
+      setReviewsCursor(page.nextCursor);
+    } catch (error) {
+      console.error('[POST getReview] error:', error);
+    }
+  };
+
   // useEffect per eseguire automaticamente la ricerca se i parametri cambiano dopo la prima chiamata
   useEffect(() => {
     if (hasSearched && selectedEdition) {
@@ -276,6 +289,11 @@ export default function ReasearchMaterials() {
                 </div>
               );
             })}
+            {materialsCursor && (
+              <div className="flex justify-center">
+                <Button className="px-6 py-2 text-sm" onClick={loadMoreMaterials}>Carica altri</Button>
+              </div>
+            )}
           </div>
         )}
         {includeMaterials && materials.length === 0 && hasSearched && (
@@ -332,6 +350,11 @@ export default function ReasearchMaterials() {
                 </div>
               );
             })}
+            {reviewsCursor && (
+              <div className="flex justify-center">
+                <Button className="px-6 py-2 text-sm" onClick={loadMoreReviews}>Carica altre</Button>
+              </div>
+            )}
           </div>
         )}
         {includeReviews && reviews.length === 0 && hasSearched && (
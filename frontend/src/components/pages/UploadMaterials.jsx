@@ -4,6 +4,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
 import Button from '@/components/utils/Button';
 import TileButton from '@/components/utils/TileButton';
+import { waitForUpload } from '@/components/utils/uploads';
 
 const HOST = process.env.NEXT_PUBLIC_HOST;
 
@@ -146,6 +147,7 @@ export default function UploadMaterials() {
         fd.append('file', selectedFile);
         const res = await fetch(`${HOST}/addTesi`, { method: 'POST', body: fd });
         if (res.ok) {
+          await waitForUpload((await res.json()).job_id);
           alert('Tesi caricata con successo!');
         } else {
           const err = await res.json().catch(() => ({}));
@@ -168,6 +170,7 @@ export default function UploadMaterials() {
           body: fd,
         });
         if (res.ok) {
+          await waitForUpload((await res.json()).job_id);
           alert('Materiale caricato con successo!');
         } else {
           const err = await res.json().catch(() => ({}));
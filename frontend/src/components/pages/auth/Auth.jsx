@@ -9,6 +9,7 @@ import { SignupInsegnante } from './SignupInsegnante';
 import { SignupStudente } from './SignupStudente';
 import InputField from '@/components/utils/InputField';
 import { IoMdEye, IoMdEyeOff } from "react-icons/io";
+import { waitForUpload } from '@/components/utils/uploads';
 
 const HOST = process.env.NEXT_PUBLIC_HOST;
 
@@ -25,7 +26,7 @@ async function uploadCV(cvFile, nome, cognome) {
     formData,
     { headers: { "Content-Type": "multipart/form-data" } }
   );
-  return response.data;
+  return waitForUpload(response.data.job_id);
 }
 
 export default function Auth() {
@@ -18,7 +18,9 @@ export default function AddCourseModal({
     setShowAddEdition,
     handleAddEdition,
     setNewEdition,
-    docenti
+    docenti,
+    docenteQuery,
+    setDocenteQuery
 }) {
 
     const selectedCourse = availableCourses.find(c => c.id === selectedCourseId);
@@ -133,6 +135,13 @@ export default function AddCourseModal({
                                 />
 
                                 <label className="block font-semibold text-black">Docente:</label>
+                                <input
+                                  type="text"
+                                  placeholder="Cerca docente"
+                                  className="border rounded p-2 w-full text-black"
+                                  value={docenteQuery}
+                                  onChange={e => setDocenteQuery(e.target.value)}
+                                />
                                 <select
                                   required
                                   className="border rounded p-2 w-full text-black"
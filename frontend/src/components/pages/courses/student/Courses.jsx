@@ -11,6 +11,7 @@ import { TbArrowLeftFromArc } from "react-icons/tb";
 import SwipeWrapperStudente from "@/components/wrappers/SwipeWrapperStudente";
 import RestoreConfirmModal from "./RestoreConfirmModal";
 import Button from "@/components/utils/Button";
+import { useSearchPage } from "@/components/utils/pagination";
 
 const HOST = process.env.NEXT_PUBLIC_HOST;
 
@@ -64,17 +65,11 @@ export default function CorsiPage() {
   const [actionCourse, setActionCourse] = useState(null);
 
 
-  // Fetch all teachers for the dropdown in the add course modal
-  const [docenti, setDocenti] = useState([]);
-  useEffect(() => {
-    fetch(`${HOST}/teachers`)
-      .then(res => res.json())
-      .then(data => setDocenti(data))
-      .catch(() => setDocenti([]));
-  }, []);
+  // Docenti della select nella modale di aggiunta corso: cercati sul server mentre si digita
+  const [docenteQuery, setDocenteQuery] = useState("");
+  const docenti = useSearchPage(`${HOST}/teachers`, docenteQuery);
 
   // Handle reviews
-  const [studentReviews, setStudentReviews] = useState([]);
   const [showReviewModal, setShowReviewModal] = useState(false);
   const [reviewCourse, setReviewCourse] = useState(null);
 
@@ -85,20 +80,17 @@ export default function CorsiPage() {
     setSuccess("");
   };
 
-  // Fetch all courses && reviews on mount
+  // Fetch all courses on mount
   useEffect(() => {
     const token = localStorage.getItem("token");
-    axios.get(`${HOST}/profile/courses/current`, {
-      headers: { Authorization: `Bearer ${token}` }
-    }).then(res => setCurrentCourses(res.data));
-
-    axios.get(`${HOST}/profile/courses/completed`, {
-      headers: { Authorization: `Bearer ${token}` }
-    }).then(res => setCompletedCourses(res.data));
-
-    axios.get(`${HOST}/profile/reviews`, {
-      headers: { Authorization: `Bearer ${token}` }
-    }).then(res => setStudentReviews(res.data));
+    // Una sola richiesta per corsi attivi e completati; i completati indicano già se sono stati recensiti
+    axios.get(`${HOST}/profile/dashboard`, {
+      headers: { Authorization: `Bearer ${token}` },
+      params: { sections: "courses_current,courses_completed" }
+    }).then(res => {
+      setCurrentCourses(res.data.courses_current);
+      setCompletedCourses(res.data.courses_completed);
+    });
   }, []);
 
   // --- Completa corso ---
@@ -142,6 +134,7 @@ export default function CorsiPage() {
     setSelectedCourseId(null);
     setEditions([]);
     setShowAddEdition(false);
+    setDocenteQuery("");
     setError("");
     setSuccess("");
     setNewEdition({
@@ -271,11 +264,10 @@ export default function CorsiPage() {
         { headers: { Authorization: `Bearer ${token}` } }
       );
       setSuccess("Recensione aggiunta!");
-      // Aggiorna le recensioni
-      const res = await axios.get(`${HOST}/profile/reviews`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setStudentReviews(res.data);
+      // Il corso risulta recensito senza ricaricare le recensioni
+      setCompletedCourses(prev => prev.map(c =>
+        c.edition_id === corso.edition_id && c.edition_data === corso.edition_data ? { ...c, recensito: true } : c
+      ));
     } catch (err) {
       setError(err.response?.data?.detail || "Errore durante l'invio della recensione");
     }
@@ -296,9 +288,6 @@ export default function CorsiPage() {
       setCurrentCourses(resCurrent.data);
       const resCompleted = await axios.get(`${HOST}/profile/courses/completed`, { headers: { Authorization: `Bearer ${token}` } });
       setCompletedCourses(resCompleted.data);
-      // Aggiorna recensioni
-      const resReviews = await axios.get(`${HOST}/profile/reviews`, { headers: { Authorization: `Bearer ${token}` } });
-      setStudentReviews(resReviews.data);
     } catch (err) {
       setError("Errore durante il ripristino del corso");
     }
@@ -379,6 +368,8 @@ export default function CorsiPage() {
             handleAddEdition={handleAddEdition}
             setNewEdition={setNewEdition}
             docenti={docenti}
+            docenteQuery={docenteQuery}
+            setDocenteQuery={setDocenteQuery}
           />
         )}
         {showReviewModal && (
@@ -431,9 +422,7 @@ export default function CorsiPage() {
               </div>
             ) : (
               completedCourses.map((corso) => {
-                const alreadyReviewed = studentReviews.some(
-                  r => r.edition_id === corso.edition_id && r.edition_data === corso.edition_data
-                );
+                const alreadyReviewed = corso.recensito;
                 return (
                   <CourseBox
                     key={corso.edition_id}
@@ -5,7 +5,7 @@ import MobileSheet from "@/components/utils/MobileSheet";
 
 const HOST = process.env.NEXT_PUBLIC_HOST;
 
-export function AddEditionModal({ show, onClose, courses, onSuccess }) {
+export function AddEditionModal({ show, onClose, courses, courseQuery, onCourseQueryChange, onSuccess }) {
     const [form, setForm] = useState({
         corso_id: "",
         data: "",
@@ -85,6 +85,13 @@ export function AddEditionModal({ show, onClose, courses, onSuccess }) {
             <form id="add-edition-form" className="space-y-3" onSubmit={handleSubmit}>
                     <div>
                         <label className="block mb-1 font-medium text-black">Corso</label>
+                        <input
+                            type="text"
+                            placeholder="Cerca corso"
+                            value={courseQuery}
+                            onChange={e => onCourseQueryChange(e.target.value)}
+                            className="w-full border rounded px-3 py-2 mb-2 text-black"
+                        />
                         <select
                             name="corso_id"
                             value={form.corso_id}
@@ -4,6 +4,7 @@ import axios from "axios";
 import { EditionsModal } from "@/components/pages/courses/teacher/EditionsModal";
 import { AddEditionModal } from "@/components/pages/courses/teacher/AddEditionModal";
 import Button from "@/components/utils/Button";
+import { useSearchPage } from "@/components/utils/pagination";
 import SwipeWrapperInsegnante from "@/components/wrappers/SwipeWrapperInsegnante";
 
 
@@ -19,7 +20,9 @@ export default function TeacherCourses() {
 
   // Stato per la modale
   const [showAddModal, setShowAddModal] = useState(false);
-  const [allCourses, setAllCourses] = useState([]);
+  // Corsi della select della modale: cercati sul server mentre si digita
+  const [courseQuery, setCourseQuery] = useState("");
+  const allCourses = useSearchPage(`${HOST}/courses/all`, courseQuery);
 
   useEffect(() => {
     const token = localStorage.getItem("token");
@@ -37,18 +40,9 @@ export default function TeacherCourses() {
       });
   }, [refresh]);
 
-  // Carica tutti i corsi insegnati per la select della modale
-  const openAddModal = async () => {
+  const openAddModal = () => {
+    setCourseQuery("");
     setShowAddModal(true);
-    const token = localStorage.getItem("token");
-    try {
-      const res = await axios.get(`${HOST}/courses/all`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setAllCourses(res.data);
-    } catch {
-      setAllCourses([]);
-    }
   };
 
   if (loading) return <div className="p-8 text-center italic">Caricamento corsi...</div>;
@@ -144,6 +138,8 @@ export default function TeacherCourses() {
           show={showAddModal}
           onClose={() => setShowAddModal(false)}
           courses={allCourses}
+          courseQuery={courseQuery}
+          onCourseQueryChange={setCourseQuery}
           onSuccess={() => setRefresh(r => !r)}
         />
       </div>
@@ -11,6 +11,7 @@ import ChangePasswordModal from './ChangePasswordModal';
 import SwipeWrapperStudente from '@/components/wrappers/SwipeWrapperStudente';
 import SwipeWrapperInsegnante from '@/components/wrappers/SwipeWrapperInsegnante';
 import SwipeWrapperHome from '@/components/wrappers/SwipeWrapperHome';
+import { waitForUpload } from '@/components/utils/uploads';
 
 
 const HOST = process.env.NEXT_PUBLIC_HOST;
@@ -108,7 +109,7 @@ const PersonalInfo = () => {
             formData,
             { headers: { "Content-Type": "multipart/form-data" } }
           );
-          newCVId = res.data.file_id;
+          newCVId = (await waitForUpload(res.data.job_id)).file_id;
         } catch {
           alert("Errore durante l'upload del CV");
         }
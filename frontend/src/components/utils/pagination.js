@@ -0,0 +1,41 @@
+import axios from "axios";
+import { useEffect, useState } from "react";
+
+// Gli endpoint paginati (keyset) restituiscono una pagina alla volta:
+// le liste espongono il cursore successivo nell'header X-Next-Cursor,
+// getMaterials/getReview nel campo next_cursor della risposta.
+// Le pagine successive si chiedono solo quando servono ("Carica altri"),
+// per le select (docenti, corsi) il server filtra mentre si digita.
+
+export async function fetchPage(url, config = {}, cursor = null) {
+  const res = await axios.get(url, {
+    ...config,
+    params: { ...(config.params || {}), ...(cursor ? { cursor } : {}) }
+  });
+  return { items: res.data, nextCursor: res.headers["x-next-cursor"] || null };
+}
+
+export async function postPage(url, payload, key, cursor = null) {
+  const res = await axios.post(url, { ...payload, cursor });
+  return { items: res.data[key] || [], nextCursor: res.data.next_cursor || null };
+}
+
+// Prima pagina di una lista filtrata dal parametro q, ricaricata quando il testo cambia
+// (con un piccolo ritardo, così non parte una richiesta a ogni tasto)
+export function useSearchPage(url, query, config = {}, { delay = 300, limit = 20 } = {}) {
+  const [items, setItems] = useState([]);
+  useEffect(() => {
+    let cancelled = false;
+    const timer = setTimeout(() => {
+      const params = { ...(config.params || {}), limit, ...(query ? { q: query } : {}) };
+      fetchPage(url, { ...config, params })
+        .then(page => { if (!cancelled) setItems(page.items); })
+        .catch(() => { if (!cancelled) setItems([]); });
+    }, delay);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [url, query]);
+  return items;
+}
@@ -0,0 +1,19 @@
+import axios from "axios";
+
+const HOST = process.env.NEXT_PUBLIC_HOST;
+
+// /addTesi, /addMaterialeDidattico e /files/upload rispondono 202 con un job_id:
+// il file viene caricato su Drive in background e lo stato si legge da /uploads/{job_id}.
+
+export async function waitForUpload(jobId, { interval = 1000, timeout = 10 * 60 * 1000 } = {}) {
+  const deadline = Date.now() + timeout;
+  while (Date.now() < deadline) {
+    const res = await axios.get(`${HOST}/uploads/${jobId}`);
+    if (res.data.stato === "completato") return res.data;
+    if (res.data.stato === "fallito") {
+      throw new Error(res.data.errore || "Caricamento del file non riuscito");
+    }
+    await new Promise((resolve) => setTimeout(resolve, interval));
+  }
+  throw new Error("Caricamento del file ancora in corso, riprova più tardi");
+}